@@ -1,104 +1,122 @@
 # app/ocr_utils.py
 import io
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from PIL import Image, ImageOps
 import numpy as np
 import cv2
-from paddleocr import PaddleOCR
-import pytesseract
 from pdf2image import convert_from_bytes
 
-# 初始化 PaddleOCR（語言可調）
-OCR = PaddleOCR(use_angle_cls=True, lang='ch')  # 可設為 'ch', 'en', 'ch_en'
+import ocr_client
+from ocr_preprocess import preprocess
+from ocr_server import recognize_image
 
+# PaddleOCR 不再於 import 時建立：優先交給常駐的 OCR 伺服器 (ocr_server.py)，
+# 伺服器不可用時才在本程序中第一次使用時載入 (ocr_server.get_paddle)
 
-def image_preprocess_pil(pil_img: Image.Image, enlarge: bool = True, debug_dir: str = None) -> Image.Image: 
-    """ 預處理圖片：灰階 -> CLAHE 對比增強 -> 二值化 -> 去噪 -> deskew -> 放大 將每個步驟的圖片存檔到 debug_dir 方便排查 """ 
-    os.makedirs(debug_dir, exist_ok=True) if debug_dir else None
-    img = pil_img.convert('RGB')
-    if debug_dir:
-        img.save(os.path.join(debug_dir, 'original.png'))
-
-
-    arr = np.array(img)
-    gray = cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
-    if debug_dir:
-        Image.fromarray(gray).save(os.path.join(debug_dir, 'gray.png'))
-
-
-    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
-    cl = clahe.apply(gray)
-    if debug_dir:
-        Image.fromarray(cl).save(os.path.join(debug_dir, 'clahe.png'))
+# PDF 設定：點陣化解析度、文字層至少要有幾個字元才直接採用、同時 OCR 的頁數
+PDF_DPI = 200
+PDF_MIN_TEXT_CHARS = 20
+PDF_OCR_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
 
 
-    th = cv2.adaptiveThreshold(cl, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
-    if debug_dir:
-        Image.fromarray(th).save(os.path.join(debug_dir, 'threshold.png'))
+class OcrError(Exception):
+    """ OCR 引擎失敗 (找不到 Tesseract、影像無法辨識、PaddleOCR 錯誤等)；與「沒有辨識出文字」不同，呼叫端不應快取 """
 
 
-    deno = cv2.medianBlur(th, 3)
+def image_preprocess_pil(pil_img: Image.Image, enlarge: bool = True, debug_dir: str = None, variant: str = 'auto') -> Image.Image: 
+    """ 預處理圖片 (共用 ocr_preprocess 管線)，回傳 PIL 圖片；debug_dir 會存下每個步驟的圖片方便排查 """ 
     if debug_dir:
-        Image.fromarray(deno).save(os.path.join(debug_dir, 'denoise.png'))
-
-
-    coords = np.column_stack(np.where(deno > 0))
-    angle = 0.0
-    if coords.shape[0] > 0:
-        rect = cv2.minAreaRect(coords)
-        angle = rect[-1]
-        if angle < -45:
-            angle = -(90 + angle)
-        else:
-            angle = -angle
-
-
-    (h, w) = deno.shape
-    center = (w // 2, h // 2)
-    M = cv2.getRotationMatrix2D(center, angle, 1.0)
-    rotated = cv2.warpAffine(deno, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
-    if debug_dir:
-        Image.fromarray(rotated).save(os.path.join(debug_dir, 'deskew.png'))
-
-
-    pil_out = Image.fromarray(rotated)
-    if enlarge:
-        pil_out = pil_out.resize(
-        (int(pil_out.width * 1.5), int(pil_out.height * 1.5)),
-        Image.Resampling.BICUBIC
-        )
-    if debug_dir:
-        pil_out.save(os.path.join(debug_dir, 'resized.png'))
-
-
-    return pil_out
-
-def ocr_from_image_bytes(bytes_data: bytes, use_paddle: bool = True, tesseract_fallback: bool = False, debug_dir: str = None) -> str: 
-    """ 從影像或 PDF bytes 擷取文字 debug_dir 可指定輸出預處理後圖片 """ 
-    text_blocks = [] 
-    try: 
-        img = Image.open(io.BytesIO(bytes_data)) 
-    except Exception: 
-        pages = convert_from_bytes(bytes_data, dpi=200) 
-        if len(pages) == 0: 
-            return "" 
-        img = pages[0]
-    pre = image_preprocess_pil(img, debug_dir=debug_dir)
-    if use_paddle:
-        try:
-            res = OCR.ocr(np.array(pre), cls=True)
-            lines = []
-            for page in res:
-                for line in page:
-                    text = line[1][0] if len(line) > 1 else ''
-                    lines.append(text)
-                    text_blocks.append('\n'.join(lines))
-        except Exception as e:
-            print('PaddleOCR error:', e)
-    if tesseract_fallback and not text_blocks:
-        try:
-            ttxt = pytesseract.image_to_string(pre, lang='chi_sim+eng')
-            text_blocks.append(ttxt)
-        except Exception as e:
-            print('Tesseract error:', e)
-    return '\n'.join(text_blocks)
+        os.makedirs(debug_dir, exist_ok=True)
+        pil_img.convert('RGB').save(os.path.join(debug_dir, 'original.png'))
+    arr, _ = preprocess(pil_img, variant, enlarge=enlarge, debug_dir=debug_dir)
+    # arr 是共用緩衝區，轉成 PIL 前先複製
+    return Image.fromarray(arr.copy())
+
+def _ocr_image(img, payload=None, use_paddle=True, tesseract_fallback=False, debug_dir=None, hybrid=False) -> str:
+    """ 單張影像的 OCR：優先交給常駐伺服器，不可用 (或需要 debug 圖片) 時在本機辨識；失敗時拋出 OcrError """
+    # 'auto'：乾淨的截圖只做二值化，照片/掃描才做去噪、校正傾斜與放大
+    # hybrid：只有 PaddleOCR 信心偏低的文字框才交給 Tesseract 複查
+    options = dict(use_paddle=use_paddle, use_tesseract=tesseract_fallback, lang='chi_sim+eng', variant='auto', hybrid=hybrid)
+    if not debug_dir:
+        server_results = ocr_client.recognize([payload if payload is not None else img], **options)
+        if server_results is not None:
+            text, error = server_results[0]['text'], server_results[0]['error']
+            if error: raise OcrError(error)
+            return text
+    else:
+        os.makedirs(debug_dir, exist_ok=True)
+        img.convert('RGB').save(os.path.join(debug_dir, 'original.png'))
+    try:
+        return recognize_image(img, debug_dir=debug_dir, **options)
+    except Exception as e:
+        raise OcrError(str(e)) from e
+
+def _iter_pdf_pages(bytes_data: bytes, dpi: int):
+    """ 逐頁產出 (頁碼, 文字層, 點陣化函式)；文字層足夠時不點陣化，點陣化只在呼叫時才進行 """
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        pdfium = None
+    if pdfium is None:
+        # 沒有 pypdfium2：改用 pdf2image 一次只轉一頁 (無法取得文字層)
+        from pdf2image import pdfinfo_from_bytes
+        for page_number in range(1, pdfinfo_from_bytes(bytes_data)['Pages'] + 1):
+            render = lambda n=page_number: convert_from_bytes(bytes_data, dpi=dpi, first_page=n, last_page=n)[0]
+            yield page_number, '', render
+        return
+
+    pdf = pdfium.PdfDocument(bytes_data)
+    try:
+        for index in range(len(pdf)):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            text = textpage.get_text_range()
+            textpage.close()
+            def render(page=page):
+                # 複製一份：點陣圖的記憶體屬於 pdfium，頁面關閉後不應再被引用
+                return page.render(scale=dpi / 72).to_pil().copy()
+            yield index + 1, text, render
+            page.close()
+    finally:
+        pdf.close()
+
+def iter_pdf_text(bytes_data: bytes, use_paddle: bool = True, tesseract_fallback: bool = False, dpi: int = PDF_DPI, workers: int = None, hybrid: bool = False):
+    """
+    逐頁擷取 PDF 文字，依頁碼順序產出 (頁碼, 文字, 來源)，來源為 'text' (內嵌文字層) 或 'ocr'。
+    沒有文字層的頁面才點陣化並平行 OCR；同時存在記憶體中的點陣圖最多 workers * 2 張。
+    任一頁 OCR 失敗時拋出 OcrError。
+    pdfium 不是執行緒安全的，因此點陣化都在目前的執行緒中進行，只有 OCR 交給執行緒池。
+    """
+    workers = workers or PDF_OCR_WORKERS
+    pending = deque()   # (頁碼, 文字 或 Future, 來源)，依頁碼排列
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for page_number, text, render in _iter_pdf_pages(bytes_data, dpi):
+            if len(text.strip()) >= PDF_MIN_TEXT_CHARS:
+                pending.append((page_number, text, 'text'))
+            else:
+                # 進行中的 OCR 達上限時等待任一頁完成，避免點陣圖無限制堆積
+                # (只等待尚未完成的：已完成但排在未完成頁面後面的 Future 會讓 wait 立即返回而空轉)
+                running = [item for _, item, source in pending if source == 'ocr' and not item.done()]
+                while len(running) >= workers * 2:
+                    wait(running, return_when=FIRST_COMPLETED)
+                    running = [item for item in running if not item.done()]
+                image = render()
+                pending.append((page_number, executor.submit(_ocr_image, image, None, use_paddle, tesseract_fallback, None, hybrid), 'ocr'))
+            # 前面的頁面只要完成就先產出
+            while pending and (pending[0][2] == 'text' or pending[0][1].done()):
+                page_number, item, source = pending.popleft()
+                yield page_number, item if source == 'text' else item.result(), source
+        while pending:
+            page_number, item, source = pending.popleft()
+            yield page_number, item if source == 'text' else item.result(), source
+
+def ocr_from_image_bytes(bytes_data: bytes, use_paddle: bool = True, tesseract_fallback: bool = False, debug_dir: str = None, hybrid: bool = False) -> str: 
+    """ 從影像或 PDF bytes 擷取文字 debug_dir 可指定輸出預處理後圖片；PDF 會處理所有頁面；失敗時拋出 OcrError """ 
+    if bytes_data[:5] == b'%PDF-':
+        return '\n\n'.join(f"{'='*20} 第 {page_number} 頁 {'='*20}\n\n{text}"
+                           for page_number, text, _ in iter_pdf_text(bytes_data, use_paddle, tesseract_fallback, hybrid=hybrid))
+    img = Image.open(io.BytesIO(bytes_data)) 
+    # 影像檔直接把原始 bytes 交給伺服器，不必在這裡解碼
+    return _ocr_image(img, bytes_data, use_paddle, tesseract_fallback, debug_dir, hybrid)
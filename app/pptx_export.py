@@ -3,39 +3,44 @@ from pptx import Presentation
 from pptx.util import Inches, Pt
 from pptx.enum.text import PP_PARAGRAPH_ALIGNMENT
 
+from slide_builder import add_slide, new_paragraph
 
-def create_star_slide(prs: Presentation, title: str, star: dict):
-    slide_layout = prs.slide_layouts[5]  # blank
-    slide = prs.slides.add_slide(slide_layout)
-    left = Inches(0.5)
-    top = Inches(0.3)
-    width = Inches(9)
-    height = Inches(1)
-
-    title_box = slide.shapes.add_textbox(left, top, width, height)
-    tf = title_box.text_frame
-    p = tf.paragraphs[0]
-    p.text = title
+LEFT = Inches(0.5)
+# (段落標題, star 的鍵, 位置 y (英吋))
+STAR_SECTIONS = (
+    ('Situation', 'situation', 1.3),
+    ('Task', 'task', 3.0),
+    ('Action', 'action', 4.3),
+    ('Result', 'result', 6.0),
+)
+
+
+def _prepare_star_slide(slide):
+    """標題框與四個段落框 (含段落標題) 在每份簡報只建立一次，之後的投影片複製這個骨架"""
+    title_box = slide.shapes.add_textbox(LEFT, Inches(0.3), Inches(9), Inches(1))
+    p = title_box.text_frame.paragraphs[0]
     p.font.size = Pt(28)
     p.font.bold = True
 
-    def add_section(y, header, items):
-        box = slide.shapes.add_textbox(left, Inches(y), Inches(9), Inches(1.8))
-        tf = box.text_frame
-        h = tf.paragraphs[0]
+    for header, _, y in STAR_SECTIONS:
+        box = slide.shapes.add_textbox(LEFT, Inches(y), Inches(9), Inches(1.8))
+        h = box.text_frame.paragraphs[0]
         h.text = header
         h.font.size = Pt(16)
         h.font.bold = True
-        for it in items:
-            p = tf.add_paragraph()
-            p.text = '• ' + it
-            p.level = 1
-            p.font.size = Pt(14)
 
-    add_section(1.3, 'Situation', star.get('situation', []))
-    add_section(3.0, 'Task', star.get('task', []))
-    add_section(4.3, 'Action', star.get('action', []))
-    add_section(6.0, 'Result', star.get('result', []))
+
+def create_star_slide(prs: Presentation, title: str, star: dict):
+    slide_layout_index = 5  # blank
+    slide = add_slide(prs, slide_layout_index, _prepare_star_slide)
+    # 骨架中最後加入的五個形狀：標題框 + 四個段落框
+    title_box, *section_boxes = list(slide.shapes)[-1 - len(STAR_SECTIONS):]
+    title_box.text_frame.paragraphs[0].text = title
+
+    for box, (_, key, _) in zip(section_boxes, STAR_SECTIONS):
+        tx_body = box.text_frame._txBody
+        for it in star.get(key, []):
+            tx_body.append(new_paragraph('• ' + it, level=1, size_pt=14))
 
 
 def export_to_pptx(filename: str, title: str, star: dict, author: str = 'Report Helper'):
@@ -43,4 +48,4 @@ def export_to_pptx(filename: str, title: str, star: dict, author: str = 'Report
     create_star_slide(prs, title, star)
     prs.core_properties.author = author
     prs.save(filename)
-    return filename
\ No newline at end of file
+    return filename
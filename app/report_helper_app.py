@@ -5,7 +5,10 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 import streamlit as st
 from io import BytesIO
-from app.ocr_utils import ocr_from_image_bytes
+from app.ocr_utils import OcrError, ocr_from_image_bytes, iter_pdf_text
+import config
+import ocr_client
+from session_memo import content_hash, memoize
 from app.postprocess import clean_text, load_domain_dict, extract_key_sentences, simple_star_from_sentences, apply_domain_corrections
 from app.pptx_export import export_to_pptx
 import json
@@ -13,11 +16,19 @@ import os
 
 st.set_page_config(page_title='報告整理小幫手', layout='wide')
 
+@st.cache_resource
+def start_ocr_server():
+    # 每個 Streamlit 程序只啟動一次；OCR 模型留在常駐伺服器中，重新執行頁面不必重新載入
+    return ocr_client.start_server(preload_paddle=True)
+
+start_ocr_server()
+
 st.title('報告整理小幫手 (OCR -> STAR -> PPTX)')
 
 st.sidebar.header('設定')
 use_paddle = st.sidebar.checkbox('使用 PaddleOCR', value=True)
 use_tesseract = st.sidebar.checkbox('Tesseract 備援', value=True)
+use_hybrid = st.sidebar.checkbox('混合模式 (低信心區塊以 Tesseract 複查)', value=False)
 
 uploaded = st.file_uploader('上傳影像或 PDF（png/jpg/pdf）', type=['png','jpg','jpeg','pdf'])
 
@@ -32,8 +43,28 @@ if uploaded is not None:
     except Exception:
         st.write('PDF / binary file uploaded')
 
-    with st.spinner('進行 OCR...'):
-        raw_text = ocr_from_image_bytes(b, use_paddle=use_paddle, tesseract_fallback=use_tesseract)
+    def ocr_pdf():
+        # PDF 逐頁處理：有文字層的頁面直接取文字，其餘頁面平行 OCR，完成一頁就顯示進度
+        progress = st.empty()
+        page_texts = []
+        for page_number, page_text, source in iter_pdf_text(b, use_paddle=use_paddle, tesseract_fallback=use_tesseract, hybrid=use_hybrid):
+            page_texts.append(f"{'='*20} 第 {page_number} 頁 {'='*20}\n\n{page_text}")
+            progress.info(f"已完成第 {page_number} 頁 ({'文字層' if source == 'text' else 'OCR'})")
+        progress.empty()
+        return '\n\n'.join(page_texts)
+
+    def ocr_image():
+        with st.spinner('進行 OCR...'):
+            return ocr_from_image_bytes(b, use_paddle=use_paddle, tesseract_fallback=use_tesseract, hybrid=use_hybrid)
+
+    # 編輯下方的文字框等任何操作都會重新執行整個腳本：同一份檔案與 OCR 選項在這個 session 中只辨識一次
+    # (辨識失敗時 memoize 不會保存結果，重新上傳或重新執行會再試一次)
+    try:
+        raw_text = memoize(st.session_state, 'ocr_memo', (content_hash(b), use_paddle, use_tesseract, use_hybrid),
+                           ocr_pdf if b[:5] == b'%PDF-' else ocr_image, config.STREAMLIT_OCR_MEMO_ENTRIES)
+    except OcrError as e:
+        st.error(f'OCR 辨識失敗：{e}')
+        st.stop()
     if not raw_text.strip():
         st.error('OCR 未擷取到文字，請嘗試調整上傳圖片或使用更高解析度掃描。')
     raw_text = clean_text(raw_text)
@@ -2,10 +2,14 @@
 
 import os
 import sys
-import threading
 import time
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageGrab
+
+import config
+import tracing
+from services import SUPPORTED_EXTENSIONS, build_final_prompt, ThinkTagFilter, strip_think_blocks
+from job_queue import (Job, JobScheduler, JOB_SERVICE, JOB_OCR, JOB_LLM, JOB_PPTX, JOB_IO,
+                       PRIORITY_HIGH)
 
 class AppController:
     def __init__(self, ui, services, prompts, base_path, ollama_manager):
@@ -14,6 +18,9 @@ class AppController:
         self.prompts = prompts
         self.base_path = base_path
         self.ollama_manager = ollama_manager
+        # 所有耗時工作都交給排程器；背景執行緒的結果由 UI 執行緒定時取出 (見 job_queue.py)
+        self.jobs = JobScheduler(workers=config.JOB_WORKERS)
+        self._generation_job = None
 
     # --- 新增：將啟動邏輯移到這裡 ---
     def start_background_tasks(self):
@@ -22,22 +29,37 @@ class AppController:
             print("錯誤：UI 尚未初始化，無法啟動背景任務。")
             return
             
+        self.jobs.attach(self.ui.root)
         self.ui.update_status("正在啟動 Ollama 服務，請稍候...", "info")
-        threading.Thread(target=self._ollama_status_worker, daemon=True).start()
+        self.jobs.submit(Job(JOB_SERVICE, self._ollama_status_worker, PRIORITY_HIGH))
+
+    def shutdown(self):
+        """關閉程式前取消所有背景工作"""
+        self.jobs.shutdown()
+
+    @staticmethod
+    def _traced(name, worker):
+        """以 tracing.run 包裝背景工作：on_success 收到 (worker 的回傳值, 各階段耗時說明)"""
+        def run(job):
+            with tracing.run(name) as trace:
+                result = worker(job)
+            return result, trace.summary()
+        return run
 
-    def _ollama_status_worker(self):
+    def _ollama_status_worker(self, job):
         """在背景執行緒中檢查 Ollama 服務狀態"""
         if not self.ollama_manager.start_server_non_blocking():
-            self.ui.root.after(0, self._on_ollama_failed)
+            job.post(self._on_ollama_failed)
             return
 
         if self.ollama_manager.started_by_app:
             print("正在後台等待 Ollama 服務就緒...")
-            while not self.ollama_manager._is_server_running():
-                time.sleep(2)
+            if not self.ollama_manager.wait_until_ready():
+                job.post(self._on_ollama_failed)
+                return
             print("後台偵測到 Ollama 服務已就緒！")
 
-        self.ui.root.after(0, self._on_ollama_ready)
+        job.post(self._on_ollama_ready)
 
     def _on_ollama_ready(self):
         """Ollama 準備就緒後的回呼函數 (在 UI 執行緒中執行)"""
@@ -55,6 +77,7 @@ class AppController:
         if filepaths: self.process_file_list(filepaths)
 
     def handle_upload_or_paste(self):
+        from PIL import Image, ImageGrab
         try:
             image = ImageGrab.grabclipboard()
             if isinstance(image, Image.Image):
@@ -68,33 +91,100 @@ class AppController:
 
     def process_clipboard_image(self, image):
         self.ui.update_status("正在辨識剪貼簿圖片...", "info")
-        try:
-            if self.ui.get_input_text():
+
+        def worker(job):
+            # 服務的建立 (第一次使用時) 與快取統計的查詢都在背景工作中進行
+            file_processor = self.services['file_processor']
+            return file_processor.process_image_object(image), file_processor.ocr_cache_summary()
+
+        def on_success(result):
+            (extracted_text, summary), timing = result
+            if self.ui.has_input_text():
                 self.ui.set_input_text(f"\n\n{'='*20} 來自剪貼簿的新增圖片 {'='*20}\n\n", append=True)
-            
-            extracted_text = self.services['file_processor'].process_image_object(image)
             self.ui.set_input_text(extracted_text, append=True)
-            self.ui.update_status("剪貼簿圖片辨識完成！", "success")
-        except Exception as e: self.show_error("處理剪貼簿圖片失敗", e)
+            self.ui.update_status(f"剪貼簿圖片辨識完成！{timing} ({summary})", "success")
+
+        # 單張剪貼簿圖片是使用者正在等待的操作，優先於整批檔案
+        self.jobs.submit(Job(JOB_IO, self._traced('clipboard', worker), PRIORITY_HIGH,
+                             on_success=on_success, on_error=lambda e: self.show_error("處理剪貼簿圖片失敗", e)))
 
     def process_file_list(self, filepaths):
+        if self.jobs.is_busy(JOB_OCR):
+            self.show_warning("處理中", "前一批檔案仍在辨識中，請稍候再試。")
+            return
+        if config.OCR_MAX_WORKERS <= 1:
+            self.ui.set_input_text("")
+            self.jobs.submit(Job(JOB_OCR, lambda job: self._process_file_list_sequential(job, filepaths),
+                                 on_error=lambda e: self.show_error("批次辨識失敗", e)))
+            return
+
+        supported = [p for p in filepaths if os.path.splitext(p)[1].lower() in SUPPORTED_EXTENSIONS]
+        skipped = [os.path.basename(p) for p in filepaths if p not in supported]
+        if skipped:
+            self.show_warning("不支援的格式", "已跳過不支援的檔案格式:\n" + "\n".join(skipped))
+        if not supported: return
+
         self.ui.set_input_text("")
+        self.ui.update_status(f"平行辨識中 0/{len(supported)}...", "info")
+        self.jobs.submit(Job(JOB_OCR, lambda job: self._file_list_worker(job, supported),
+                             on_error=lambda e: self.show_error("批次辨識失敗", e),
+                             on_cancel=lambda: self.ui.update_status("已取消檔案辨識。", "warning")))
+
+    def _file_list_worker(self, job, filepaths):
+        """在背景執行緒中收集程序池的結果，並依原始順序交回 UI 執行緒"""
+        total = len(filepaths)
+        def on_progress(done, total):
+            job.post(self.ui.update_status, f"平行辨識中 {done}/{total}...", "info")
+        # 平行辨識在子程序中進行，只記錄整批的耗時
+        with tracing.run('files', files=total) as trace, tracing.span('ocr.batch', files=total):
+            for i, content, error in self.services['file_processor'].iter_files_in_order(filepaths, on_progress=on_progress):
+                if job.cancelled: return
+                job.post(self._append_file_result, i, filepaths[i], content, error)
+        summary = self.services['file_processor'].ocr_cache_summary()
+        job.post(self.ui.update_status, f"全部 {total} 個檔案處理完成！{trace.summary()} ({summary})", "success")
+
+    def _append_file_result(self, index, file_path, content, error):
+        """將單一檔案的結果附加到輸入框 (在 UI 執行緒中執行)"""
+        if index > 0: self.ui.set_input_text(f"\n\n{'='*20} 檔案 {index+1} {'='*20}\n\n", append=True)
+        if error is not None:
+            self.show_error(f"處理檔案 {os.path.basename(file_path)} 失敗", error)
+            return
+        self.ui.set_input_text(content, append=True)
+
+    def _process_file_list_sequential(self, job, filepaths):
+        """原本的循序處理流程 (OCR_MAX_WORKERS 設為 1 時使用，於背景工作中執行)"""
+        from PIL import Image
         total_files = len(filepaths)
-        for i, file_path in enumerate(filepaths):
-            if i > 0: self.ui.set_input_text(f"\n\n{'='*20} 檔案 {i+1} {'='*20}\n\n", append=True)
-            self.ui.update_status(f"處理中 {i+1}/{total_files}: {os.path.basename(file_path)}", "info")
-            try:
-                file_ext = os.path.splitext(file_path)[1].lower()
-                content = ""
-                if file_ext in ['.png', '.jpg', '.jpeg']: content = self.services['file_processor'].process_image_object(Image.open(file_path))
-                elif file_ext == '.txt': content = self.services['file_processor'].process_text_file(file_path)
-                elif file_ext == '.msg': content = self.services['file_processor'].process_msg_file(file_path)
-                else:
-                    self.show_warning("不支援的格式", f"已跳過不支援的檔案格式: {file_ext}")
-                    continue
-                self.ui.set_input_text(content, append=True)
-            except Exception as e: self.show_error(f"處理檔案 {os.path.basename(file_path)} 失敗", e)
-        self.ui.update_status(f"全部 {total_files} 個檔案處理完成！", "success")
+        with tracing.run('files', files=total_files) as trace:
+            for i, file_path in enumerate(filepaths):
+                if job.cancelled: return
+                if i > 0: job.post(self.ui.set_input_text, f"\n\n{'='*20} 檔案 {i+1} {'='*20}\n\n", True)
+                job.post(self.ui.update_status, f"處理中 {i+1}/{total_files}: {os.path.basename(file_path)}", "info")
+                try:
+                    file_ext = os.path.splitext(file_path)[1].lower()
+                    content = ""
+                    if file_ext in ['.png', '.jpg', '.jpeg']: content = self.services['file_processor'].process_image_object(Image.open(file_path))
+                    elif file_ext == '.txt': content = self.services['file_processor'].process_text_file(file_path)
+                    elif file_ext == '.msg': content = self.services['file_processor'].process_msg_file(file_path)
+                    else:
+                        job.post(self.show_warning, "不支援的格式", f"已跳過不支援的檔案格式: {file_ext}")
+                        continue
+                    job.post(self.ui.set_input_text, content, True)
+                except Exception as e: job.post(self.show_error, f"處理檔案 {os.path.basename(file_path)} 失敗", e)
+        job.post(self.ui.update_status, f"全部 {total_files} 個檔案處理完成！{trace.summary()} ({self.services['file_processor'].ocr_cache_summary()})", "success")
+
+    def handle_clear_ocr_cache(self):
+        # 快取統計要查詢 SQLite：先在背景工作中取得，回到 UI 執行緒後才顯示確認對話框
+        self.jobs.submit(Job(JOB_IO, lambda job: self.services['file_processor'].ocr_cache_summary(), PRIORITY_HIGH,
+                             on_success=self._confirm_clear_ocr_cache,
+                             on_error=lambda e: self.show_error("讀取 OCR 快取失敗", e)))
+
+    def _confirm_clear_ocr_cache(self, summary):
+        if not messagebox.askyesno("清除 OCR 快取", f"目前{summary}。\n確定要清除所有已快取的辨識結果嗎？"):
+            return
+        self.jobs.submit(Job(JOB_IO, lambda job: self.services['file_processor'].clear_ocr_cache(), PRIORITY_HIGH,
+                             on_success=lambda _: self.ui.update_status("OCR 快取已清除。", "success"),
+                             on_error=lambda e: self.show_error("清除 OCR 快取失敗", e)))
 
     def handle_ollama_generation(self, prompt_type):
         input_content = self.ui.get_input_text()
@@ -104,33 +194,119 @@ class AppController:
 
         base_prompt = self.prompts[prompt_type]
         project_name = self.ui.get_project_name()
-        project_info = f"The user has specified the project name is: '{project_name}'." if project_name else "The user did not specify a project name."
-        final_prompt = base_prompt.replace("{PROJECT_NAME_HOLDER}", project_info)
-        full_prompt = f"{final_prompt}\n\n{input_content}"
-        
+        final_prompt = build_final_prompt(base_prompt, project_name)
+        use_cache = not self.ui.get_force_regenerate()
+
+        # 快取查詢 (SQLite) 與服務的建立都在背景工作中進行，不佔用 UI 執行緒
         self.ui.update_status("正在呼叫 Ollama 模型生成報告...", "info")
         self.ui.set_generator_buttons_state("disabled")
-        threading.Thread(target=self._ollama_worker, args=(full_prompt,)).start()
+        self.ui.set_cancel_button_state("normal")
+        hide_think = self.ui.get_hide_think()
+        if config.OLLAMA_STREAM:
+            self.ui.set_genai_output_text("")
+            worker = lambda job: self._ollama_stream_worker(job, final_prompt, input_content, use_cache, hide_think)
+        else:
+            worker = lambda job: self._ollama_worker(job, final_prompt, input_content, use_cache, hide_think)
+        self._generation_job = self.jobs.submit(Job(
+            JOB_LLM, self._traced('generate', worker),
+            on_success=self._on_generation_success,
+            on_error=lambda e: self.show_error("Ollama 生成失敗", e),
+            on_cancel=lambda: self.ui.update_status("已取消生成。", "warning"),
+            on_finished=self._on_generation_finished))
 
-    def _ollama_worker(self, prompt):
-        try:
-            generated_text = self.services['ollama'].generate(prompt)
-            self.ui.root.after(0, self.ui.set_genai_output_text, generated_text)
-            self.ui.root.after(0, self.ui.update_status, "Ollama 報告生成成功！", "success")
-        except Exception as e:
-            self.ui.root.after(0, self.show_error, "Ollama 生成失敗", e)
-        finally:
-            self.ui.root.after(0, self.ui.set_generator_buttons_state, "normal")
+    def _on_generation_success(self, result):
+        (summary, from_cache), timing = result
+        if from_cache: self.ui.update_status(f"已從快取取得報告！({summary})", "success")
+        else: self.ui.update_status(f"Ollama 報告生成成功！{timing} ({summary})", "success")
+
+    def _cached_full_response(self, job, full_prompt, hide_think):
+        """(背景工作中) 完整 Prompt 已在回應快取中時，直接把結果交給 UI 執行緒並回傳 True"""
+        cached_text = self.services['ollama'].get_cached_response(full_prompt)
+        if cached_text is None: return False
+        if not job.cancelled: job.post(self.ui.set_genai_output_text, strip_think_blocks(cached_text) if hide_think else cached_text)
+        return True
+
+    def _prepare_prompt(self, job, final_prompt, input_content):
+        """在背景工作中決定實際 Prompt；輸入過長時會先分段擷取重點並回報進度"""
+        ollama = self.services['ollama']
+        if ollama.needs_chunking(f"{final_prompt}\n\n{input_content}"):
+            job.post(self.ui.update_status, "輸入內容超過模型上下文長度，正在分段擷取重點...", "info")
+        def on_progress(done, total):
+            job.post(self.ui.update_status, f"分段擷取重點中 {done}/{total}...", "info")
+        return ollama.prepare_prompt(final_prompt, input_content, self.prompts['chunk_extract'], job.cancel_token, on_progress)
+
+    def _ollama_stream_worker(self, job, final_prompt, input_content, use_cache, hide_think):
+        """以串流模式生成：每個 chunk 交給 UI 執行緒附加到輸出框 (由 TextModel 合併後批次寫入)"""
+        think_filter = ThinkTagFilter() if hide_think else None
+        start_time = time.perf_counter()
+        received_first = False
+
+        def push(text):
+            if text: job.post(self.ui.append_genai_output_text, text)
+
+        def on_chunk(chunk):
+            nonlocal received_first
+            if not received_first:
+                received_first = True
+                elapsed = time.perf_counter() - start_time
+                hint = "，推理中..." if hide_think else "..."
+                job.post(self.ui.update_status, f"模型已開始回應 ({elapsed:.1f} 秒){hint}", "info")
+            push(think_filter.feed(chunk) if think_filter else chunk)
+
+        full_prompt = f"{final_prompt}\n\n{input_content}"
+        if use_cache and self._cached_full_response(job, full_prompt, hide_think):
+            return self.services['ollama'].response_cache_summary(), True
+        prompt = self._prepare_prompt(job, final_prompt, input_content)
+        # 分段彙整時，最後的彙整 Prompt 也可能已在快取中
+        cached_text = self.services['ollama'].get_cached_response(prompt) if use_cache and prompt != full_prompt else None
+        if cached_text is not None:
+            on_chunk(cached_text)
+        else:
+            self.services['ollama'].generate_stream(prompt, on_chunk, job.cancel_token)
+        if think_filter: push(think_filter.flush())
+        return self.services['ollama'].response_cache_summary(), False
+
+    def _on_generation_finished(self):
+        self._generation_job = None
+        self.ui.set_cancel_button_state("disabled")
+        self.ui.set_generator_buttons_state("normal")
+
+    def handle_cancel_generation(self):
+        if self._generation_job is None: return
+        self.ui.update_status("正在取消生成...", "warning")
+        self._generation_job.cancel()
+
+    def _ollama_worker(self, job, final_prompt, input_content, use_cache, hide_think=False):
+        full_prompt = f"{final_prompt}\n\n{input_content}"
+        if use_cache and self._cached_full_response(job, full_prompt, hide_think):
+            return self.services['ollama'].response_cache_summary(), True
+        prompt = self._prepare_prompt(job, final_prompt, input_content)
+        generated_text = self.services['ollama'].generate(prompt, use_cache=use_cache and prompt != full_prompt)
+        if hide_think: generated_text = strip_think_blocks(generated_text)
+        if not job.cancelled: job.post(self.ui.set_genai_output_text, generated_text)
+        return self.services['ollama'].response_cache_summary(), False
 
     def handle_ppt_generation(self):
+        # 文字與專案名稱必須在 UI 執行緒讀取；存檔 (可能要解壓、複製整份簡報) 交給背景工作
         genai_text = self.ui.get_genai_output()
         project_name = self.ui.get_project_name()
         pptx_path = os.path.join(self.base_path, self.services['pptx_filename'])
-        try:
-            count = self.services['pptx'].add_to_presentation(pptx_path, genai_text, project_name)
+        if self.jobs.is_busy(JOB_PPTX):
+            self.show_warning("處理中", "前一份簡報仍在儲存中，請稍候再試。")
+            return
+        self.ui.update_status("正在新增投影片...", "info")
+
+        def on_success(result):
+            count, timing = result
+            self.ui.update_status(f"已新增 {count} 張投影片。{timing}", "success")
             messagebox.showinfo("新增成功", f"成功將 {count} 張投影片新增至\n'{os.path.basename(pptx_path)}'！")
-        except PermissionError: self.show_error("權限錯誤", f"無法儲存檔案 '{os.path.basename(pptx_path)}'。\n請先將該 PowerPoint 檔案關閉！")
-        except Exception as e: self.show_error("生成 PPT 失敗", e)
+
+        def on_error(e):
+            if isinstance(e, PermissionError): self.show_error("權限錯誤", f"無法儲存檔案 '{os.path.basename(pptx_path)}'。\n請先將該 PowerPoint 檔案關閉！")
+            else: self.show_error("生成 PPT 失敗", e)
+
+        self.jobs.submit(Job(JOB_PPTX, self._traced('pptx', lambda job: self.services['pptx'].add_to_presentation(pptx_path, genai_text, project_name)),
+                             on_success=on_success, on_error=on_error))
 
     def show_error(self, title, message):
         messagebox.showerror(title, message)
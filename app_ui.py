@@ -6,6 +6,9 @@ from ttkbootstrap.widgets.scrolled import ScrolledText
 from ttkbootstrap.constants import *
 from tkinterdnd2 import DND_FILES
 
+import config
+from text_model import TextModel
+
 class AppUI:
     def __init__(self, root, controller):
         self.root = root
@@ -45,6 +48,8 @@ class AppUI:
         upload_paste_frame.pack(fill=X, pady=(0, 10))
         self.upload_button = ttk.Button(upload_paste_frame, text="1. 上傳/貼上", command=self.controller.handle_upload_or_paste, bootstyle="info")
         self.upload_button.pack(side=LEFT, padx=(0, 5))
+        self.clear_cache_button = ttk.Button(upload_paste_frame, text="清除 OCR 快取", command=self.controller.handle_clear_ocr_cache, bootstyle="secondary-outline")
+        self.clear_cache_button.pack(side=RIGHT)
         self.status_label = ttk.Label(upload_paste_frame, text="請上傳、貼上或拖曳檔案至此...", bootstyle="primary")
         self.status_label.pack(side=LEFT, padx=10)
 
@@ -52,7 +57,11 @@ class AppUI:
         text_frame.pack(fill=BOTH, expand=True, pady=(0, 10))
         self.text_area = ScrolledText(text_frame, wrap=WORD, autohide=True)
         self.text_area.pack(fill=BOTH, expand=True)
+        self.input_model = TextModel(self.root, self.text_area)
         
+        self.force_regenerate_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(parent, text="強制重新生成 (不使用快取結果)", variable=self.force_regenerate_var).pack(anchor=W, pady=(0, 5))
+
         button_frame = ttk.Frame(parent)
         button_frame.pack(fill=X, ipady=5)
         
@@ -64,10 +73,18 @@ class AppUI:
         self.multi_button.pack(side=LEFT, fill=X, expand=True, padx=(5, 0))
 
     def create_right_panel(self, parent):
+        toolbar_frame = ttk.Frame(parent)
+        toolbar_frame.pack(fill=X, pady=(0, 5))
+        self.hide_think_var = tk.BooleanVar(value=config.OLLAMA_HIDE_THINK)
+        ttk.Checkbutton(toolbar_frame, text="隱藏 <think> 推理過程", variable=self.hide_think_var, bootstyle="round-toggle").pack(side=LEFT)
+        self.cancel_button = ttk.Button(toolbar_frame, text="取消生成", command=self.controller.handle_cancel_generation, bootstyle="warning-outline", state="disabled")
+        self.cancel_button.pack(side=RIGHT)
+
         genai_frame = ttk.Labelframe(parent, text="步驟 C: Ollama 生成結果", padding=5)
         genai_frame.pack(fill=BOTH, expand=True, pady=(0, 10))
         self.genai_output_area = ScrolledText(genai_frame, wrap=WORD, autohide=True)
         self.genai_output_area.pack(fill=BOTH, expand=True)
+        self.output_model = TextModel(self.root, self.genai_output_area, flush_ms=config.OLLAMA_STREAM_FLUSH_MS, follow=True)
 
         self.ppt_button = ttk.Button(parent, text="步驟 D: 新增至彙總簡報", command=self.controller.handle_ppt_generation, bootstyle="danger")
         self.ppt_button.pack(fill=X, ipady=5)
@@ -80,16 +97,21 @@ class AppUI:
         self.left_frame.config(background=self.original_bg)
 
     def get_project_name(self): return self.project_name_entry.get().strip()
-    def get_input_text(self): return self.text_area.get("1.0", tk.END).strip()
-    def get_genai_output(self): return self.genai_output_area.get("1.0", tk.END).strip()
+    # 文字框的內容由 TextModel 保存，讀寫都不直接操作 widget (見 text_model.py)
+    def get_input_text(self): return self.input_model.get().strip()
+    def has_input_text(self): return len(self.input_model) > 0
+    def get_genai_output(self): return self.output_model.get().strip()
 
     def set_input_text(self, text, append=False):
-        if not append: self.text_area.delete('1.0', tk.END)
-        self.text_area.insert(tk.END, text)
+        if append: self.input_model.append(text)
+        else: self.input_model.set(text)
+
+    def set_genai_output_text(self, text): self.output_model.set(text)
+    def append_genai_output_text(self, text): self.output_model.append(text)
 
-    def set_genai_output_text(self, text):
-        self.genai_output_area.delete('1.0', tk.END)
-        self.genai_output_area.insert(tk.END, text)
+    def get_hide_think(self): return self.hide_think_var.get()
+    def get_force_regenerate(self): return self.force_regenerate_var.get()
+    def set_cancel_button_state(self, state): self.cancel_button.config(state=state)
 
     def update_status(self, text, style="primary"):
         self.status_label.config(text=text, bootstyle=style)
@@ -0,0 +1,302 @@
+# batch_cli.py
+# 無介面的批次處理入口：資料夾 -> OCR -> Ollama -> PPTX
+#
+# 用法範例：
+#   python batch_cli.py D:\Projects --prompt multi --ocr-workers 6 --llm-workers 1
+#
+# 每個含有支援檔案 (.png/.jpg/.jpeg/.txt/.msg) 的資料夾視為一個專案，資料夾名稱即專案名稱。
+# 進度記錄在 job manifest (JSON) 中，程式中斷後以相同參數重新執行即可從中斷處繼續。
+# 所有專案完成後才寫入簡報；每個專案的投影片只會寫入一次 (重新生成的專案會再附加新版本)。
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import config
+from services import (FileProcessorService, OllamaService, PptxService, SUPPORTED_EXTENSIONS,
+                      build_final_prompt, strip_think_blocks)
+
+MANIFEST_VERSION = 1
+DEFAULT_MANIFEST_NAME = '.reporthelper_batch.json'
+
+class JobManifest:
+    """
+    批次工作的進度檔。
+    - 完整內容 (快照) 以「寫入暫存檔 + os.replace」保存，避免中斷時檔案損毀；只在各階段開始/結束時寫入
+    - 每個檔案/專案的更新只附加一行到日誌檔 (<path>.log)，不必每次重寫整份快照 (含所有 OCR 文字與生成結果)；
+      讀取時先載入快照再依序套用日誌，寫入新的快照後清空日誌
+    """
+    def __init__(self, path, input_dir, prompt_type, model):
+        self.path = path
+        self.journal_path = f"{path}.log"
+        self._lock = threading.Lock()
+        self._journal = None
+        self.data = {
+            'version': MANIFEST_VERSION,
+            'input_dir': input_dir,
+            'prompt_type': prompt_type,
+            'model': model,
+            'files': {},
+            'projects': {},
+            # 正在寫入簡報的專案 (見 begin_pptx)；中斷後依簡報檔是否已被取代判斷是否寫入完成
+            'pptx_pending': None,
+        }
+
+    def load(self):
+        """讀取既有進度；若參數不同 (不同資料夾、Prompt 或模型) 則不沿用"""
+        if not os.path.exists(self.path): return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"無法讀取進度檔，將重新開始: {e}")
+            return False
+        for key in ('version', 'input_dir', 'prompt_type', 'model'):
+            if saved.get(key) != self.data[key]:
+                print(f"進度檔的 {key} 與本次參數不同，將重新開始。")
+                return False
+        # 舊版進度檔只記錄整份簡報是否已寫入：視為當時所有完成的專案都已寫入
+        if saved.pop('pptx_saved', False):
+            for state in saved['projects'].values():
+                if state.get('status') == 'done': state['written_hash'] = state.get('prompt_hash')
+        saved.setdefault('pptx_pending', None)
+        self.data = saved
+        self._replay_journal()
+        return True
+
+    def _replay_journal(self):
+        if not os.path.exists(self.journal_path): return
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break   # 中斷時寫到一半的最後一行
+                self.data[entry['section']][entry['key']] = entry['value']
+
+    def save(self):
+        """寫入完整快照並清空日誌"""
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if os.path.exists(self.journal_path): os.remove(self.journal_path)
+
+    def close(self):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+    def update(self, section, key, **values):
+        """取代 data[section][key] 並附加到日誌"""
+        with self._lock:
+            self.data[section][key] = values
+            self._append_journal(section, key, values)
+
+    def _append_journal(self, section, key, value):
+        if self._journal is None:
+            self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self._journal.write(json.dumps({'section': section, 'key': key, 'value': value}, ensure_ascii=False) + '\n')
+        self._journal.flush()
+
+    def begin_pptx(self, output_path, written):
+        """寫入簡報前記錄 {專案: prompt_hash} 與簡報檔目前的狀態"""
+        with self._lock:
+            self.data['pptx_pending'] = {'output': output_path, 'before': _file_signature(output_path), 'projects': written}
+        self.save()
+
+    def finish_pptx(self):
+        """簡報寫入完成：把待寫入的專案標記為已寫入 (與清除 pptx_pending 一起存檔)"""
+        with self._lock:
+            pending = self.data['pptx_pending']
+            for rel_dir, prompt_hash in pending['projects'].items():
+                state = self.data['projects'].get(rel_dir)
+                if state is not None: state['written_hash'] = prompt_hash
+            self.data['pptx_pending'] = None
+        self.save()
+
+    def recover_pptx(self):
+        """
+        上次在寫入簡報時中斷：簡報以原子性取代的方式寫入，檔案已改變表示已寫入完成，否則稍後重新寫入。
+        """
+        pending = self.data['pptx_pending']
+        if not pending: return
+        if _file_signature(pending['output']) != pending['before']:
+            print("[PPTX] 上次中斷前已寫入簡報，更新進度。")
+            self.finish_pptx()
+        else:
+            with self._lock:
+                self.data['pptx_pending'] = None
+            self.save()
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+def discover_projects(input_dir):
+    """回傳 {專案相對路徑: [檔案絕對路徑, ...]}，檔案依名稱排序"""
+    projects = {}
+    for dirpath, dirnames, filenames in os.walk(input_dir):
+        dirnames.sort()
+        files = sorted(f for f in filenames if os.path.splitext(f)[1].lower() in SUPPORTED_EXTENSIONS)
+        if files:
+            rel_dir = os.path.relpath(dirpath, input_dir)
+            projects[rel_dir] = [os.path.join(dirpath, f) for f in files]
+    return projects
+
+def project_display_name(input_dir, rel_dir):
+    return os.path.basename(os.path.abspath(input_dir)) if rel_dir == '.' else os.path.basename(rel_dir)
+
+def combine_file_texts(texts):
+    """與 GUI 拖曳多個檔案時相同的分隔格式"""
+    parts = []
+    for i, text in enumerate(texts):
+        if i > 0: parts.append(f"\n\n{'='*20} 檔案 {i+1} {'='*20}\n\n")
+        parts.append(text)
+    return ''.join(parts)
+
+def run_ocr_stage(manifest, input_dir, projects, file_processor):
+    pending = [path for files in projects.values() for path in files
+               if manifest.data['files'].get(os.path.relpath(path, input_dir), {}).get('status') != 'done']
+    total_files = sum(len(files) for files in projects.values())
+    print(f"[OCR] 共 {total_files} 個檔案，其中 {len(pending)} 個需要處理。")
+    if not pending: return
+
+    for i, content, error in file_processor.iter_files_in_order(pending):
+        rel_path = os.path.relpath(pending[i], input_dir)
+        if error is None:
+            manifest.update('files', rel_path, status='done', text=content)
+            print(f"[OCR] ({i+1}/{len(pending)}) {rel_path}")
+        else:
+            manifest.update('files', rel_path, status='error', error=str(error))
+            print(f"[OCR] ({i+1}/{len(pending)}) {rel_path} 失敗: {error}")
+
+def run_llm_stage(manifest, input_dir, projects, ollama, base_prompt, extract_prompt, llm_workers):
+    jobs = {}
+    for rel_dir, files in projects.items():
+        texts = [manifest.data['files'][os.path.relpath(p, input_dir)].get('text') for p in files]
+        texts = [t for t in texts if t]
+        if not texts:
+            print(f"[LLM] {rel_dir}: 沒有可用的文字，略過。")
+            continue
+        project_name = project_display_name(input_dir, rel_dir)
+        final_prompt = build_final_prompt(base_prompt, project_name)
+        input_content = combine_file_texts(texts)
+        prompt_hash = hashlib.sha256(f"{final_prompt}\n\n{input_content}".encode('utf-8')).hexdigest()
+        state = manifest.data['projects'].get(rel_dir, {})
+        if state.get('status') == 'done' and state.get('prompt_hash') == prompt_hash:
+            continue
+        jobs[rel_dir] = (project_name, final_prompt, input_content, prompt_hash)
+
+    print(f"[LLM] 共 {len(projects)} 個專案，其中 {len(jobs)} 個需要生成 (同時 {llm_workers} 個)。")
+    if not jobs: return
+
+    def generate(rel_dir, project_name, final_prompt, input_content, prompt_hash):
+        start_time = time.perf_counter()
+        # 過長的輸入會先分段擷取重點，再做最後的 STAR 彙整
+        prompt = ollama.prepare_prompt(final_prompt, input_content, extract_prompt)
+        text = strip_think_blocks(ollama.generate(prompt))
+        return rel_dir, project_name, prompt_hash, text, time.perf_counter() - start_time
+
+    with ThreadPoolExecutor(max_workers=llm_workers) as executor:
+        futures = {executor.submit(generate, rel_dir, *job): rel_dir for rel_dir, job in jobs.items()}
+        for future in as_completed(futures):
+            rel_dir = futures[future]
+            try:
+                _, project_name, prompt_hash, text, elapsed = future.result()
+                # 保留上次寫入簡報的 prompt_hash：與新的 prompt_hash 不同時才會再寫入簡報
+                written_hash = manifest.data['projects'].get(rel_dir, {}).get('written_hash')
+                manifest.update('projects', rel_dir, status='done', project_name=project_name,
+                                prompt_hash=prompt_hash, output=text, written_hash=written_hash)
+                print(f"[LLM] {rel_dir} 完成 ({elapsed:.0f} 秒)")
+            except Exception as e:
+                written_hash = manifest.data['projects'].get(rel_dir, {}).get('written_hash')
+                manifest.update('projects', rel_dir, status='error', error=str(e), written_hash=written_hash)
+                print(f"[LLM] {rel_dir} 失敗: {e}")
+
+def run_pptx_stage(manifest, pptx_service, output_path):
+    """只附加新的或重新生成過的專案 (prompt_hash 與上次寫入時不同)；已寫入的投影片不會重複寫入"""
+    manifest.recover_pptx()
+    pending = {rel_dir: state['prompt_hash'] for rel_dir, state in sorted(manifest.data['projects'].items())
+               if state.get('status') == 'done' and state.get('output') and state.get('written_hash') != state.get('prompt_hash')}
+    if not pending:
+        print("[PPTX] 沒有新的報告需要寫入。")
+        return
+    reports = [(manifest.data['projects'][rel_dir]['output'], manifest.data['projects'][rel_dir]['project_name'])
+               for rel_dir in pending]
+    manifest.begin_pptx(output_path, pending)
+    count = pptx_service.add_reports_to_presentation(output_path, reports)
+    manifest.finish_pptx()
+    print(f"[PPTX] 已將 {len(pending)} 個專案的 {count} 張投影片寫入 {output_path}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="報告整理小幫手 - 批次處理 (資料夾 -> OCR -> Ollama -> PPTX)")
+    parser.add_argument('input_dir', help="要處理的根資料夾，每個含有檔案的子資料夾視為一個專案")
+    parser.add_argument('--output', help=f"輸出簡報路徑 (預設為 <input_dir>/{config.MASTER_PPTX_FILENAME})")
+    parser.add_argument('--prompt', choices=('single', 'multi'), default='multi', help="使用的 Prompt 模板 (預設 multi)")
+    parser.add_argument('--ocr-workers', type=int, default=config.OCR_MAX_WORKERS, help="同時進行 OCR 的子程序數")
+    parser.add_argument('--llm-workers', type=int, default=1, help="同時送出的 Ollama 請求數")
+    parser.add_argument('--manifest', help=f"進度檔路徑 (預設為 <input_dir>/{DEFAULT_MANIFEST_NAME})")
+    parser.add_argument('--restart', action='store_true', help="忽略既有進度，從頭開始")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    config.load_settings()
+    args = parse_args(argv)
+    input_dir = os.path.abspath(args.input_dir)
+    if not os.path.isdir(input_dir):
+        print(f"錯誤：找不到資料夾 {input_dir}")
+        return 1
+
+    prompt_file = config.PROMPT_SINGLE_FILE if args.prompt == 'single' else config.PROMPT_MULTI_FILE
+    with open(os.path.join(config.get_base_path(), prompt_file), 'r', encoding='utf-8') as f:
+        base_prompt = f.read()
+    with open(os.path.join(config.get_base_path(), config.PROMPT_CHUNK_EXTRACT_FILE), 'r', encoding='utf-8') as f:
+        extract_prompt = f.read()
+
+    config.OCR_MAX_WORKERS = max(1, args.ocr_workers)
+    output_path = os.path.abspath(args.output or os.path.join(input_dir, config.MASTER_PPTX_FILENAME))
+    manifest = JobManifest(os.path.abspath(args.manifest or os.path.join(input_dir, DEFAULT_MANIFEST_NAME)),
+                           input_dir, args.prompt, config.OLLAMA_MODEL)
+    if not args.restart and manifest.load():
+        print(f"從進度檔繼續: {manifest.path}")
+    manifest.save()
+
+    projects = discover_projects(input_dir)
+    if not projects:
+        print("沒有找到任何支援的檔案。")
+        return 0
+
+    file_processor = FileProcessorService()
+    try:
+        run_ocr_stage(manifest, input_dir, projects, file_processor)
+    finally:
+        file_processor.shutdown()
+        manifest.save()
+    try:
+        run_llm_stage(manifest, input_dir, projects, OllamaService(config.OLLAMA_API_URL, config.OLLAMA_MODEL),
+                      base_prompt, extract_prompt, max(1, args.llm_workers))
+    finally:
+        manifest.save()
+    run_pptx_stage(manifest, PptxService(), output_path)
+    manifest.close()
+    return 0
+
+if __name__ == '__main__':
+    # 與 main.py 相同：打包後的 OCR 子程序需要此呼叫
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# benchmarks/bench_deskew.py
+# 比較傾斜角度估計：舊版 (np.where 全部像素 + cv2.minAreaRect) 與 ocr_preprocess.estimate_skew (投影剖面)
+#
+# 用法：
+#   python benchmarks/bench_deskew.py [--repeat 3] [--sizes 1920x1080 3840x2160]
+#
+# 以合成的文字影像 (已知旋轉角度) 經過與管線相同的自適應二值化 + 中值去噪後量測：
+# 每次估計的耗時、numpy 暫存陣列的峰值記憶體 (tracemalloc) 與角度誤差。
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import cv2
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ocr_preprocess import estimate_skew
+
+ANGLES = (-6.0, -1.5, 0.0, 2.0, 8.0)
+
+def legacy_skew(deno):
+    """原 app/ocr_utils.image_preprocess_pil 的做法 (逐字保留，回傳其計算出的旋轉角度)"""
+    coords = np.column_stack(np.where(deno > 0))
+    angle = 0.0
+    if coords.shape[0] > 0:
+        rect = cv2.minAreaRect(coords)
+        angle = rect[-1]
+        if angle < -45:
+            angle = -(90 + angle)
+        else:
+            angle = -angle
+    return angle
+
+def new_skew(deno):
+    # 與 legacy_skew 相同的意義：回傳校正用的旋轉角度
+    return -estimate_skew(deno)
+
+def make_fixture(width, height, angle):
+    """產生已知傾斜角度、經過自適應二值化與去噪的文字影像"""
+    image = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    try: font = ImageFont.load_default(size=max(12, height // 40))
+    except TypeError: font = ImageFont.load_default()
+    line_height = max(16, height // 25)
+    for y in range(line_height, height - line_height, line_height):
+        draw.text((width // 20, y), "Build R01A fail rate 3/20 -> thermal module replaced, still fail. 待RD確認", fill=0, font=font)
+    array = np.array(image)
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    array = cv2.warpAffine(array, matrix, (width, height), borderValue=255)
+    th = cv2.adaptiveThreshold(array, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+    return cv2.medianBlur(th, 3)
+
+def measure(func, image, repeat):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(image)
+    elapsed = (time.perf_counter() - start) / repeat
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="傾斜角度估計效能比較")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--sizes', nargs='+', default=['1920x1080', '3840x2160'])
+    args = parser.parse_args(argv)
+
+    print(f"{'尺寸':<11} {'角度':>6} | {'舊版 ms':>9} {'峰值 MB':>8} {'誤差':>6} | {'新版 ms':>9} {'峰值 MB':>8} {'誤差':>6}")
+    for size in args.sizes:
+        width, height = (int(v) for v in size.split('x'))
+        for angle in ANGLES:
+            fixture = make_fixture(width, height, angle)
+            row = f"{size:<11} {angle:>6.1f}"
+            # 正確的校正角度是 -angle
+            for func in (legacy_skew, new_skew):
+                result, elapsed, peak = measure(func, fixture, args.repeat)
+                row += f" | {elapsed * 1000:>9.1f} {peak / 1024 / 1024:>8.1f} {abs(result + angle):>6.2f}"
+            print(row)
+
+if __name__ == '__main__':
+    main()
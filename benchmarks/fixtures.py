@@ -0,0 +1,100 @@
+# benchmarks/fixtures.py
+# 效能量測用的合成測試資料 (全部以固定亂數種子產生，每次內容相同)：
+#   - 中英混合的工程截圖 (不同解析度、淺色/深色)
+#   - UTF-8 與 GBK 編碼的 .txt
+#   - 「--- 報告 N：... ---」格式的多份生成結果
+#   - 10 ~ 1000 張投影片的彙總簡報
+
+import os
+import random
+
+from PIL import Image, ImageDraw, ImageFont
+
+# 依序嘗試的中文字型 (Windows / macOS / Linux)；都找不到時退回 PIL 預設字型 (中文會變成方框，但版面與像素量相同)
+CJK_FONTS = (
+    r'C:\Windows\Fonts\msjh.ttc', r'C:\Windows\Fonts\msyh.ttc', r'C:\Windows\Fonts\mingliu.ttc',
+    '/System/Library/Fonts/PingFang.ttc', '/Library/Fonts/Arial Unicode.ttf',
+    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc', '/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+)
+
+SCREENSHOT_SIZES = ((1280, 720), (1920, 1080), (3840, 2160))
+DECK_SIZES = (10, 100, 1000)
+
+_SENTENCES = (
+    "Build R01A fail rate 3/20，更換 thermal module 後仍然 fail",
+    "EE 確認 VRM 溫度 95°C，超過 spec (90°C)",
+    "待 RD 確認 BIOS 1.0.7 是否修正 fan table",
+    "Station FT2 良率由 92% 回升至 98.5%",
+    "Customer 要求 10/25 前提供 8D report",
+    "已調整 heatsink 壓力並重新 reflow，暫時 pass",
+    "Issue: DUT 開機後 5 分鐘當機，log 顯示 MCE error",
+    "下週安排 100 pcs 驗證，結果再同步",
+)
+
+def _font(size):
+    for path in CJK_FONTS:
+        if os.path.exists(path):
+            try: return ImageFont.truetype(path, size)
+            except OSError: continue
+    try: return ImageFont.load_default(size=size)
+    except TypeError: return ImageFont.load_default()
+
+def render_screenshot(width, height, dark=False, seed=0):
+    """模擬聊天/郵件截圖：左側頭像、每則訊息一段文字，中間留白"""
+    rng = random.Random(seed)
+    background, foreground = ((32, 33, 36), (230, 230, 230)) if dark else ((255, 255, 255), (20, 20, 20))
+    image = Image.new('RGB', (width, height), background)
+    draw = ImageDraw.Draw(image)
+    font_size = max(14, height // 45)
+    font = _font(font_size)
+    y = font_size
+    while y < height - 3 * font_size:
+        avatar = font_size * 2
+        draw.ellipse((font_size, y, font_size + avatar, y + avatar), fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        for _ in range(rng.randint(1, 3)):
+            draw.text((font_size * 4, y), rng.choice(_SENTENCES), fill=foreground, font=font)
+            y += int(font_size * 1.5)
+        y += font_size * 2
+    return image
+
+def report_text(lines, seed=0):
+    rng = random.Random(seed)
+    return '\n'.join(f"[{10 + i // 60:02d}:{i % 60:02d}] {rng.choice(_SENTENCES)}" for i in range(lines))
+
+def write_text_files(directory, lines=2000):
+    """寫出同一份內容的 UTF-8 與 GBK 版本，回傳 {編碼: 路徑}"""
+    # 句子裡的字元 (含 '°'、全形標點) 都在 GBK 範圍內
+    text = report_text(lines)
+    paths = {}
+    for encoding in ('utf-8', 'gbk'):
+        path = os.path.join(directory, f"report_{encoding}.txt")
+        with open(path, 'w', encoding=encoding) as f:
+            f.write(text)
+        paths[encoding] = path
+    return paths
+
+def genai_output(report_count, bullets_per_section=4, seed=0):
+    """產生與 Prompt 要求相同格式的多份報告"""
+    rng = random.Random(seed)
+    parts = []
+    for n in range(1, report_count + 1):
+        parts.append(f"--- 報告 {n}：R01A 測試異常 #{n} ---")
+        for heading in ("情境 (Situation)", "任務 (Task)", "行動 (Action)", "結果 (Result)"):
+            parts.append(f"**{heading}**")
+            parts.extend(f"- {rng.choice(_SENTENCES)}" for _ in range(bullets_per_section))
+        parts.append('')
+    return '\n'.join(parts)
+
+def build_master_deck(path, slide_count):
+    """以 PptxService 的版面建立含 slide_count 張投影片的彙總簡報"""
+    from pptx import Presentation
+    from services import PptxService
+    service = PptxService()
+    prs = Presentation()
+    slides = list(service._iter_slide_contents(genai_output(1), 'Bench'))
+    for i in range(slide_count):
+        title, paragraphs = slides[0]
+        service._add_slide(prs, f"{title} ({i + 1})", paragraphs)
+    prs.save(path)
+    return path
@@ -0,0 +1,249 @@
+# benchmarks/run_benchmarks.py
+# OCR -> LLM -> PPTX 整條流程的效能量測，結果依 git commit 記錄在 JSON 歷史檔，方便比較前後版本
+#
+# 用法：
+#   python benchmarks/run_benchmarks.py                  # 全部項目
+#   python benchmarks/run_benchmarks.py --only pptx llm  # 只跑名稱以這些字首開頭的項目
+#   python benchmarks/run_benchmarks.py --quick          # 只用最小的截圖與簡報
+#   python benchmarks/run_benchmarks.py --compare HEAD~1 # 與指定 commit 的紀錄比較
+#
+# - 測試資料由 fixtures.py 產生 (固定亂數種子)，Ollama 以 stub_ollama.py 的本機假伺服器取代
+# - OCR/LLM 快取與常駐 OCR 伺服器在量測期間停用，量到的是實際運算時間
+# - 缺少的套件 (例如 Tesseract、rapidfuzz) 只會讓對應項目標記為略過，不影響其他項目
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import config
+import fixtures
+
+DEFAULT_HISTORY = os.path.join(BENCH_DIR, 'history.json')
+# 與前一次紀錄相比，變慢超過此比例時標記為退步
+DEFAULT_THRESHOLD = 0.10
+
+class Skipped(Exception):
+    """此項目在目前環境無法執行 (缺少套件或外部程式)"""
+
+def measure(func, repeat, setup=None):
+    """執行 repeat 次 (setup 不計時)，回傳毫秒統計"""
+    times = []
+    for _ in range(repeat):
+        if setup: setup()
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return {'median_ms': round(statistics.median(times), 3), 'min_ms': round(min(times), 3), 'repeat': repeat}
+
+# --- 各組量測項目：每個函式 yield (名稱, func, repeat, setup) ---
+def bench_files(ctx):
+    from services import FileProcessorService
+    service = FileProcessorService()
+    paths = fixtures.write_text_files(ctx.workdir)
+    for encoding, path in paths.items():
+        yield f"files.text.{encoding}", lambda path=path: service.process_text_file(path), ctx.repeat * 5, None
+    for width, height in ctx.screenshot_sizes:
+        image = fixtures.render_screenshot(width, height)
+        yield f"files.ocr_cache_key.{width}x{height}", lambda image=image: service.ocr_cache_key(image), ctx.repeat, None
+        yield f"files.image_ocr.{width}x{height}", lambda image=image: _require_tesseract(service.process_image_object, image), ctx.repeat, None
+
+def _require_tesseract(func, *args):
+    try: import pytesseract
+    except ImportError: raise Skipped("缺少套件: pytesseract")
+    try: return func(*args)
+    except Exception as e:
+        if 'Tesseract' in str(e): raise Skipped("找不到 Tesseract OCR 引擎")
+        raise
+
+def bench_preprocess(ctx):
+    from app.ocr_utils import image_preprocess_pil
+    for width, height in ctx.screenshot_sizes:
+        for dark in (False, True):
+            image = fixtures.render_screenshot(width, height, dark=dark)
+            theme = 'dark' if dark else 'light'
+            for variant in ('auto', 'full'):
+                yield (f"preprocess.{variant}.{theme}.{width}x{height}",
+                       lambda image=image, variant=variant: image_preprocess_pil(image, variant=variant), ctx.repeat, None)
+
+def bench_llm(ctx):
+    from services import OllamaService
+    from stub_ollama import StubOllamaServer
+    server = StubOllamaServer(response_text=fixtures.genai_output(3)).start()
+    ctx.cleanups.append(server.stop)
+    service = OllamaService(server.api_url, 'stub')
+    prompt = "請整理以下內容：\n" + fixtures.report_text(200)
+    yield "llm.generate", lambda: service.generate(prompt, use_cache=False), ctx.repeat * 3, None
+    yield "llm.generate_stream", lambda: service.generate_stream(prompt, lambda chunk: None), ctx.repeat * 3, None
+    # 超過上下文長度的輸入：分段擷取 (map) 後再組成彙整 Prompt
+    long_input = fixtures.report_text(20000)
+    yield ("llm.prepare_prompt.chunked",
+           lambda: service.prepare_prompt("請整理以下內容：", long_input, "請擷取重點："), ctx.repeat, None)
+
+def bench_pptx(ctx):
+    from services import PptxService
+    service = PptxService()
+    genai_text = fixtures.genai_output(3)
+    yield "pptx.parse.50_reports", lambda text=fixtures.genai_output(50): list(service._iter_slide_contents(text, 'Bench')), ctx.repeat * 5, None
+    for slide_count in ctx.deck_sizes:
+        master = fixtures.build_master_deck(os.path.join(ctx.workdir, f"master_{slide_count}.pptx"), slide_count)
+        target = os.path.join(ctx.workdir, 'target.pptx')
+        for mode, incremental in (('append', True), ('full', False)):
+            def run(incremental=incremental):
+                config.PPTX_INCREMENTAL_APPEND = incremental
+                service.add_to_presentation(target, genai_text, 'Bench')
+            yield (f"pptx.add_to_presentation.{mode}.{slide_count}_slides", run, ctx.repeat,
+                   lambda master=master: shutil.copyfile(master, target))
+    config.PPTX_INCREMENTAL_APPEND = ctx.original_incremental
+
+    from pptx import Presentation
+    from app.pptx_export import create_star_slide
+    star = {key: fixtures.report_text(4, seed=i).split('\n')
+            for i, key in enumerate(('situation', 'task', 'action', 'result'))}
+    def build_star_deck(slide_count=100):
+        prs = Presentation()
+        for i in range(slide_count): create_star_slide(prs, f"R01A 測試異常 #{i}", star)
+    yield "pptx.star_slides.100_slides", build_star_deck, ctx.repeat, None
+
+def bench_postprocess(ctx):
+    from app import postprocess
+    text = fixtures.report_text(5000).replace('\n', '\n\n  ')
+    domain_dict = {'keywords': ['fail', '良率', 'thermal', 'BIOS'], 'product_codes': ['R01A', 'FT2', 'VRM']}
+    cleaned = postprocess.clean_text(text)
+    sentences = postprocess.extract_key_sentences(cleaned, domain_dict, topn=200)
+    yield "postprocess.clean_text", lambda: postprocess.clean_text(text), ctx.repeat * 5, None
+    yield "postprocess.extract_key_sentences", lambda: postprocess.extract_key_sentences(cleaned, domain_dict, topn=200), ctx.repeat * 5, None
+    yield "postprocess.simple_star_from_sentences", lambda: postprocess.simple_star_from_sentences(sentences), ctx.repeat * 5, None
+
+GROUPS = (('files', bench_files), ('preprocess', bench_preprocess), ('llm', bench_llm),
+          ('pptx', bench_pptx), ('postprocess', bench_postprocess))
+
+class Context:
+    def __init__(self, workdir, repeat, quick):
+        self.workdir = workdir
+        self.repeat = repeat
+        self.screenshot_sizes = fixtures.SCREENSHOT_SIZES[:1] if quick else fixtures.SCREENSHOT_SIZES
+        self.deck_sizes = fixtures.DECK_SIZES[:1] if quick else fixtures.DECK_SIZES
+        self.original_incremental = config.PPTX_INCREMENTAL_APPEND
+        self.cleanups = []
+
+def _selected(name, only):
+    return not only or any(name.startswith(prefix) for prefix in only)
+
+def run_benchmarks(only=None, repeat=3, quick=False):
+    # 量測實際運算：停用 OCR/LLM 快取與常駐 OCR 伺服器
+    config.OCR_CACHE_MAX_MB = 0
+    config.LLM_CACHE_MAX_MB = 0
+    config.OCR_SERVER_ENABLED = False
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='reporthelper_bench_') as workdir:
+        ctx = Context(workdir, repeat, quick)
+        for group, factory in GROUPS:
+            if only and not any(group.startswith(prefix) or prefix.startswith(group) for prefix in only): continue
+            try:
+                for name, func, times, setup in factory(ctx):
+                    if not _selected(name, only): continue
+                    try:
+                        results[name] = measure(func, times, setup)
+                        print(f"{name:<55} {results[name]['median_ms']:>10.2f} ms")
+                    except Skipped as e:
+                        results[name] = {'skipped': str(e)}
+                        print(f"{name:<55} {'略過':>10}  ({e})")
+            except ImportError as e:
+                results[group] = {'skipped': f"缺少套件: {e.name}"}
+                print(f"{group:<55} {'略過':>10}  (缺少套件: {e.name})")
+            finally:
+                while ctx.cleanups: ctx.cleanups.pop()()
+    return results
+
+# --- 歷史紀錄 ---
+def git_commit():
+    """目前的 commit (工作目錄有未提交的變更時加上 -dirty)；不在 git 專案中時回傳 'unknown'"""
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, text=True, stderr=subprocess.DEVNULL).strip()
+        dirty = subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT_DIR, text=True).strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def resolve_commit(ref):
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', ref], cwd=ROOT_DIR, text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ref
+
+def load_history(path):
+    if not os.path.exists(path): return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_history(path, history):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def compare(current, baseline, threshold):
+    """印出與基準紀錄的差異；回傳退步的項目名稱"""
+    regressions = []
+    print(f"\n{'項目':<55} {'基準 ms':>10} {'目前 ms':>10} {'變化':>8}")
+    for name, result in current.items():
+        before = baseline.get(name, {})
+        if 'median_ms' not in result or 'median_ms' not in before: continue
+        change = result['median_ms'] / before['median_ms'] - 1 if before['median_ms'] else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  <-- 退步'
+            regressions.append(name)
+        print(f"{name:<55} {before['median_ms']:>10.2f} {result['median_ms']:>10.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ReportHelper 效能量測")
+    parser.add_argument('--only', nargs='+', help="只執行名稱以這些字首開頭的項目 (例如 pptx files.text)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--quick', action='store_true', help="只用最小的截圖與簡報")
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help="JSON 歷史檔路徑")
+    parser.add_argument('--no-save', action='store_true', help="不寫入歷史檔")
+    parser.add_argument('--compare', metavar='COMMIT', help="與指定 commit 的紀錄比較 (預設為歷史檔中最近一筆其他 commit)")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="變慢超過此比例視為退步 (預設 0.10)")
+    args = parser.parse_args(argv)
+
+    commit = git_commit()
+    print(f"commit {commit}，Python {platform.python_version()} ({platform.system()})\n")
+    results = run_benchmarks(args.only, args.repeat, args.quick)
+
+    history = load_history(args.history)
+    baseline_commit = resolve_commit(args.compare) if args.compare else next(
+        (key for key in reversed(list(history)) if key != commit), None)
+    regressions = []
+    if baseline_commit in history:
+        print(f"\n與 {baseline_commit} 比較：")
+        regressions = compare(results, history[baseline_commit]['results'], args.threshold)
+    elif args.compare:
+        print(f"\n歷史檔中沒有 {args.compare} 的紀錄。")
+
+    if not args.no_save:
+        # 同一個 commit 重新量測時，只更新這次有跑的項目 (--only 不會清掉其他項目的紀錄)
+        entry = history.pop(commit, {'results': {}})
+        entry.update({'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(),
+                      'platform': platform.platform(), 'quick': args.quick})
+        entry['results'].update(results)
+        history[commit] = entry
+        save_history(args.history, history)
+        print(f"\n結果已寫入 {args.history}")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
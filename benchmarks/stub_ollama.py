@@ -0,0 +1,119 @@
+# benchmarks/stub_ollama.py
+# 取代 Ollama 的本機假伺服器：/api/generate 回傳固定內容，量測的是本程式 (HTTP、解析、快取) 的開銷而非模型速度
+#
+# 可單獨執行，讓桌面版/網頁版在沒有 GPU 的環境下也能走完整流程：
+#   python benchmarks/stub_ollama.py --port 11435 --token-delay 0.01
+# 然後把 settings.json 的 OLLAMA_API_URL 指向 http://127.0.0.1:11435/api/generate
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fixtures import genai_output
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        # /api/tags 與根路徑供 OllamaManager 判斷服務是否就緒
+        body = json.dumps({'models': [{'name': self.server.model}]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        self.server.request_count += 1
+        text = self.server.response_text
+        tokens = [text[i:i + self.server.chars_per_token] for i in range(0, len(text), self.server.chars_per_token)]
+        eval_duration = int(len(tokens) * self.server.token_delay * 1e9)
+        stats = {'eval_count': len(tokens), 'prompt_eval_count': len(request.get('prompt', '')) // 4,
+                 'eval_duration': eval_duration, 'prompt_eval_duration': 0, 'load_duration': 0, 'total_duration': eval_duration}
+
+        if not request.get('stream', True):
+            time.sleep(len(tokens) * self.server.token_delay)
+            self._send_json({'model': self.server.model, 'response': text, 'done': True, **stats})
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for token in tokens:
+                if self.server.token_delay: time.sleep(self.server.token_delay)
+                self._write_chunk({'model': self.server.model, 'response': token, 'done': False})
+            self._write_chunk({'model': self.server.model, 'response': '', 'done': True, **stats})
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            pass    # 用戶端取消生成時會直接關閉連線
+
+    def _send_json(self, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data):
+        line = json.dumps(data, ensure_ascii=False).encode('utf-8') + b'\n'
+        self.wfile.write(f"{len(line):X}\r\n".encode('ascii') + line + b'\r\n')
+        self.wfile.flush()
+
+class StubOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, response_text=None, token_delay=0.0, chars_per_token=4, model='stub'):
+        super().__init__((host, port), StubOllamaHandler)
+        self.response_text = response_text if response_text is not None else genai_output(3)
+        self.token_delay = token_delay
+        self.chars_per_token = chars_per_token
+        self.model = model
+        self.request_count = 0
+        self._thread = None
+
+    def handle_error(self, request, client_address):
+        # 用戶端 (requests 的連線池) 結束時關閉閒置的 keep-alive 連線屬於正常情況
+        if not isinstance(sys.exc_info()[1], ConnectionError): super().handle_error(request, client_address)
+
+    @property
+    def api_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/api/generate"
+
+    def start(self):
+        """在背景執行緒中啟動並回傳自身 (port=0 時由系統分配，實際位址見 api_url)"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ollama 假伺服器 (效能量測用)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--token-delay', type=float, default=0.0, help="每個 token 之間的延遲秒數")
+    parser.add_argument('--reports', type=int, default=3, help="回應中包含幾份報告")
+    args = parser.parse_args(argv)
+    server = StubOllamaServer(args.host, args.port, genai_output(args.reports), args.token_delay)
+    print(f"Ollama 假伺服器已啟動：{server.api_url}")
+    try: server.serve_forever()
+    except KeyboardInterrupt: pass
+    finally: server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# chunking.py
+# 依 token 估計量切分過長的輸入，供 map-reduce 分段摘要使用
+
+import re
+
+# 中日韓文字與全形符號：大多數模型的 tokenizer 約 1 字 1 token (保守估計)
+_CJK_PATTERN = re.compile(r'[\u2e80-\u9fff\uf900-\ufaff\uff00-\uffef]')
+# 其他文字 (英文、數字、符號) 約 3.5 字元 1 token
+_CHARS_PER_TOKEN = 3.5
+# GUI 在多個檔案/剪貼簿圖片之間插入的分隔線，例如 "==== 檔案 2 ===="
+_SECTION_SEPARATOR = re.compile(r'\n*={3,}\s*(?:檔案 \d+|來自剪貼簿的新增圖片)\s*={3,}\n*')
+_PARAGRAPH_SEPARATOR = re.compile(r'\n\s*\n')
+
+def estimate_tokens(text):
+    """粗估文字的 token 數 (不依賴特定模型的 tokenizer)"""
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    return int(cjk_count + (len(text) - cjk_count) / _CHARS_PER_TOKEN) + 1
+
+def split_sections(text):
+    """依檔案分隔線切開，回傳非空的區段清單"""
+    return [section.strip() for section in _SECTION_SEPARATOR.split(text) if section.strip()]
+
+def _split_oversized(text, max_tokens):
+    """把單一過長的區段依段落、行、字元逐層切小，使每塊都不超過 max_tokens"""
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+    for separator in (_PARAGRAPH_SEPARATOR, re.compile(r'\n')):
+        pieces = [p for p in separator.split(text) if p.strip()]
+        if len(pieces) > 1:
+            return [small for piece in pieces for small in _split_oversized(piece, max_tokens)]
+    # 沒有任何換行的超長文字：依估計比例直接切字元
+    step = max(1, int(len(text) * max_tokens / estimate_tokens(text)))
+    return [text[i:i + step] for i in range(0, len(text), step)]
+
+def chunk_text(text, max_tokens):
+    """
+    將文字切成多個不超過 max_tokens 的片段。
+    優先在檔案分隔線處切開，其次是段落，盡量把相鄰的小區段合併成同一片段以減少請求數。
+    """
+    pieces = [piece for section in split_sections(text) for piece in _split_oversized(section, max_tokens)]
+    chunks, current, current_tokens = [], [], 0
+    for piece in pieces:
+        piece_tokens = estimate_tokens(piece)
+        if current and current_tokens + piece_tokens > max_tokens:
+            chunks.append('\n\n'.join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += piece_tokens
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
@@ -19,12 +19,92 @@ MASTER_PPTX_FILENAME = "Weekly Report_JimChuang.pptx"
 # Prompt 檔案的名稱是固定的，程式會預期在主目錄下找到它們
 PROMPT_SINGLE_FILE = 'prompt_single_issue.txt'
 PROMPT_MULTI_FILE = 'prompt_multi_issue.txt'
+# 輸入過長時，分段擷取重點 (map 階段) 使用的 Prompt
+PROMPT_CHUNK_EXTRACT_FILE = 'prompt_chunk_extract.txt'
 
 # OCR 相關設定
 OCR_LANGUAGES = 'chi_tra+chi_sim+eng'
+# 多檔拖曳時平行 OCR 的子程序數量；設為 1 則使用原本的循序處理
+OCR_MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+# OCR 前處理方式 (見 ocr_preprocess.py)：'none' 不處理、'otsu' 二值化、'full' 完整處理、
+# 'auto' 依影像統計自動選擇步驟 (需要 opencv-python)。此名稱會一併納入 OCR 快取的鍵值 (更換前處理時舊快取自然失效)
+OCR_PREPROCESS_VARIANT = 'none'
+# 只 OCR 偵測到的文字區塊 (略過留白、頭像與圖示，需要 opencv-python；沒有安裝時自動改為整張圖)，
+# 單張圖片的區塊分成幾組平行辨識
+OCR_TEXT_REGIONS = True
+OCR_REGION_WORKERS = 4
+# OCR 結果快取 (存放於程式目錄)；容量上限設為 0 則停用快取
+OCR_CACHE_FILENAME = 'ocr_cache.sqlite3'
+OCR_CACHE_MAX_MB = 200
+# 常駐 OCR 伺服器 (ocr_server.py)：保持 PaddleOCR / Tesseract 載入狀態，供多個程序共用。
+# 啟用時會先嘗試送往伺服器，連不上則改在本機辨識，並在 RETRY 秒內不再嘗試連線
+OCR_SERVER_ENABLED = True
+OCR_SERVER_URL = 'http://127.0.0.1:8765'
+OCR_SERVER_TIMEOUT = 300
+OCR_SERVER_RETRY_SECONDS = 30
+# 混合 OCR：PaddleOCR 信心分數 (0~1) 低於此值的文字框會再交給 Tesseract 複查
+OCR_HYBRID_MIN_SCORE = 0.85
+
+# Ollama 串流輸出設定：是否使用串流、UI 批次更新間隔 (毫秒)、預設是否隱藏 <think> 推理區塊
+OLLAMA_STREAM = True
+OLLAMA_STREAM_FLUSH_MS = 100
+OLLAMA_HIDE_THINK = True
+
+# 桌面版文字框：程式寫入時合併更新的間隔 (毫秒)；內容超過 VIRTUALIZE 字元時改為唯讀預覽，只顯示前 PREVIEW 字元
+UI_TEXT_FLUSH_MS = 50
+TEXT_VIRTUALIZE_CHARS = 300000
+TEXT_PREVIEW_CHARS = 50000
+
+# Ollama 上下文視窗 (num_ctx) 依每次請求的長度調整，範圍為 MIN ~ MAX；
+# 預留 RESPONSE_TOKENS 給模型回應。超過 MAX 的輸入會自動分段擷取重點後再彙整。
+OLLAMA_MIN_CTX = 4096
+OLLAMA_MAX_CTX = 16384
+OLLAMA_RESPONSE_TOKENS = 2048
+# 分段擷取時同時送出的請求數 (需搭配 Ollama 的 OLLAMA_NUM_PARALLEL 才能真正平行)
+OLLAMA_PARALLEL_REQUESTS = 2
+
+# Ollama 回應快取：相同 Prompt + 模型 + options 直接取用上次結果；容量上限設為 0 則停用
+LLM_CACHE_FILENAME = 'llm_cache.sqlite3'
+LLM_CACHE_MAX_MB = 50
+LLM_CACHE_TTL_HOURS = 24 * 7
+
+# Ollama HTTP 連線設定：連線池大小、連線失敗時的重試次數、啟動後等待就緒的最長秒數
+OLLAMA_HTTP_POOL_SIZE = 4
+OLLAMA_HTTP_RETRIES = 2
+OLLAMA_STARTUP_TIMEOUT = 120
 
 # PowerPoint 排版相關的關鍵字
 STAR_KEYWORDS = ("情境", "任務", "行動", "結果", "Situation", "Task", "Action", "Result")
+# 彙總簡報已存在時，只附加新投影片而不重寫整份檔案 (遇到無法解析的結構會自動退回完整模式)
+PPTX_INCREMENTAL_APPEND = True
+# 網頁版：解析過的簡報範本 (依內容雜湊) 在所有使用者之間共用，最多保留 ENTRIES 份、每份快取 TTL 秒後釋放，
+# 以限制許多人同時上傳大型範本時的記憶體用量
+WEBAPP_TEMPLATE_CACHE_ENTRIES = 4
+WEBAPP_TEMPLATE_CACHE_TTL_SECONDS = 30 * 60
+# 網頁版伺服器模式 (整個團隊共用一台主機時設為 True，見 shared_pool.py)：所有使用者的 OCR 與 PowerPoint 生成
+# 送到共用的工作池，依使用者輪流執行。每位使用者最多 PER_USER 個未完成的工作、全體最多 QUEUED 個工作排隊，
+# 超過時請使用者稍後再試
+WEBAPP_SERVER_MODE = False
+WEBAPP_OCR_WORKERS = OCR_MAX_WORKERS
+WEBAPP_PPTX_WORKERS = 2
+WEBAPP_MAX_JOBS_PER_USER = 3
+WEBAPP_MAX_QUEUED_JOBS = 30
+# Streamlit 頁面 (網頁版與 app/report_helper_app.py) 每個 session 保留的 OCR 結果筆數 (依上傳內容雜湊 + 選項，見 session_memo.py)
+STREAMLIT_OCR_MEMO_ENTRIES = 16
+
+# 桌面版背景工作的執行緒數量 (OCR、Ollama、PowerPoint 與檔案 I/O 共用，見 job_queue.py)；
+# 同類型工作另有同時執行的上限，例如同一時間只生成一份報告
+JOB_WORKERS = 4
+
+# 各階段耗時追蹤 (見 tracing.py)：每個階段寫一行 JSON 到程式目錄的 TRACE_LOG_FILENAME，
+# 超過 MAX_MB 時輪替並保留 BACKUPS 份舊檔
+TRACE_ENABLED = True
+TRACE_LOG_FILENAME = 'trace.jsonl'
+TRACE_LOG_MAX_MB = 5
+TRACE_LOG_BACKUPS = 3
+
+# `python main.py --profile-startup` 的啟動時間分析寫入程式目錄的此檔案 (打包後的 .exe 沒有主控台可以顯示)
+STARTUP_PROFILE_FILENAME = 'startup_profile.log'
 
 # 外部設定檔的固定名稱
 SETTINGS_FILENAME = "settings.json"
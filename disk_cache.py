@@ -0,0 +1,140 @@
+# disk_cache.py
+# 以 SQLite 實作的持久化快取，支援容量上限 (LRU 淘汰)、存活時間 (TTL) 與命中統計
+
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+class DiskCache:
+    """
+    以單一 SQLite 檔案儲存的鍵值快取。
+    - 總容量超過 max_bytes 時，淘汰最久未被讀取的項目 (LRU)。
+    - 若指定 ttl_seconds，寫入超過該時間的項目視為過期 (讀取時當作未命中並刪除)。
+    - 命中/未命中次數存在同一個檔案中，因此多個 OCR 子程序的統計會自動合併。
+    - 任何資料庫錯誤都只會印出訊息並視為未命中，不會中斷主流程。
+    """
+    def __init__(self, path, max_bytes, ttl_seconds=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.enabled = max_bytes > 0
+        if self.enabled:
+            self._execute_script("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    accessed REAL NOT NULL,
+                    created REAL NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed);
+                CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, count INTEGER NOT NULL);
+            """)
+            self._migrate()
+
+    @contextmanager
+    def _connect(self):
+        """開啟連線並包成一個交易；每次操作使用獨立連線，可安全地跨執行緒與程序使用"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _execute_script(self, script):
+        try:
+            with self._connect() as conn:
+                conn.executescript(script)
+        except sqlite3.Error as e:
+            print(f"快取初始化失敗，將停用快取 ({self.path}): {e}")
+            self.enabled = False
+
+    def _migrate(self):
+        """舊版快取檔沒有 created 欄位，補上後舊項目視為「很久以前寫入」"""
+        if not self.enabled: return
+        try:
+            with self._connect() as conn:
+                columns = [row[1] for row in conn.execute("PRAGMA table_info(entries)")]
+                if 'created' not in columns:
+                    conn.execute("ALTER TABLE entries ADD COLUMN created REAL NOT NULL DEFAULT 0")
+        except sqlite3.Error as e:
+            print(f"快取升級失敗，將停用快取 ({self.path}): {e}")
+            self.enabled = False
+
+    def _is_expired(self, created, now):
+        return self.ttl_seconds is not None and created < now - self.ttl_seconds
+
+    def get(self, key):
+        """讀取快取；命中時更新存取時間，並累計命中/未命中次數"""
+        if not self.enabled: return None
+        try:
+            now = time.time()
+            with self._connect() as conn:
+                row = conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None and self._is_expired(row[1], now):
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    row = None
+                if row is not None:
+                    conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+                self._bump(conn, 'hits' if row is not None else 'misses')
+            return row[0] if row is not None else None
+        except sqlite3.Error as e:
+            print(f"讀取快取失敗: {e}")
+            return None
+
+    def put(self, key, value):
+        """寫入快取，必要時淘汰最久未使用的項目"""
+        if not self.enabled: return
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes: return
+        try:
+            now = time.time()
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, accessed, created) VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now, now))
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            print(f"寫入快取失敗: {e}")
+
+    def _evict(self, conn, now):
+        if self.ttl_seconds is not None:
+            conn.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes: return
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            if total <= self.max_bytes: break
+            victims.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+
+    def _bump(self, conn, name):
+        conn.execute(
+            "INSERT INTO stats (name, count) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET count = count + 1",
+            (name,))
+
+    def stats(self):
+        """回傳 {'hits', 'misses', 'entries', 'bytes'}"""
+        result = {'hits': 0, 'misses': 0, 'entries': 0, 'bytes': 0}
+        if not self.enabled: return result
+        try:
+            with self._connect() as conn:
+                for name, count in conn.execute("SELECT name, count FROM stats"):
+                    result[name] = count
+                result['entries'], result['bytes'] = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        except sqlite3.Error as e:
+            print(f"讀取快取統計失敗: {e}")
+        return result
+
+    def clear(self):
+        """清空所有快取項目與統計"""
+        if not self.enabled: return
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM stats")
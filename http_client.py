@@ -0,0 +1,51 @@
+# http_client.py
+# 共用的 HTTP 連線池 (keep-alive + 可設定的重試)，供 OllamaService 與 OllamaManager 使用
+
+import threading
+from urllib.parse import urlsplit
+
+import config
+
+_sessions = {}
+_lock = threading.Lock()
+
+def create_session(retries, pool_size):
+    """
+    建立帶連線池的 Session。
+    只重試「連線失敗」與 502/503/504 (例如模型仍在載入)，不重試讀取逾時，
+    以免一個已經送出、需要數分鐘的生成請求被重複執行。
+    requests 在此才載入，讓只需要 base_url_of 的啟動流程不必付出載入成本。
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=0,
+        status=retries,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD", "POST"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def get_session(retries=None):
+    """取得共用的 Session；同樣的重試次數共用同一個連線池"""
+    if retries is None:
+        retries = config.OLLAMA_HTTP_RETRIES
+    with _lock:
+        if retries not in _sessions:
+            _sessions[retries] = create_session(retries, config.OLLAMA_HTTP_POOL_SIZE)
+        return _sessions[retries]
+
+def base_url_of(api_url):
+    """由完整的 API 位址 (例如 http://localhost:11434/api/generate) 取出伺服器根位址"""
+    parts = urlsplit(api_url)
+    return f"{parts.scheme}://{parts.netloc}"
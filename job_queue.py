@@ -0,0 +1,182 @@
+# job_queue.py
+# 桌面版的背景工作排程器：所有耗時的 OCR、Ollama、PowerPoint 與檔案 I/O 都在這裡執行，不佔用 Tk 執行緒
+#
+# - 每個工作有類型 (kind) 與優先順序；同類型可設定同時執行的上限 (例如同一時間只生成一份報告)
+# - 工作可取消：尚未開始的直接移除，執行中的透過 job.cancel_token 通知 (Ollama 串流會立即中斷連線)
+# - 背景執行緒不直接碰 UI：以 job.post(callback, ...) 放入結果佇列，
+#   由 UI 執行緒的 root.after 定時取出並執行
+
+import heapq
+import itertools
+import queue
+import threading
+
+from services import CancelToken, GenerationCancelled
+
+# 工作類型
+JOB_SERVICE = 'service'
+JOB_OCR = 'ocr'
+JOB_LLM = 'llm'
+JOB_PPTX = 'pptx'
+JOB_IO = 'io'
+
+# 優先順序：數字越小越先執行
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 9
+
+# 各類型同時執行的上限 (未列出的類型只受執行緒數量限制)
+DEFAULT_KIND_LIMITS = {JOB_OCR: 1, JOB_LLM: 1, JOB_PPTX: 1}
+
+class Job:
+    """
+    一個背景工作。func(job) 在背景執行緒中執行，其回傳值交給 on_success；
+    拋出例外時交給 on_error (GenerationCancelled 或已取消時改呼叫 on_cancel)。
+    所有回呼 (包含 on_finished) 都在 UI 執行緒中執行。
+    """
+    def __init__(self, kind, func, priority=PRIORITY_NORMAL, on_success=None, on_error=None, on_cancel=None, on_finished=None):
+        self.kind = kind
+        self.func = func
+        self.priority = priority
+        self.on_success = on_success
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self.on_finished = on_finished
+        self.cancel_token = CancelToken()
+        self.state = 'pending'   # pending -> running -> done / cancelled
+        self._scheduler = None
+
+    @property
+    def cancelled(self):
+        return self.cancel_token.cancelled
+
+    def cancel(self):
+        if self._scheduler: self._scheduler.cancel(self)
+        else: self.cancel_token.cancel()
+
+    def post(self, callback, *args):
+        """由背景執行緒呼叫：把 callback(*args) 排入結果佇列，稍後在 UI 執行緒中執行"""
+        self._scheduler.post(callback, *args)
+
+    def __repr__(self):
+        return f"Job({self.kind}, priority={self.priority}, state={self.state})"
+
+class JobScheduler:
+    def __init__(self, workers=4, kind_limits=None, poll_ms=50, max_callbacks_per_tick=200):
+        self.kind_limits = dict(DEFAULT_KIND_LIMITS if kind_limits is None else kind_limits)
+        self.poll_ms = poll_ms
+        self.max_callbacks_per_tick = max_callbacks_per_tick
+        self._pending = []          # heap: (priority, 序號, job)
+        self._sequence = itertools.count()
+        self._running = {}          # kind -> 執行中的數量
+        self._running_jobs = []
+        self._condition = threading.Condition()
+        self._results = queue.SimpleQueue()
+        self._stopped = False
+        self._root = None
+        self._threads = [threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True) for i in range(workers)]
+        for thread in self._threads: thread.start()
+
+    # --- UI 執行緒 ---
+    def attach(self, root):
+        """開始在 Tk 事件迴圈中定時處理結果佇列"""
+        self._root = root
+        root.after(self.poll_ms, self._drain)
+
+    def _drain(self):
+        for _ in range(self.max_callbacks_per_tick):
+            try: callback, args = self._results.get_nowait()
+            except queue.Empty: break
+            try: callback(*args)
+            except Exception as e: print(f"執行 UI 回呼時發生錯誤: {e}")
+        if not self._stopped:
+            self._root.after(self.poll_ms, self._drain)
+
+    def submit(self, job):
+        job._scheduler = self
+        with self._condition:
+            if self._stopped: raise Exception("工作排程器已關閉，無法加入新工作。")
+            heapq.heappush(self._pending, (job.priority, next(self._sequence), job))
+            self._condition.notify_all()
+        return job
+
+    def cancel(self, job):
+        """取消工作：尚未開始的直接移除並呼叫 on_cancel；執行中的則通知其 cancel_token"""
+        with self._condition:
+            if job.state == 'pending':
+                self._pending = [entry for entry in self._pending if entry[2] is not job]
+                heapq.heapify(self._pending)
+                job.state = 'cancelled'
+                job.cancel_token.cancel()
+                self._post_finish(job, job.on_cancel)
+                return
+        job.cancel_token.cancel()
+
+    def cancel_all(self, kind=None):
+        with self._condition:
+            jobs = [entry[2] for entry in self._pending]
+        for job in jobs:
+            if kind is None or job.kind == kind: self.cancel(job)
+        with self._condition:
+            running = list(self._running_jobs)
+        for job in running:
+            if kind is None or job.kind == kind: job.cancel_token.cancel()
+
+    def is_busy(self, kind):
+        """該類型是否有尚未完成 (等待中或執行中) 的工作"""
+        with self._condition:
+            return self._running.get(kind, 0) > 0 or any(entry[2].kind == kind for entry in self._pending)
+
+    def shutdown(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self.cancel_all()
+
+    # --- 背景執行緒 ---
+    def post(self, callback, *args):
+        self._results.put((callback, args))
+
+    def _post_finish(self, job, callback, *args):
+        if callback: self.post(callback, *args)
+        if job.on_finished: self.post(job.on_finished)
+
+    def _next_job(self):
+        """取出優先順序最高、且其類型尚未達到同時執行上限的工作 (呼叫前須持有 _condition)"""
+        for _, _, job in sorted(self._pending, key=lambda entry: entry[:2]):
+            limit = self.kind_limits.get(job.kind)
+            if limit is None or self._running.get(job.kind, 0) < limit:
+                self._pending = [entry for entry in self._pending if entry[2] is not job]
+                heapq.heapify(self._pending)
+                return job
+        return None
+
+    def _worker_loop(self):
+        while True:
+            with self._condition:
+                job = None
+                while not self._stopped:
+                    job = self._next_job()
+                    if job: break
+                    self._condition.wait()
+                if job is None: return
+                job.state = 'running'
+                self._running[job.kind] = self._running.get(job.kind, 0) + 1
+                self._running_jobs.append(job)
+            try:
+                result = job.func(job)
+                if job.cancelled: self._post_finish(job, job.on_cancel)
+                else: self._post_finish(job, job.on_success, result)
+            except GenerationCancelled:
+                self._post_finish(job, job.on_cancel)
+            except Exception as e:
+                if job.cancelled: self._post_finish(job, job.on_cancel)
+                else:
+                    if job.on_error is None: print(f"背景工作 {job.kind} 失敗: {e}")
+                    self._post_finish(job, job.on_error, e)
+            finally:
+                with self._condition:
+                    job.state = 'cancelled' if job.cancelled else 'done'
+                    self._running[job.kind] -= 1
+                    self._running_jobs.remove(job)
+                    self._condition.notify_all()
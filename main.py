@@ -1,84 +1,141 @@
 # main.py
-# 主程式入口 (v4.1 - 初始化順序修正)
+# 主程式入口 (v5.0 - 先顯示視窗，大型模組延遲載入)
+#
+# 啟動時只載入建立視窗所需的 ttkbootstrap / tkinterdnd2。
+# OCR、Email、PowerPoint、HTTP 等大型模組在視窗顯示後，由背景執行緒預先載入；
+# 若使用者在載入完成前就操作，則在第一次使用時同步載入。
+# 以 `python main.py --profile-startup` 執行可列出各階段與各模組的載入時間 (寫入 config.STARTUP_PROFILE_FILENAME)。
+#
+# 注意：以 profiler.import_module(名稱) 動態載入的模組 (PRELOAD_MODULES 與介面模組) PyInstaller 無法靜態分析，
+# 新增時必須一併加入 報告整理小幫手.spec 的 hiddenimports。
 
 import os
 import sys
 import time
-import subprocess
-import requests
-import ttkbootstrap as ttk
-from tkinter import messagebox
-from tkinterdnd2 import TkinterDnD
+
+_PROCESS_START = time.perf_counter()
+
+import importlib
+import multiprocessing
+import threading
 
 import config
-from app_ui import AppUI
-from app_controller import AppController
-from services import FileProcessorService, OllamaService, PptxService
-
-class OllamaManager:
-    # ... OllamaManager 類別的程式碼保持不變，此處省略以保持簡潔 ...
-    def __init__(self, api_base_url="http://localhost:11434"):
-        self.api_base_url = api_base_url
-        self.ollama_process = None
-        self.started_by_app = False
-
-    def _is_server_running(self):
-        try:
-            requests.head(self.api_base_url, timeout=3)
-            return True
-        except (requests.exceptions.ConnectionError, requests.exceptions.ReadTimeout):
-            return False
-
-    def start_server_non_blocking(self):
-        if self._is_server_running():
-            print("偵測到 Ollama 服務已在運行。")
-            self.started_by_app = False
-            return True
-
-        print("Ollama 服務未運行，正在嘗試在背景自動啟動...")
-        try:
-            creationflags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
-            self.ollama_process = subprocess.Popen(["ollama", "serve"], creationflags=creationflags)
-            self.started_by_app = True
-            print(f"Ollama 服務已啟動，主程序 ID: {self.ollama_process.pid}")
-            return True
-        except FileNotFoundError:
-            messagebox.showerror("錯誤", "找不到 'ollama' 指令。\n請確認您已正確安裝 Ollama 且其路徑已加入系統環境變數。")
-            return False
-        except Exception as e:
-            messagebox.showerror("啟動失敗", f"自動啟動 Ollama 服務時發生錯誤：\n{e}")
-            return False
-
-    def stop_server(self):
-        if not self.ollama_process or not self.started_by_app: return
-
-        print(f"正在關閉由本程式啟動的 Ollama 服務 (主程序 ID: {self.ollama_process.pid})...")
+
+# 視窗顯示後於背景預先載入的大型模組 (依相依順序，每項只計入尚未被前面載入的部分)
+PRELOAD_MODULES = ('PIL.Image', 'PIL.ImageGrab', 'pytesseract', 'requests', 'lxml.etree', 'pptx', 'extract_msg')
+
+class StartupProfiler:
+    """記錄啟動各階段的時間點與模組載入耗時 (僅在 --profile-startup 時輸出)"""
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.marks = []
+        self.imports = []
+
+    def mark(self, label):
+        if self.enabled:
+            self.marks.append((label, time.perf_counter() - _PROCESS_START))
+
+    def import_module(self, name):
+        """載入模組並記錄耗時；先前已被其他模組載入的會標示出來"""
+        already_loaded = name in sys.modules
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        if self.enabled:
+            self.imports.append((name, time.perf_counter() - start, already_loaded))
+        return module
+
+    def report(self):
+        """輸出分析結果到主控台，並寫入程式目錄的記錄檔 (打包時 console=False，看不到主控台輸出)"""
+        if not self.enabled: return
+        lines = ["===== 啟動時間分析 =====", "[模組載入]"]
+        for name, elapsed, already_loaded in self.imports:
+            note = " (已載入)" if already_loaded else ""
+            lines.append(f"  {name:<16} {elapsed * 1000:8.1f} ms{note}")
+        lines.append("[階段] (自程序啟動起算)")
+        for label, elapsed in self.marks:
+            lines.append(f"  {label:<24} {elapsed * 1000:8.1f} ms")
+        text = '\n'.join(lines)
+        print("\n" + text)
+        log_path = os.path.join(config.get_base_path(), config.STARTUP_PROFILE_FILENAME)
         try:
-            if sys.platform == "win32":
-                command = f"taskkill /F /PID {self.ollama_process.pid} /T"
-                subprocess.run(command, capture_output=True, check=False)
-                print("Ollama 服務關閉指令已發送。")
-            else:
-                self.ollama_process.terminate()
-                self.ollama_process.wait(timeout=5)
-                print("Ollama 服務已成功關閉。")
-        except Exception as e:
-            print(f"關閉 Ollama 服務時發生錯誤: {e}")
-        finally:
-            self.ollama_process = None
-            self.started_by_app = False
-
-class ThemedTkinterDnD(TkinterDnD.Tk):
-    def __init__(self, *args, **kwargs):
-        themename = kwargs.pop('themename', 'litera')
-        super().__init__(*args, **kwargs)
-        ttk.Style(theme=themename)
+            with open(log_path, 'w', encoding='utf-8') as f: f.write(text + '\n')
+        except OSError as e:
+            print(f"無法寫入啟動時間分析檔 {log_path}: {e}")
+
+class LazyServices:
+    """
+    服務容器：第一次以 services['name'] 存取時才建立服務 (及載入其相依模組)。
+    preload() 可在背景執行緒中預先建立全部服務。
+    每個服務各有一把鎖，只有建立中的那個服務需要等待：背景執行緒建立大型服務時，
+    UI 執行緒存取已建立或其他的服務 (例如 pptx_filename、關閉時的 get_if_loaded) 不會被擋住。
+    """
+    def __init__(self, factories):
+        self._factories = factories
+        self._instances = {}
+        self._locks = {name: threading.Lock() for name in factories}
+
+    def __getitem__(self, name):
+        # 已建立的服務直接回傳 (項目只會新增、不會移除，不需要鎖)
+        if name in self._instances:
+            return self._instances[name]
+        with self._locks[name]:
+            if name not in self._instances:
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+    def get_if_loaded(self, name):
+        return self._instances.get(name)
+
+    def preload(self):
+        for name in self._factories:
+            self[name]
+
+def _create_file_processor():
+    from services import FileProcessorService
+    return FileProcessorService()
+
+def _create_ollama_service():
+    from services import OllamaService
+    return OllamaService(api_url=config.OLLAMA_API_URL, model=config.OLLAMA_MODEL)
+
+def _create_pptx_service():
+    from services import PptxService
+    return PptxService()
+
+def _preload_worker(services, profiler, on_done):
+    """背景執行緒：預先載入大型模組並建立服務，讓第一次操作不必等待"""
+    try:
+        for name in PRELOAD_MODULES:
+            try: profiler.import_module(name)
+            except ImportError as e: print(f"預先載入 {name} 失敗: {e}")
+        services.preload()
+    except Exception as e:
+        print(f"背景預先載入服務失敗: {e}")
+    finally:
+        on_done()
 
 def main():
+    profile_startup = '--profile-startup' in sys.argv
+    profiler = StartupProfiler(profile_startup)
+
     # --- 關鍵修改：在所有操作之前載入設定 ---
     config.load_settings()
     # --- 修改結束 ---
-    ollama_manager = OllamaManager()
+    profiler.mark("載入設定")
+
+    ttk = profiler.import_module('ttkbootstrap')
+    tkinterdnd2 = profiler.import_module('tkinterdnd2')
+    from tkinter import messagebox
+
+    class ThemedTkinterDnD(tkinterdnd2.TkinterDnD.Tk):
+        def __init__(self, *args, **kwargs):
+            themename = kwargs.pop('themename', 'litera')
+            super().__init__(*args, **kwargs)
+            ttk.Style(theme=themename)
+
+    from ollama_manager import OllamaManager
+    from http_client import base_url_of
+    ollama_manager = OllamaManager(base_url_of(config.OLLAMA_API_URL))
 
     if getattr(sys, 'frozen', False): base_path = os.path.dirname(sys.executable)
     else: base_path = os.path.dirname(__file__)
@@ -86,21 +143,31 @@ def main():
     try:
         with open(os.path.join(base_path, config.PROMPT_SINGLE_FILE), 'r', encoding='utf-8') as f: single_prompt = f.read()
         with open(os.path.join(base_path, config.PROMPT_MULTI_FILE), 'r', encoding='utf-8') as f: multi_prompt = f.read()
-        prompts = {'single': single_prompt, 'multi': multi_prompt}
+        with open(os.path.join(base_path, config.PROMPT_CHUNK_EXTRACT_FILE), 'r', encoding='utf-8') as f: chunk_extract_prompt = f.read()
+        prompts = {'single': single_prompt, 'multi': multi_prompt, 'chunk_extract': chunk_extract_prompt}
     except FileNotFoundError as e:
         messagebox.showerror("錯誤", f"找不到必要的 Prompt 檔案: {e.filename}")
         return
-    
-    try:
-        services = {
-            'file_processor': FileProcessorService(),
-            'ollama': OllamaService(api_url=config.OLLAMA_API_URL, model=config.OLLAMA_MODEL),
-            'pptx': PptxService(),
-            'pptx_filename': config.MASTER_PPTX_FILENAME
-        }
 
+    services = LazyServices({
+        'file_processor': _create_file_processor,
+        'ollama': _create_ollama_service,
+        'pptx': _create_pptx_service,
+        'pptx_filename': lambda: config.MASTER_PPTX_FILENAME,
+    })
+
+    try:
         root = ThemedTkinterDnD(themename="litera")
-        
+        # 先畫出視窗與載入提示，再載入介面與控制器
+        splash = ttk.Label(root, text="報告整理小幫手啟動中...", font=("", 14), bootstyle="secondary")
+        splash.place(relx=0.5, rely=0.5, anchor="center")
+        root.update()
+        profiler.mark("視窗已顯示")
+
+        AppUI = profiler.import_module('app_ui').AppUI
+        AppController = profiler.import_module('app_controller').AppController
+        splash.destroy()
+
         # --- 修正後的初始化順序 ---
         # 1. 先建立 Controller，但此時不傳入 ui
         controller = AppController(None, services, prompts, base_path, ollama_manager)
@@ -111,11 +178,23 @@ def main():
         # 4. 現在 controller.ui 已經有值了，可以安全地呼叫啟動方法
         controller.start_background_tasks()
         # --- 修正結束 ---
+        profiler.mark("介面建立完成")
+
+        def on_preload_done():
+            profiler.mark("背景載入完成")
+            if profile_startup:
+                profiler.report()
+                # 分析模式只量測啟動，完成後自動關閉
+                root.after(0, root.destroy)
+        threading.Thread(target=_preload_worker, args=(services, profiler, on_preload_done), daemon=True).start()
 
         def on_closing():
             if messagebox.askokcancel("退出", "您確定要退出報告整理小幫手嗎？"):
                 print("正在準備退出...")
+                controller.shutdown()
                 ollama_manager.stop_server()
+                file_processor = services.get_if_loaded('file_processor')
+                if file_processor: file_processor.shutdown()
                 root.destroy()
 
         root.protocol("WM_DELETE_WINDOW", on_closing)
@@ -126,4 +205,6 @@ def main():
         ollama_manager.stop_server()
 
 if __name__ == "__main__":
+    # 打包成 .exe 後，OCR 程序池的子程序需要此呼叫才能正常啟動
+    multiprocessing.freeze_support()
     main()
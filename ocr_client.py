@@ -0,0 +1,85 @@
+# ocr_client.py
+# 常駐 OCR 伺服器 (ocr_server.py) 的用戶端；伺服器不可用時回傳 None，由呼叫端改在本機辨識
+
+import base64
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import config
+
+_state_lock = threading.Lock()
+# 上次連線失敗的時間；RETRY 秒內不再嘗試，避免每張圖片都等一次連線失敗
+_last_failure = None
+
+def _server_unavailable():
+    with _state_lock:
+        return _last_failure is not None and time.monotonic() - _last_failure < config.OCR_SERVER_RETRY_SECONDS
+
+def _mark_failure():
+    global _last_failure
+    with _state_lock:
+        _last_failure = time.monotonic()
+
+def _mark_success():
+    global _last_failure
+    with _state_lock:
+        _last_failure = None
+
+def _session():
+    from http_client import get_session
+    # 不重試：連不上就立即改用本機辨識
+    return get_session(retries=0)
+
+def is_server_running(timeout=1):
+    import requests
+    try:
+        return _session().get(f"{config.OCR_SERVER_URL}/health", timeout=timeout).ok
+    except requests.exceptions.RequestException:
+        return False
+
+def recognize(images, **options):
+    """
+    把一批影像送到 OCR 伺服器，回傳 [{'text', 'error'(, 'lines')}, ...] (順序與輸入相同)。
+    images 的元素可以是 PIL 圖片或影像檔的 bytes；options 見 ocr_server.recognize_image。
+    伺服器停用或無法連線時回傳 None。
+    """
+    if not config.OCR_SERVER_ENABLED or _server_unavailable():
+        return None
+    import requests
+    from ocr_server import encode_image
+    items = [{'data': base64.b64encode(image).decode('ascii')} if isinstance(image, (bytes, bytearray))
+             else encode_image(image) for image in images]
+    try:
+        response = _session().post(f"{config.OCR_SERVER_URL}/ocr", json={'images': items, 'options': options},
+                                   timeout=(1, config.OCR_SERVER_TIMEOUT))
+        response.raise_for_status()
+        results = response.json()['results']
+    except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+        print(f"OCR 伺服器無法使用，改在本機辨識: {e}")
+        _mark_failure()
+        return None
+    _mark_success()
+    return results
+
+def start_server(wait_seconds=10, preload_paddle=False):
+    """
+    若伺服器尚未運行，則以背景子程序啟動 ocr_server.py，並等待它開始回應。
+    成功 (或本來就在運行) 回傳 True。打包成 .exe 時無法以此方式啟動，回傳 False。
+    """
+    if not config.OCR_SERVER_ENABLED: return False
+    if is_server_running(): return True
+    if getattr(sys, 'frozen', False): return False
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ocr_server.py')]
+    if preload_paddle: command.append('--preload-paddle')
+    creationflags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+    subprocess.Popen(command, creationflags=creationflags, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + wait_seconds
+    while time.monotonic() < deadline:
+        if is_server_running():
+            _mark_success()
+            return True
+        time.sleep(0.2)
+    return False
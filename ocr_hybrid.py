@@ -0,0 +1,88 @@
+# ocr_hybrid.py
+# 混合 OCR：PaddleOCR 信心分數偏低的文字框，裁切後拼成一張圖，只呼叫一次 Tesseract (image_to_data) 複查
+#
+# 中英混合的工程截圖中，兩個引擎各有擅長的字；整張圖跑兩次太慢，只複查困難的區塊即可。
+
+import re
+
+import numpy as np
+
+# 裁切時在文字框外多留的邊界與拼接時每塊之間的間隔 (像素)
+CROP_MARGIN = 3
+STITCH_GAP = 12
+# 兩個 CJK 字之間不加空白 (Tesseract 的中文結果以「字」為單位)
+_CJK_CHAR = re.compile(r'[\u2e80-\u9fff\uf900-\ufaff\uff00-\uffef]')
+
+def _to_gray_array(image):
+    if isinstance(image, np.ndarray):
+        if image.ndim == 2: return image
+        import cv2
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    return np.asarray(image.convert('L'))
+
+def stitch_crops(gray, boxes):
+    """
+    把多個文字框從灰階影像裁切出來，由上而下拼成一張白底的長條圖。
+    回傳 (拼接後的影像, [(該塊在拼接圖中的 top, bottom), ...])。
+    """
+    h, w = gray.shape
+    crops = []
+    for x0, y0, x1, y1 in boxes:
+        x0, y0 = max(0, int(x0) - CROP_MARGIN), max(0, int(y0) - CROP_MARGIN)
+        x1, y1 = min(w, int(np.ceil(x1)) + CROP_MARGIN), min(h, int(np.ceil(y1)) + CROP_MARGIN)
+        crops.append(gray[y0:y1, x0:x1])
+    width = max(crop.shape[1] for crop in crops) + 2 * STITCH_GAP
+    height = sum(crop.shape[0] for crop in crops) + STITCH_GAP * (len(crops) + 1)
+    canvas = np.full((height, width), 255, dtype=np.uint8)
+    spans, top = [], STITCH_GAP
+    for crop in crops:
+        canvas[top:top + crop.shape[0], STITCH_GAP:STITCH_GAP + crop.shape[1]] = crop
+        spans.append((top, top + crop.shape[0]))
+        top += crop.shape[0] + STITCH_GAP
+    return canvas, spans
+
+def _join_words(words):
+    parts = []
+    for word in words:
+        if parts and not (_CJK_CHAR.match(parts[-1][-1]) and _CJK_CHAR.match(word[0])):
+            parts.append(' ')
+        parts.append(word)
+    return ''.join(parts)
+
+def refine_low_confidence(image, lines, min_score, lang, tesseract_config=''):
+    """
+    將 score < min_score 的文字框交給 Tesseract 複查 (全部拼在一起，只呼叫一次)，
+    若 Tesseract 的平均信心較高就改用它的結果。直接修改並回傳 lines，以及被取代的數量。
+    """
+    weak = [line for line in lines if line.score is not None and line.score < min_score]
+    if not weak: return lines, 0
+
+    import pytesseract
+    canvas, spans = stitch_crops(_to_gray_array(image), [line.box for line in weak])
+    # psm 6：把拼接圖當成一個由多行組成的文字區塊
+    data = pytesseract.image_to_data(canvas, lang=lang, config=f"--psm 6 {tesseract_config}".strip(),
+                                     output_type=pytesseract.Output.DICT)
+
+    # 依每個字的垂直中心歸回對應的區塊 (spans 由上而下排列，以雙指標掃描)
+    words = [[] for _ in weak]
+    confidences = [[] for _ in weak]
+    order = sorted(range(len(data['text'])), key=lambda i: data['top'][i] + data['height'][i] / 2)
+    span_index = 0
+    for i in order:
+        text, conf = data['text'][i].strip(), float(data['conf'][i])
+        if not text or conf < 0: continue
+        center = data['top'][i] + data['height'][i] / 2
+        while span_index < len(spans) and spans[span_index][1] + STITCH_GAP / 2 < center: span_index += 1
+        if span_index == len(spans): break
+        words[span_index].append((data['left'][i], text))
+        confidences[span_index].append(conf)
+
+    replaced = 0
+    for line, line_words, line_confidences in zip(weak, words, confidences):
+        if not line_words: continue
+        score = sum(line_confidences) / len(line_confidences) / 100
+        if score > line.score:
+            line.text = _join_words([text for _, text in sorted(line_words)])
+            line.score = score
+            replaced += 1
+    return lines, replaced
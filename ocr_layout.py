@@ -0,0 +1,146 @@
+# ocr_layout.py
+# 把 OCR 引擎回傳的文字框 (box + 文字 + 信心分數) 依閱讀順序組成文字
+#
+# 閱讀順序：先找出「並排的欄」(例如左右兩欄的規格書)，欄內由上而下分成「列」，列內由左而右。
+# 聊天截圖中左右交錯的對話氣泡不會被當成兩欄：只有左右兩側的文字在垂直方向大量重疊時才分欄；
+# 左右逐列對齊的表格也不分欄，而是逐列閱讀。
+# 除了排序 (n log n) 之外，分欄、分列與輸出都是一次線性掃描。
+
+# 把欄位寬度切成多少格來找垂直空白
+_COVERAGE_BINS = 200
+# 空白至少要佔頁寬的比例才視為欄間距
+_MIN_GAP_RATIO = 0.03
+# 左右兩側有多少比例的文字列在垂直方向互相重疊時，才視為兩個並排的欄
+_MIN_COLUMN_OVERLAP = 0.5
+# 每一側至少要有幾個文字框才考慮分欄
+_MIN_COLUMN_LINES = 3
+# 左右兩框中線相差不到此倍數的行高，視為同一列對齊 (表格)
+_ALIGNED_CENTER = 0.3
+# 同一列：兩個框的垂直重疊至少佔較矮者高度的比例
+_SAME_ROW_OVERLAP = 0.5
+# 列距超過中位數行高的倍數時，輸出空行分段 (例如不同的對話氣泡)
+_PARAGRAPH_GAP = 1.2
+
+class OcrLine:
+    """一個文字框：文字、外接矩形 (x0, y0, x1, y1，為送進 OCR 的影像座標) 與信心分數"""
+    def __init__(self, text, box, score=None):
+        self.text = text
+        self.box = box
+        self.score = score
+
+    @property
+    def height(self):
+        return self.box[3] - self.box[1]
+
+    @property
+    def center_y(self):
+        return (self.box[1] + self.box[3]) / 2
+
+    def to_dict(self):
+        return {'text': self.text, 'box': [round(v, 1) for v in self.box], 'score': self.score}
+
+    def __repr__(self):
+        return f"OcrLine({self.text!r}, box={self.box}, score={self.score})"
+
+def lines_from_paddle(result):
+    """
+    解析 PaddleOCR 的 ocr() 結果：[[ [四個角點], (文字, 分數) ], ...] (每頁一個清單；沒有文字時為 None)。
+    """
+    lines = []
+    for page in result or []:
+        for item in page or []:
+            if len(item) < 2: continue
+            points, (text, score) = item[0], item[1]
+            xs = [p[0] for p in points]
+            ys = [p[1] for p in points]
+            lines.append(OcrLine(text, (min(xs), min(ys), max(xs), max(ys)), float(score)))
+    return lines
+
+def _split_columns(lines):
+    """依垂直空白把文字框分成由左而右的欄；左右兩側沒有並排的文字時維持一欄"""
+    left = min(line.box[0] for line in lines)
+    right = max(line.box[2] for line in lines)
+    width = right - left
+    if width <= 0: return [lines]
+
+    bin_width = width / _COVERAGE_BINS
+    covered = [False] * _COVERAGE_BINS
+    for line in lines:
+        start = int((line.box[0] - left) / bin_width)
+        end = min(_COVERAGE_BINS - 1, int((line.box[2] - left) / bin_width))
+        for i in range(start, end + 1): covered[i] = True
+
+    # 找出夠寬的空白，取其中點作為候選分界
+    boundaries, gap_start = [], None
+    min_gap = max(1, int(_COVERAGE_BINS * _MIN_GAP_RATIO))
+    for i, is_covered in enumerate(covered + [True]):
+        if not is_covered and gap_start is None: gap_start = i
+        elif is_covered and gap_start is not None:
+            if i - gap_start >= min_gap: boundaries.append(left + (gap_start + i) / 2 * bin_width)
+            gap_start = None
+
+    columns, remaining = [], lines
+    for boundary in boundaries:
+        left_part = [line for line in remaining if line.box[2] <= boundary]
+        right_part = [line for line in remaining if line.box[2] > boundary]
+        if _is_side_by_side(left_part, right_part):
+            columns.append(left_part)
+            remaining = right_part
+    columns.append(remaining)
+    return columns
+
+def _is_side_by_side(left_part, right_part):
+    """
+    左右兩側是否為並排的兩欄 (以排序後雙指標掃描)：
+    左側夠多的文字框與右側某個框在垂直方向重疊，但各列的中線並未對齊。
+    中線對齊的是表格 / 「欄位: 值」，應該逐列由左而右閱讀，不分欄。
+    """
+    if len(left_part) < _MIN_COLUMN_LINES or len(right_part) < _MIN_COLUMN_LINES: return False
+    left_sorted = sorted(left_part, key=lambda line: line.box[1])
+    right_sorted = sorted(right_part, key=lambda line: line.box[1])
+    overlapping, aligned, j = 0, 0, 0
+    for line in left_sorted:
+        while j < len(right_sorted) and right_sorted[j].box[3] < line.box[1]: j += 1
+        if j < len(right_sorted) and right_sorted[j].box[1] <= line.box[3]:
+            overlapping += 1
+            if abs(right_sorted[j].center_y - line.center_y) <= _ALIGNED_CENTER * line.height: aligned += 1
+    return overlapping / len(left_sorted) >= _MIN_COLUMN_OVERLAP and aligned < _MIN_COLUMN_OVERLAP * overlapping
+
+def _group_rows(column):
+    """欄內由上而下分列：中心點落在目前列的垂直範圍內 (且重疊足夠) 就併入同一列"""
+    rows = []
+    for line in sorted(column, key=lambda line: line.center_y):
+        if rows:
+            row_top, row_bottom = rows[-1][0], rows[-1][1]
+            overlap = min(row_bottom, line.box[3]) - max(row_top, line.box[1])
+            if overlap >= _SAME_ROW_OVERLAP * min(row_bottom - row_top, line.height):
+                rows[-1][2].append(line)
+                rows[-1][0], rows[-1][1] = min(row_top, line.box[1]), max(row_bottom, line.box[3])
+                continue
+        rows.append([line.box[1], line.box[3], [line]])
+    return [(top, bottom, sorted(items, key=lambda line: line.box[0])) for top, bottom, items in rows]
+
+def reading_order(lines):
+    """回傳依閱讀順序排列的欄 -> 列 -> 文字框：[[ (top, bottom, [OcrLine, ...]), ... ], ...]"""
+    if not lines: return []
+    return [_group_rows(column) for column in _split_columns(lines)]
+
+def layout_to_text(columns):
+    """把 reading_order 的結果輸出成文字：列內以空白相接，段落 (較大的列距) 與欄之間空一行"""
+    heights = sorted(line.height for column in columns for _, _, row in column for line in row)
+    if not heights: return ''
+    median_height = heights[len(heights) // 2]
+    parts = []
+    for column in columns:
+        if parts: parts.append('\n\n')
+        previous_bottom = None
+        for top, bottom, row in column:
+            if previous_bottom is not None:
+                parts.append('\n\n' if top - previous_bottom > _PARAGRAPH_GAP * median_height else '\n')
+            parts.append(' '.join(line.text for line in row))
+            previous_bottom = bottom
+    return ''.join(parts)
+
+def assemble(lines):
+    """文字框 -> 依閱讀順序組成的文字"""
+    return layout_to_text(reading_order(lines))
@@ -0,0 +1,207 @@
+# ocr_preprocess.py
+# OCR 前處理管線：GUI (services)、網頁版 (webapp_v19) 與 app/ocr_utils 共用同一套實作
+#
+# 可用的前處理方式 (variant)：
+#   'none' : 不處理，直接把原圖交給 OCR
+#   'otsu' : 灰階 -> (深色模式則反相) -> Otsu 二值化 (原 webapp_v19 的做法)
+#   'full' : 灰階 -> CLAHE -> 自適應二值化 -> 中值去噪 -> 校正傾斜 -> 放大 1.5 倍 (原 app/ocr_utils 的做法)
+#   'auto' : 先以縮小取樣的影像統計判斷圖片類型，只執行需要的步驟；
+#            乾淨的介面截圖只做 Otsu，不做去噪、校正傾斜與放大
+#
+# 各步驟都寫入同一組重複使用的 uint8 緩衝區 (cv2 的 dst= 參數)，不在每一步轉回 PIL。
+
+import os
+import threading
+
+import numpy as np
+import cv2
+
+VARIANTS = ('none', 'otsu', 'full', 'auto')
+
+# --- 影像統計的判斷門檻 ---
+# 統計時最多取樣的像素數 (以固定間隔取樣，不複製整張圖)
+STATS_MAX_SAMPLES = 256 * 1024
+# 最常見的 8 個灰階值佔全部像素的比例超過此值，視為純色背景的介面截圖
+SCREENSHOT_PALETTE_RATIO = 0.6
+# 灰階標準差低於此值視為低對比，需先做 CLAHE
+LOW_CONTRAST_STD = 40.0
+# 非截圖且短邊小於此值時才放大 (文字可能過小)
+UPSCALE_BELOW_PX = 1500
+UPSCALE_FACTOR = 1.5
+# --- 傾斜校正 ---
+# 只搜尋 ±DESKEW_MAX_ANGLE 度；估計角度小於 DESKEW_MIN_ANGLE 度時不旋轉 (省下 warpAffine)
+DESKEW_MAX_ANGLE = 15
+DESKEW_MIN_ANGLE = 0.3
+# 估計時縮小後的長邊像素與最多使用的文字像素數 (決定記憶體上限)
+DESKEW_MAX_SIDE = 1024
+DESKEW_MAX_POINTS = 200_000
+DESKEW_MIN_POINTS = 50
+
+class ImageStats:
+    """由縮小取樣的灰階影像計算出的統計值，用來決定要執行哪些前處理步驟"""
+    def __init__(self, gray):
+        h, w = gray.shape
+        step = max(1, int(np.sqrt(h * w / STATS_MAX_SAMPLES)))
+        sample = gray[::step, ::step]
+        histogram = np.bincount(sample.ravel(), minlength=256)
+        total = sample.size
+
+        corner = max(1, min(10, h // 4, w // 4))
+        corners = (gray[:corner, :corner], gray[:corner, -corner:], gray[-corner:, :corner], gray[-corner:, -corner:])
+        self.corner_mean = float(np.mean([c.mean() for c in corners]))
+        self.std = float(sample.std())
+        self.palette_ratio = float(np.sort(histogram)[-8:].sum()) / total
+        self.height, self.width = h, w
+
+    @property
+    def dark(self):
+        """四個角落偏暗：深色模式 (淺色文字、深色背景)"""
+        return self.corner_mean <= 128
+
+    @property
+    def screenshot(self):
+        return self.palette_ratio >= SCREENSHOT_PALETTE_RATIO
+
+    @property
+    def low_contrast(self):
+        return self.std < LOW_CONTRAST_STD
+
+    def __repr__(self):
+        return (f"ImageStats({self.width}x{self.height}, dark={self.dark}, screenshot={self.screenshot}, "
+                f"std={self.std:.1f}, palette={self.palette_ratio:.2f})")
+
+def plan_stages(variant, stats, enlarge=True):
+    """依前處理方式與影像統計，決定要執行的步驟 (依序)"""
+    if variant == 'otsu':
+        return ['invert', 'otsu'] if stats.dark else ['otsu']
+    if variant == 'full':
+        stages = ['clahe', 'adaptive', 'median', 'deskew']
+        return stages + ['upscale'] if enlarge else stages
+    if variant == 'auto':
+        stages = ['invert'] if stats.dark else []
+        if stats.screenshot:
+            # 介面截圖：文字本來就是水平且清晰，只需二值化 (大片純色背景會讓標準差偏低，不能據此判斷對比)
+            stages.append('otsu')
+        else:
+            if stats.low_contrast: stages.append('clahe')
+            stages += ['adaptive', 'median', 'deskew']
+            if enlarge and min(stats.height, stats.width) < UPSCALE_BELOW_PX: stages.append('upscale')
+        return stages
+    raise ValueError(f"不支援的前處理方式: {variant}")
+
+def estimate_skew(binary):
+    """
+    以投影剖面估計文字的傾斜角度 (度，與 cv2.getRotationMatrix2D 同方向，校正時旋轉 -angle)；沒有文字時回傳 0。
+    先把二值影像縮小到長邊 DESKEW_MAX_SIDE，再取最多 DESKEW_MAX_POINTS 個文字像素，
+    對每個候選角度計算旋轉後的列投影，文字行對齊時投影最集中 (平方和最大)。
+    記憶體用量只與上述兩個上限有關，與原圖大小無關。
+    """
+    h, w = binary.shape
+    scale = min(1.0, DESKEW_MAX_SIDE / max(h, w))
+    small = cv2.resize(binary, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA) if scale < 1.0 else binary
+    # 文字為黑色：縮小後灰階值低於一半的視為文字像素
+    ys, xs = np.nonzero(small < 128)
+    if ys.size < DESKEW_MIN_POINTS: return 0.0
+    if ys.size > DESKEW_MAX_POINTS:
+        step = ys.size // DESKEW_MAX_POINTS + 1
+        ys, xs = ys[::step], xs[::step]
+    ys = ys.astype(np.float32) - small.shape[0] / 2
+    xs = xs.astype(np.float32) - small.shape[1] / 2
+
+    def best_angle(candidates):
+        radians = np.deg2rad(candidates)
+        scores = []
+        for sin, cos in zip(np.sin(radians), np.cos(radians)):
+            rows = np.rint(ys * cos + xs * sin).astype(np.int32)
+            counts = np.bincount(rows - rows.min())
+            scores.append(float(np.dot(counts, counts)))
+        return float(candidates[int(np.argmax(scores))])
+
+    # 先粗略 (1 度) 再在附近細搜 (0.1 度)
+    coarse = best_angle(np.arange(-DESKEW_MAX_ANGLE, DESKEW_MAX_ANGLE + 0.5, 1.0))
+    return best_angle(np.arange(coarse - 1.0, coarse + 1.05, 0.1))
+
+class Preprocessor:
+    """
+    持有一組可重複使用的 uint8 緩衝區；同一尺寸的圖片連續處理時不再配置記憶體。
+    回傳的陣列可能就是內部緩衝區，下一次呼叫 run() 前必須使用完畢 (不可跨執行緒共用同一個實例)。
+    """
+    def __init__(self):
+        self._buffers = []
+        self._upscaled = None
+        self._clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+
+    def _ensure_buffers(self, shape):
+        if not self._buffers or self._buffers[0].shape != shape:
+            self._buffers = [np.empty(shape, dtype=np.uint8), np.empty(shape, dtype=np.uint8)]
+
+    def to_gray(self, image):
+        """PIL 圖片或 numpy 陣列 -> 寫入緩衝區的灰階影像"""
+        if not isinstance(image, np.ndarray):
+            if image.mode not in ('L', 'RGB'): image = image.convert('RGB')
+            image = np.asarray(image)
+        if image.ndim == 2:
+            self._ensure_buffers(image.shape)
+            np.copyto(self._buffers[0], image)
+        else:
+            self._ensure_buffers(image.shape[:2])
+            code = cv2.COLOR_RGBA2GRAY if image.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+            cv2.cvtColor(image, code, dst=self._buffers[0])
+        return self._buffers[0]
+
+    def run(self, image, variant='auto', enlarge=True, debug_dir=None):
+        """執行前處理，回傳 (uint8 灰階/二值陣列, ImageStats)"""
+        gray = self.to_gray(image)
+        stats = ImageStats(gray)
+        if debug_dir:
+            os.makedirs(debug_dir, exist_ok=True)
+            _save_debug(debug_dir, 'gray', gray)
+
+        src, dst = self._buffers
+        for stage in plan_stages(variant, stats, enlarge):
+            if stage == 'invert':
+                cv2.bitwise_not(src, dst=dst)
+            elif stage == 'clahe':
+                self._clahe.apply(src, dst=dst)
+            elif stage == 'otsu':
+                cv2.threshold(src, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=dst)
+            elif stage == 'adaptive':
+                cv2.adaptiveThreshold(src, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2, dst=dst)
+            elif stage == 'median':
+                cv2.medianBlur(src, 3, dst=dst)
+            elif stage == 'deskew':
+                angle = estimate_skew(src)
+                if abs(angle) < DESKEW_MIN_ANGLE: continue
+                h, w = src.shape
+                matrix = cv2.getRotationMatrix2D((w // 2, h // 2), -angle, 1.0)
+                cv2.warpAffine(src, matrix, (w, h), dst=dst, flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+            elif stage == 'upscale':
+                size = (int(src.shape[1] * UPSCALE_FACTOR), int(src.shape[0] * UPSCALE_FACTOR))
+                if self._upscaled is None or self._upscaled.shape != (size[1], size[0]):
+                    self._upscaled = np.empty((size[1], size[0]), dtype=np.uint8)
+                cv2.resize(src, size, dst=self._upscaled, interpolation=cv2.INTER_CUBIC)
+                if debug_dir: _save_debug(debug_dir, stage, self._upscaled)
+                # 放大一定是最後一步
+                return self._upscaled, stats
+            src, dst = dst, src
+            if debug_dir: _save_debug(debug_dir, stage, src)
+        return src, stats
+
+def _save_debug(debug_dir, name, array):
+    # 以 PIL 存檔：cv2.imwrite 在 Windows 上不支援中文路徑
+    from PIL import Image
+    Image.fromarray(array).save(os.path.join(debug_dir, f"{name}.png"))
+
+_local = threading.local()
+
+def preprocess(image, variant='auto', enlarge=True, debug_dir=None):
+    """
+    以目前執行緒專用的 Preprocessor 執行前處理。
+    variant 為 'none' 時原樣回傳 (image, None)；其他情況回傳 (uint8 陣列, ImageStats)，
+    陣列屬於共用緩衝區，請在同一執行緒下一次呼叫前使用完畢。
+    """
+    if variant == 'none':
+        return image, None
+    if not hasattr(_local, 'preprocessor'):
+        _local.preprocessor = Preprocessor()
+    return _local.preprocessor.run(image, variant, enlarge, debug_dir)
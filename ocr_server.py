@@ -0,0 +1,178 @@
+# ocr_server.py
+# 常駐的本機 OCR 伺服器：PaddleOCR 模型只載入一次，並讓多個程序 (桌面版、Streamlit) 共用
+#
+# 啟動方式：
+#   python ocr_server.py [--host 127.0.0.1] [--port 8765] [--preload-paddle]
+#
+# API (JSON)：
+#   GET  /health -> {"ok": true, "paddle_loaded": bool}
+#   POST /ocr    -> 請求 {"images": [影像, ...], "options": {...}}
+#                   回應 {"results": [{"text": str, "error": str|null}, ...]} (順序與請求相同；
+#                   options.return_lines 為 true 時另含 "lines": [{"text", "box", "score"}, ...])
+#   影像的格式：{"data": base64}  (PNG/JPEG 等檔案內容)
+#            或 {"data": base64, "mode": "RGB", "size": [w, h]}  (未壓縮的像素，省去編碼時間)
+#   options：use_paddle, use_tesseract, lang, variant, tesseract_config, return_lines, hybrid, text_regions (見 recognize_image)
+#
+# 本模組同時提供 recognize_image()，伺服器無法使用時呼叫端可直接在本機執行同一套流程。
+
+import argparse
+import base64
+import io
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import config
+from ocr_layout import assemble, lines_from_paddle
+
+_paddle = None
+_paddle_lock = threading.Lock()
+
+def get_paddle():
+    """第一次使用時才建立 PaddleOCR (載入模型需要數秒與大量記憶體)"""
+    global _paddle
+    with _paddle_lock:
+        if _paddle is None:
+            from paddleocr import PaddleOCR
+            _paddle = PaddleOCR(use_angle_cls=True, lang='ch')  # 可設為 'ch', 'en', 'ch_en'
+        return _paddle
+
+def paddle_loaded():
+    return _paddle is not None
+
+def recognize_image(image, use_paddle=False, use_tesseract=True, lang=None, variant='none',
+                    tesseract_config='', enlarge=True, debug_dir=None, return_lines=False, hybrid=False,
+                    text_regions=False):
+    """
+    對單張 PIL 圖片執行 前處理 -> PaddleOCR -> (沒有結果時) Tesseract，回傳文字。
+    hybrid=True 時，PaddleOCR 信心低於 config.OCR_HYBRID_MIN_SCORE 的文字框會再交給 Tesseract 複查 (見 ocr_hybrid)。
+    text_regions=True 時，Tesseract 只辨識偵測到的文字區塊 (見 text_regions)。
+    return_lines=True 時回傳 (文字, [OcrLine, ...])；文字框只有 PaddleOCR 會提供，座標為前處理後影像的座標。
+    Tesseract 的錯誤 (例如找不到引擎) 會直接拋出，由呼叫端決定如何呈現；
+    PaddleOCR 失敗且沒有啟用 Tesseract 時也會拋出該錯誤 (而不是回傳空字串)。
+    """
+    from ocr_preprocess import preprocess
+    lang = lang or config.OCR_LANGUAGES
+    pre, _ = preprocess(image, variant, enlarge=enlarge, debug_dir=debug_dir)
+    text, lines = '', []
+    paddle_error = None
+    if use_paddle:
+        try:
+            import numpy as np
+            array = pre if isinstance(pre, np.ndarray) else np.asarray(pre.convert('RGB'))
+            ocr = get_paddle()
+            # PaddleOCR 的推論不是執行緒安全的，同一時間只處理一張
+            with _paddle_lock:
+                res = ocr.ocr(array, cls=True)
+            lines = lines_from_paddle(res)
+        except Exception as e:
+            print('PaddleOCR error:', e)
+            paddle_error = e
+        if hybrid and lines:
+            # Tesseract 複查失敗 (例如找不到引擎) 時保留 PaddleOCR 原本的結果
+            try:
+                from ocr_hybrid import refine_low_confidence
+                lines, _ = refine_low_confidence(array, lines, config.OCR_HYBRID_MIN_SCORE, lang, tesseract_config)
+            except Exception as e:
+                print('Hybrid OCR (Tesseract) error, keeping PaddleOCR result:', e)
+        if lines: text = assemble(lines)
+    if use_tesseract and not text:
+        import pytesseract
+        if text_regions:
+            from text_regions import ocr_text_regions
+            text = ocr_text_regions(pre, lang, tesseract_config, workers=config.OCR_REGION_WORKERS)
+        if not text_regions or text is None:
+            text = pytesseract.image_to_string(pre, lang=lang, config=tesseract_config)
+    elif paddle_error is not None:
+        raise paddle_error
+    return (text, lines) if return_lines else text
+
+def decode_image(item):
+    from PIL import Image
+    data = base64.b64decode(item['data'])
+    if 'size' in item:
+        return Image.frombytes(item['mode'], tuple(item['size']), data)
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+def encode_image(image):
+    """PIL 圖片 -> 請求用的 dict (送未壓縮像素：本機傳輸比 PNG 編碼快)"""
+    if image.mode not in ('L', 'RGB', 'RGBA'): image = image.convert('RGB')
+    return {'data': base64.b64encode(image.tobytes()).decode('ascii'), 'mode': image.mode, 'size': list(image.size)}
+
+class OcrRequestHandler(BaseHTTPRequestHandler):
+    # 由 serve() 設定：同一批次中 Tesseract 平行處理用的執行緒池
+    executor = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlsplit(self.path).path == '/health':
+            self._send_json(200, {'ok': True, 'paddle_loaded': paddle_loaded()})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/ocr':
+            self._send_json(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length))
+            items = request['images']
+            options = request.get('options', {})
+        except (ValueError, KeyError) as e:
+            self._send_json(400, {'error': f"請求格式錯誤: {e}"})
+            return
+
+        def run(item):
+            try:
+                if options.get('return_lines'):
+                    text, lines = recognize_image(decode_image(item), **options)
+                    return {'text': text, 'lines': [line.to_dict() for line in lines], 'error': None}
+                return {'text': recognize_image(decode_image(item), **options), 'error': None}
+            except Exception as e:
+                return {'text': '', 'error': str(e)}
+
+        self._send_json(200, {'results': list(self.executor.map(run, items))})
+
+    def log_message(self, format, *args):
+        # 每個請求都印出會淹沒主控台，只保留錯誤
+        pass
+
+def serve(host='127.0.0.1', port=8765, workers=None, preload_paddle=False):
+    OcrRequestHandler.executor = ThreadPoolExecutor(max_workers=workers or config.OCR_MAX_WORKERS)
+    server = ThreadingHTTPServer((host, port), OcrRequestHandler)
+    server.daemon_threads = True
+    if preload_paddle:
+        threading.Thread(target=get_paddle, daemon=True).start()
+    print(f"OCR 伺服器已啟動: http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        OcrRequestHandler.executor.shutdown(wait=False)
+
+def main(argv=None):
+    default = urlsplit(config.OCR_SERVER_URL)
+    parser = argparse.ArgumentParser(description="報告整理小幫手 - 常駐 OCR 伺服器")
+    parser.add_argument('--host', default=default.hostname)
+    parser.add_argument('--port', type=int, default=default.port)
+    parser.add_argument('--workers', type=int, default=None, help="同一批次中平行處理的影像數")
+    parser.add_argument('--preload-paddle', action='store_true', help="啟動後立即在背景載入 PaddleOCR 模型")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.workers, args.preload_paddle)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+# ollama_manager.py
+# 負責偵測、啟動與關閉本機的 Ollama 服務
+
+import subprocess
+import sys
+import time
+from tkinter import messagebox
+
+import config
+
+class OllamaManager:
+    def __init__(self, api_base_url="http://localhost:11434"):
+        self.api_base_url = api_base_url
+        self.ollama_process = None
+        self.started_by_app = False
+        self._session = None
+
+    @property
+    def session(self):
+        """探測用的連線不做重試，失敗就立即回報，由 wait_until_ready 自己控制退避 (第一次使用時才載入 requests)"""
+        if self._session is None:
+            from http_client import get_session
+            self._session = get_session(retries=0)
+        return self._session
+
+    def _is_server_running(self):
+        import requests
+        try:
+            self.session.head(self.api_base_url, timeout=3)
+            return True
+        except (requests.exceptions.ConnectionError, requests.exceptions.ReadTimeout):
+            return False
+
+    def wait_until_ready(self, timeout=None):
+        """以指數退避輪詢 /api/tags，伺服器一回應就立即返回 True；逾時返回 False"""
+        import requests
+        timeout = config.OLLAMA_STARTUP_TIMEOUT if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        delay = 0.1
+        while True:
+            try:
+                if self.session.get(f"{self.api_base_url}/api/tags", timeout=2).ok:
+                    return True
+            except requests.exceptions.RequestException:
+                pass
+            if self.ollama_process is not None and self.ollama_process.poll() is not None:
+                print("Ollama 服務程序已結束，停止等待。")
+                return False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 2.0)
+
+    def start_server_non_blocking(self):
+        if self._is_server_running():
+            print("偵測到 Ollama 服務已在運行。")
+            self.started_by_app = False
+            return True
+
+        print("Ollama 服務未運行，正在嘗試在背景自動啟動...")
+        try:
+            creationflags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+            self.ollama_process = subprocess.Popen(["ollama", "serve"], creationflags=creationflags)
+            self.started_by_app = True
+            print(f"Ollama 服務已啟動，主程序 ID: {self.ollama_process.pid}")
+            return True
+        except FileNotFoundError:
+            messagebox.showerror("錯誤", "找不到 'ollama' 指令。\n請確認您已正確安裝 Ollama 且其路徑已加入系統環境變數。")
+            return False
+        except Exception as e:
+            messagebox.showerror("啟動失敗", f"自動啟動 Ollama 服務時發生錯誤：\n{e}")
+            return False
+
+    def stop_server(self):
+        if not self.ollama_process or not self.started_by_app: return
+
+        print(f"正在關閉由本程式啟動的 Ollama 服務 (主程序 ID: {self.ollama_process.pid})...")
+        try:
+            if sys.platform == "win32":
+                command = f"taskkill /F /PID {self.ollama_process.pid} /T"
+                subprocess.run(command, capture_output=True, check=False)
+                print("Ollama 服務關閉指令已發送。")
+            else:
+                self.ollama_process.terminate()
+                self.ollama_process.wait(timeout=5)
+                print("Ollama 服務已成功關閉。")
+        except Exception as e:
+            print(f"關閉 Ollama 服務時發生錯誤: {e}")
+        finally:
+            self.ollama_process = None
+            self.started_by_app = False
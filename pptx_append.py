@@ -0,0 +1,346 @@
+# pptx_append.py
+# 增量附加投影片：只新增投影片相關的 part，不重新解析與壓縮整份簡報
+#
+# python-pptx 的 Presentation(path) + prs.save() 會載入並重寫所有投影片與圖片，
+# 簡報越大越慢。這裡直接操作 .pptx (zip) 套件：
+#   1. 其他 zip 項目以「原始壓縮位元組」直接複製，不解壓、不重新壓縮、不解析 XML。
+#   2. 只重寫 presentation.xml、它的 .rels 與 [Content_Types].xml 這三個小檔案。
+#   3. 新投影片的 XML 由這裡直接產生，並指向既有的版面配置 (slide layout)。
+# 結果先寫入同目錄的暫存檔，再以 os.replace 原子性地取代原檔。
+
+import copy
+import io
+import os
+import posixpath
+import re
+import shutil
+import struct
+import sys
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape
+
+from lxml import etree
+
+NS = {
+    'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+    'p': 'http://schemas.openxmlformats.org/presentationml/2006/main',
+    'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+    'rel': 'http://schemas.openxmlformats.org/package/2006/relationships',
+    'ct': 'http://schemas.openxmlformats.org/package/2006/content-types',
+}
+RT_OFFICE_DOCUMENT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+RT_SLIDE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/slide'
+RT_SLIDE_LAYOUT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/slideLayout'
+CT_SLIDE = 'application/vnd.openxmlformats-officedocument.presentationml.slide+xml'
+
+# 新投影片不會複製這些版面配置上的佔位符 (與 python-pptx 的 add_slide 行為一致)
+_SKIPPED_PLACEHOLDER_TYPES = ('dt', 'ftr', 'sldNum')
+# XML 不允許的控制字元
+_ILLEGAL_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_COPY_CHUNK_SIZE = 1024 * 1024
+# 原始壓縮資料的複製需要直接登錄到 ZipFile 的內部狀態 (filelist、NameToInfo、start_dir、_didModify)；
+# 只在驗證過的 Python 版本上使用，其他版本拋出 PackageStructureError 讓呼叫端改用完整載入的方式
+_RAW_COPY_PYTHON_VERSIONS = ((3, 8), (3, 13))
+_RAW_COPY_ZIPFILE_ATTRS = ('fp', 'filelist', 'NameToInfo', 'start_dir', '_didModify')
+
+class PackageStructureError(Exception):
+    """簡報結構不符合預期 (例如找不到版面配置)，呼叫端應改用完整載入的方式"""
+
+def _qn(tag):
+    prefix, local = tag.split(':')
+    return f'{{{NS[prefix]}}}{local}'
+
+def _rels_path(partname):
+    directory, filename = posixpath.split(partname)
+    return posixpath.join(directory, '_rels', f'{filename}.rels')
+
+def _resolve(source_partname, target):
+    return posixpath.normpath(posixpath.join(posixpath.dirname(source_partname), target))
+
+def _read_xml(zin, name):
+    try:
+        return etree.fromstring(zin.read(name))
+    except KeyError:
+        raise PackageStructureError(f"簡報中缺少 {name}")
+    except etree.XMLSyntaxError as e:
+        raise PackageStructureError(f"{name} 的 XML 格式錯誤: {e}") from e
+
+def _relationship_targets(zin, partname):
+    """回傳 {rId: (type, 絕對 partname)}；缺少 Target 的損壞關聯略過"""
+    rels = _read_xml(zin, _rels_path(partname))
+    return {rel.get('Id'): (rel.get('Type'), _resolve(partname, rel.get('Target')))
+            for rel in rels.iter(_qn('rel:Relationship')) if rel.get('Target')}
+
+def _relationship_target(rels, element, description):
+    """依 element 的 r:id 查出關聯指向的 partname；r:id 缺少或指向不存在的關聯時拋出 PackageStructureError"""
+    rel_id = element.get(_qn('r:id'))
+    try:
+        return rels[rel_id][1]
+    except KeyError:
+        raise PackageStructureError(f"{description}的關聯 {rel_id} 不存在") from None
+
+def _presentation_partname(zin):
+    root_rels = _read_xml(zin, '_rels/.rels')
+    for rel in root_rels.iter(_qn('rel:Relationship')):
+        if rel.get('Type') == RT_OFFICE_DOCUMENT:
+            return rel.get('Target').lstrip('/')
+    raise PackageStructureError("找不到 presentation.xml")
+
+def _layout_partname(zin, pres_partname, pres_xml, pres_rels, layout_index):
+    """依照 python-pptx prs.slide_layouts[i] 的定義：第一個母片的第 i 個版面配置"""
+    master_id = pres_xml.find('p:sldMasterIdLst/p:sldMasterId', NS)
+    if master_id is None:
+        raise PackageStructureError("簡報中沒有投影片母片")
+    master_partname = _relationship_target(pres_rels, master_id, "投影片母片")
+    layout_ids = _read_xml(zin, master_partname).findall('p:sldLayoutIdLst/p:sldLayoutId', NS)
+    if not 0 <= layout_index < len(layout_ids):
+        raise PackageStructureError(f"母片中沒有索引 {layout_index} 的版面配置")
+    master_rels = _relationship_targets(zin, master_partname)
+    return _relationship_target(master_rels, layout_ids[layout_index], f"版面配置 {layout_index} ")
+
+def _layout_placeholders(layout_xml):
+    """回傳要複製到新投影片的佔位符 <p:ph> 元素清單"""
+    placeholders = []
+    for sp in layout_xml.iterfind('p:cSld/p:spTree/p:sp', NS):
+        ph = sp.find('p:nvSpPr/p:nvPr/p:ph', NS)
+        if ph is None or ph.get('type') in _SKIPPED_PLACEHOLDER_TYPES:
+            continue
+        placeholders.append((ph, sp.find('p:nvSpPr/p:cNvPr', NS).get('name', '')))
+    return placeholders
+
+def _clean_text(text):
+    return escape(_ILLEGAL_XML_CHARS.sub('', text))
+
+def _title_paragraph_xml(title):
+    return f'<a:p><a:r><a:rPr lang="zh-TW" dirty="0"/><a:t>{_clean_text(title)}</a:t></a:r></a:p>'
+
+def _body_paragraph_xml(text, level, bold, size_pt):
+    return (f'<a:p><a:pPr lvl="{level}"><a:defRPr sz="{int(size_pt * 100)}" b="{1 if bold else 0}"/></a:pPr>'
+            f'<a:r><a:rPr lang="zh-TW" dirty="0"/><a:t>{_clean_text(text)}</a:t></a:r></a:p>')
+
+def build_slide_xml(layout_placeholders, title, paragraphs):
+    """
+    產生一張投影片的 XML。
+    paragraphs: [(文字, 層級, 是否粗體, 字級 pt)]，與 PptxService 逐段設定的格式相同。
+    內容框以一個空段落開頭，與 text_frame.clear() 後再 add_paragraph() 的結果一致。
+    """
+    title_done = body_done = False
+    shapes = []
+    for shape_id, (ph, name) in enumerate(layout_placeholders, start=2):
+        ph_type = ph.get('type', 'obj')
+        ph_idx = ph.get('idx', '0')
+        ph_attrs = ''.join(f' {attr}="{ph.get(attr)}"' for attr in ('type', 'orient', 'sz', 'idx') if ph.get(attr) is not None)
+
+        body_pr = '<a:bodyPr/>'
+        if ph_type in ('title', 'ctrTitle') and not title_done:
+            body_xml = _title_paragraph_xml(title)
+            title_done = True
+        elif ph_idx == '1' and not body_done:
+            # 等同 text_frame.word_wrap = True
+            body_pr = '<a:bodyPr wrap="square"/>'
+            body_xml = '<a:p/>' + ''.join(_body_paragraph_xml(*p) for p in paragraphs)
+            body_done = True
+        else:
+            body_xml = '<a:p/>'
+
+        shapes.append(
+            f'<p:sp><p:nvSpPr><p:cNvPr id="{shape_id}" name="{escape(name, {chr(34): "&quot;"})}"/>'
+            f'<p:cNvSpPr><a:spLocks noGrp="1"/></p:cNvSpPr><p:nvPr><p:ph{ph_attrs}/></p:nvPr></p:nvSpPr>'
+            f'<p:spPr/><p:txBody>{body_pr}<a:lstStyle/>{body_xml}</p:txBody></p:sp>')
+
+    if not title_done or not body_done:
+        raise PackageStructureError("版面配置缺少標題或內容 (idx=1) 佔位符")
+
+    return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<p:sld xmlns:a="{NS["a"]}" xmlns:r="{NS["r"]}" xmlns:p="{NS["p"]}"><p:cSld><p:spTree>'
+            '<p:nvGrpSpPr><p:cNvPr id="1" name=""/><p:cNvGrpSpPr/><p:nvPr/></p:nvGrpSpPr>'
+            '<p:grpSpPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="0" cy="0"/><a:chOff x="0" y="0"/><a:chExt cx="0" cy="0"/></a:xfrm></p:grpSpPr>'
+            + ''.join(shapes) +
+            '</p:spTree></p:cSld><p:clrMapOvr><a:masterClrMapping/></p:clrMapOvr></p:sld>').encode('utf-8')
+
+def _slide_rels_xml(layout_target):
+    return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<Relationships xmlns="{NS["rel"]}">'
+            f'<Relationship Id="rId1" Type="{RT_SLIDE_LAYOUT}" Target="{layout_target}"/>'
+            '</Relationships>').encode('utf-8')
+
+def _copy_raw_entry(src_fp, zout, info):
+    """
+    直接複製 zip 項目的壓縮資料 (不解壓縮)。
+    zipfile 沒有公開的 raw copy API，這裡自行寫入本地檔頭並登錄到中央目錄。
+    """
+    src_fp.seek(info.header_offset)
+    local_header = src_fp.read(zipfile.sizeFileHeader)
+    if local_header[:4] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"{info.filename} 的本地檔頭不正確")
+    name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+    src_fp.seek(info.header_offset + zipfile.sizeFileHeader + name_length + extra_length)
+
+    out_info = zipfile.ZipInfo(info.filename, info.date_time)
+    out_info.compress_type = info.compress_type
+    out_info.CRC = info.CRC
+    out_info.compress_size = info.compress_size
+    out_info.file_size = info.file_size
+    out_info.external_attr = info.external_attr
+    out_info.create_system = info.create_system
+    # 大小已寫在本地檔頭中，不需要 data descriptor
+    out_info.flag_bits = info.flag_bits & ~0x08
+    out_info.header_offset = zout.fp.tell()
+
+    zout.fp.write(out_info.FileHeader())
+    remaining = info.compress_size
+    while remaining > 0:
+        chunk = src_fp.read(min(_COPY_CHUNK_SIZE, remaining))
+        if not chunk:
+            raise zipfile.BadZipFile(f"{info.filename} 的資料不完整")
+        zout.fp.write(chunk)
+        remaining -= len(chunk)
+
+    _register_raw_entry(zout, out_info)
+
+def _check_raw_copy_supported(zout):
+    """確認目前的 Python / zipfile 可以直接登錄原始項目，否則拋出 PackageStructureError (在寫入任何資料前呼叫)"""
+    low, high = _RAW_COPY_PYTHON_VERSIONS
+    if not low <= sys.version_info[:2] <= high:
+        raise PackageStructureError(f"未驗證 Python {sys.version_info[0]}.{sys.version_info[1]} 的 zipfile 內部結構，不使用原始資料複製")
+    missing = [attr for attr in _RAW_COPY_ZIPFILE_ATTRS if not hasattr(zout, attr)]
+    if missing:
+        raise PackageStructureError(f"zipfile 缺少 {', '.join(missing)}，不使用原始資料複製")
+
+def _register_raw_entry(zout, out_info):
+    """把已寫入的項目登錄到中央目錄 (所有對 ZipFile 內部狀態的修改都集中在這裡)"""
+    zout.filelist.append(out_info)
+    zout.NameToInfo[out_info.filename] = out_info
+    zout.start_dir = zout.fp.tell()
+    zout._didModify = True
+
+class _SourcePackage:
+    """
+    來源簡報中附加投影片需要的資訊：zip 目錄、presentation.xml / .rels / [Content_Types].xml 與版面配置的佔位符。
+    建立後不會被修改 (write 時複製要改寫的三份 XML)，因此可以重複用於多次附加。
+    """
+    def __init__(self, zin, layout_index):
+        self.infolist = zin.infolist()
+        self.pres_partname = _presentation_partname(zin)
+        self.pres_rels_partname = _rels_path(self.pres_partname)
+        self.pres_xml = _read_xml(zin, self.pres_partname)
+        self.pres_rels_xml = _read_xml(zin, self.pres_rels_partname)
+        self.content_types_xml = _read_xml(zin, '[Content_Types].xml')
+        self.pres_rels = _relationship_targets(zin, self.pres_partname)
+
+        self.layout_partname = _layout_partname(zin, self.pres_partname, self.pres_xml, self.pres_rels, layout_index)
+        self.placeholders = _layout_placeholders(_read_xml(zin, self.layout_partname))
+        # 先產生一次，版面配置缺少標題或內容佔位符時在這裡就拋出 PackageStructureError
+        build_slide_xml(self.placeholders, '', [])
+
+        self.names = frozenset(info.filename for info in self.infolist)
+
+    def write(self, src_fp, dst, slides):
+        """把來源 (src_fp，已開啟的來源檔案物件) 加上 slides 寫到 dst，回傳新增的投影片數量"""
+        pres_xml = copy.deepcopy(self.pres_xml)
+        pres_rels_xml = copy.deepcopy(self.pres_rels_xml)
+        content_types_xml = copy.deepcopy(self.content_types_xml)
+
+        existing_names = set(self.names)
+        slide_numbers = [int(m.group(1)) for m in (re.match(r'ppt/slides/slide(\d+)\.xml$', n) for n in existing_names) if m]
+        next_slide_number = max(slide_numbers, default=0) + 1
+        rel_numbers = [int(m.group(1)) for m in (re.match(r'rId(\d+)$', rid) for rid in self.pres_rels) if m]
+        next_rel_number = max(rel_numbers, default=0) + 1
+
+        sld_id_lst = pres_xml.find('p:sldIdLst', NS)
+        if sld_id_lst is None:
+            sld_id_lst = etree.Element(_qn('p:sldIdLst'))
+            anchor = None
+            for tag in ('p:sldMasterIdLst', 'p:notesMasterIdLst', 'p:handoutMasterIdLst'):
+                found = pres_xml.find(tag, NS)
+                if found is not None: anchor = found
+            anchor.addnext(sld_id_lst)
+        next_slide_id = max([int(s.get('id')) for s in sld_id_lst] + [255]) + 1
+
+        new_parts = []
+        for title, paragraphs in slides:
+            slide_partname = f'ppt/slides/slide{next_slide_number}.xml'
+            while slide_partname in existing_names:
+                next_slide_number += 1
+                slide_partname = f'ppt/slides/slide{next_slide_number}.xml'
+            layout_target = posixpath.relpath(self.layout_partname, posixpath.dirname(slide_partname))
+            new_parts.append((slide_partname, build_slide_xml(self.placeholders, title, paragraphs)))
+            new_parts.append((_rels_path(slide_partname), _slide_rels_xml(layout_target)))
+
+            rel_id = f'rId{next_rel_number}'
+            etree.SubElement(pres_rels_xml, _qn('rel:Relationship'), Id=rel_id, Type=RT_SLIDE,
+                             Target=posixpath.relpath(slide_partname, posixpath.dirname(self.pres_partname)))
+            etree.SubElement(sld_id_lst, _qn('p:sldId'), {'id': str(next_slide_id), _qn('r:id'): rel_id})
+            etree.SubElement(content_types_xml, _qn('ct:Override'), PartName=f'/{slide_partname}', ContentType=CT_SLIDE)
+
+            existing_names.add(slide_partname)
+            next_slide_number += 1
+            next_rel_number += 1
+            next_slide_id += 1
+
+        rewritten = {
+            '[Content_Types].xml': content_types_xml,
+            self.pres_partname: pres_xml,
+            self.pres_rels_partname: pres_rels_xml,
+        }
+        with zipfile.ZipFile(dst, 'w', compression=zipfile.ZIP_DEFLATED) as zout:
+            _check_raw_copy_supported(zout)
+            # [Content_Types].xml 慣例上放在第一個
+            zout.writestr('[Content_Types].xml', etree.tostring(content_types_xml, xml_declaration=True, encoding='UTF-8', standalone=True))
+            for info in self.infolist:
+                if info.filename in rewritten:
+                    if info.filename != '[Content_Types].xml':
+                        zout.writestr(info.filename, etree.tostring(rewritten[info.filename], xml_declaration=True, encoding='UTF-8', standalone=True))
+                else:
+                    _copy_raw_entry(src_fp, zout, info)
+            for partname, blob in new_parts:
+                zout.writestr(partname, blob)
+
+        return len(slides)
+
+def append_slides(src, dst, slides, layout_index=1):
+    """
+    從 src 讀取簡報，附加 slides 後寫到 dst (兩者皆可為路徑或檔案物件)。
+    slides: [(標題, [(文字, 層級, 是否粗體, 字級 pt)])]
+    回傳新增的投影片數量。
+    """
+    with zipfile.ZipFile(src) as zin:
+        return _SourcePackage(zin, layout_index).write(zin.fp, dst, slides)
+
+class PresentationTemplate:
+    """
+    預先解析好的範本 (簡報的位元組內容)，供同一份範本重複產生新簡報 (例如網頁版每次按下「產生」)：
+    zip 目錄與 XML 只解析一次，之後每次只複製原始壓縮資料並加上新投影片。
+    建立後不會被修改，可在多個執行緒間共用。
+    """
+    def __init__(self, data, layout_index=1):
+        self.data = data
+        with zipfile.ZipFile(io.BytesIO(data)) as zin:
+            self._package = _SourcePackage(zin, layout_index)
+
+    def append_slides(self, dst, slides):
+        """把範本加上 slides 寫到 dst (路徑或檔案物件)，回傳新增的投影片數量"""
+        # BytesIO(bytes) 與原本的 bytes 共用記憶體，各執行緒各自一個讀取位置
+        return self._package.write(io.BytesIO(self.data), dst, slides)
+
+def write_file_atomically(path, write):
+    """
+    呼叫 write(檔案物件) 寫入同目錄的暫存檔，完成後以 os.replace 原子性地取代 path，回傳 write 的回傳值。
+    中途失敗或中斷時原檔維持不變 (batch_cli 的中斷復原依賴這一點)。
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.~', suffix='.pptx.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            result = write(tmp_file)
+        if os.path.exists(path): shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+        return result
+    except BaseException:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+
+def append_slides_to_file(pptx_path, slides, layout_index=1):
+    """附加投影片到既有檔案：寫入同目錄暫存檔後以 os.replace 原子性取代"""
+    return write_file_atomically(pptx_path, lambda tmp_file: append_slides(pptx_path, tmp_file, slides, layout_index))
@@ -3,7 +3,6 @@ from tkinter import filedialog, messagebox, scrolledtext, PanedWindow
 import pytesseract
 from PIL import Image, ImageGrab
 import os
-import re
 import pyperclip
 from pptx import Presentation
 from pptx.util import Inches, Pt
@@ -13,6 +12,8 @@ import sys # 引入 sys 模組以處理打包後的路徑
 # 引入拖曳功能的核心函式庫
 from tkinterdnd2 import DND_FILES, TkinterDnD
 
+from report_parser import parse_reports
+
 # --- 設定 Tesseract 路徑 (僅 Windows 需要) ---
 # if os.name == 'nt':
 #     pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
@@ -286,22 +287,12 @@ class ReportHelperApp_v15_3:
             
         try:
             prs = Presentation(pptx_path) if os.path.exists(pptx_path) else Presentation()
-            reports = re.split(r'(?=--- 報告 \d+：)', genai_text)
             generated_count = 0
             
             project_name = self.project_name_entry.get().strip()
 
-            for report_text in reports:
-                report_text = report_text.strip()
-                if not report_text: continue
-
-                match = re.match(r'--- 報告 \d+：(.*?) ---\n(.*)', report_text, re.DOTALL)
-                if not match: continue
-
-                ai_title = match.group(1).strip()
-                content = match.group(2).strip()
-
-                final_title = f"{project_name} - {ai_title}" if project_name else ai_title
+            for report in parse_reports(genai_text, strict=True):
+                final_title = report.slide_title(project_name)
 
                 slide_layout = prs.slide_layouts[1]
                 slide = prs.slides.add_slide(slide_layout)
@@ -312,16 +303,11 @@ class ReportHelperApp_v15_3:
                 text_frame.clear() 
                 text_frame.word_wrap = True
 
-                for line in content.split('\n'):
-                    if not line.strip(): continue 
-
-                    is_indented = line.startswith('  ')
-                    level = 1 if is_indented else 0
-                    
-                    cleaned_line = re.sub(r'^\s*[-*]\s+', '', line).strip()
+                for line in report.iter_lines():
+                    level = 1 if line.indented else 0
 
                     p = text_frame.add_paragraph()
-                    p.text = cleaned_line
+                    p.text = line.plain
                     p.level = level
 
                     if level == 0:
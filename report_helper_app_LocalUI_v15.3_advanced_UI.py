@@ -9,7 +9,6 @@ from tkinter import filedialog, messagebox
 import pytesseract
 from PIL import Image, ImageGrab
 import os
-import re
 import pyperclip
 from pptx import Presentation
 from pptx.util import Inches, Pt
@@ -19,6 +18,8 @@ import sys
 # 引入拖曳功能的核心函式庫
 from tkinterdnd2 import DND_FILES, TkinterDnD
 
+from report_parser import parse_reports
+
 # --- 正確的整合方式 ---
 class ThemedTkinterDnD(TkinterDnD.Tk):
     def __init__(self, *args, **kwargs):
@@ -240,20 +241,13 @@ class ReportHelperApp_v15_3:
             pptx_path = os.path.join(base_path, MASTER_PPTX_FILENAME)
         try:
             prs = Presentation(pptx_path) if os.path.exists(pptx_path) else Presentation()
-            reports = re.split(r'(?=--- 報告 \d+：)', genai_text)
             generated_count = 0
             project_name = self.project_name_entry.get().strip()
             
             STAR_KEYWORDS = ("情境", "任務", "行動", "結果")
             
-            for report_text in reports:
-                report_text = report_text.strip()
-                if not report_text: continue
-                match = re.match(r'--- 報告 \d+：(.*?) ---\n(.*)', report_text, re.DOTALL)
-                if not match: continue
-                ai_title = match.group(1).strip()
-                content = match.group(2).strip()
-                final_title = f"{project_name} - {ai_title}" if project_name else ai_title
+            for report in parse_reports(genai_text, STAR_KEYWORDS, strict=True):
+                final_title = report.slide_title(project_name)
                 slide_layout = prs.slide_layouts[1] # 使用「標題及內容」版面配置
                 slide = prs.slides.add_slide(slide_layout)
                 slide.shapes.title.text = final_title
@@ -263,36 +257,22 @@ class ReportHelperApp_v15_3:
                 text_frame.word_wrap = True
 
                 # --- 全新修正的階層處理邏輯 ---
-                for line in content.split('\n'):
-                    original_line = line.strip()
-                    if not original_line:
-                        continue
-
-                    # 1. 強化清理：移除所有前導符號 (-, *, •) 和頭尾多餘的星號/空白
-                    #    例如 "*情境 (Situation)**" -> "情境 (Situation)"
-                    cleaned_text = re.sub(r'^\s*[-*•\s`]+', '', original_line) # 移除前導符號
-                    cleaned_text = cleaned_text.strip().strip('*').strip() # 移除包圍的星號和空白
-
+                # report_parser 已移除所有前導符號 (-, *, •) 和頭尾多餘的星號/空白，
+                # 例如 "*情境 (Situation)**" -> "情境 (Situation)"，並標記出 STAR 關鍵字標題
+                for line in report.iter_lines():
                     # 如果清理後為空（例如該行為 "---"），則跳過
-                    if not cleaned_text:
+                    if not line.text:
                         continue
 
-                    # 2. 判斷清理後的文字是否為 STAR 關鍵字標題
-                    is_star_heading = cleaned_text.startswith(STAR_KEYWORDS)
-
-                    if is_star_heading:
+                    p = text_frame.add_paragraph()
+                    p.text = line.text
+                    if line.is_heading:
                         # 這是主標題 (Level 0)
-                        p = text_frame.add_paragraph()
-                        # 顯示清理後的文字，例如 "情境 (Situation)"
-                        p.text = cleaned_text 
                         p.level = 0
                         p.font.bold = True
                         p.font.size = Pt(18)
                     else:
                         # 這是一般內容，做為子項目 (Level 1)
-                        p = text_frame.add_paragraph()
-                        # 同樣顯示清理後的文字，以移除項目符號
-                        p.text = cleaned_text 
                         p.level = 1
                         p.font.bold = False
                         p.font.size = Pt(16)
@@ -0,0 +1,131 @@
+# report_parser.py
+# 解析 Ollama 生成的報告 (「--- 報告 N：標題 ---」格式) 成 報告 -> 段落 (STAR 標題) -> 項目 的樹狀結構
+#
+# 桌面版 (PptxService)、網頁版與舊版單檔程式共用；各自的排版規則 (層級、清理方式) 由呼叫端決定，
+# 因此每個項目同時保留兩種清理結果：
+#   text   -> 移除所有前導符號 (-, *, •, `, 空白) 與包圍的星號，用於「依 STAR 標題分層」的排版
+#   plain  -> 只移除一個「- 」或「* 」項目符號，搭配 indented (行首兩個空白) 用於「依縮排分層」的排版
+#
+# 整段文字只掃描一次：先以預先編譯的樣式找出所有報告標題的位置，再逐行處理各報告的內容。
+
+import re
+from functools import lru_cache
+
+from config import STAR_KEYWORDS
+
+# 報告的切分點與標題。寬鬆模式接受半形/全形冒號與結尾 --- 前後的任意空白；
+# 嚴格模式與舊版程式相同，只接受全形冒號與「 ---」後緊接換行
+_SPLIT = re.compile(r'--- 報告 \d+[:：]')
+_HEADER = re.compile(r'--- 報告 (\d+)[:：](.*?)\s*---\s*\n', re.DOTALL)
+_STRICT_SPLIT = re.compile(r'--- 報告 \d+：')
+_STRICT_HEADER = re.compile(r'--- 報告 (\d+)：(.*?) ---\n', re.DOTALL)
+# 前導符號 (text)：等同 re.sub(r'^\s*[-*•\s`]+', '', ...)，以 str.lstrip 處理 (\s 即 str.isspace() 的所有字元)
+_WHITESPACE = '\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000'
+_LEADING_MARKS = '-*•`' + _WHITESPACE
+# 單一項目符號 (plain)：re.sub(r'^\s*[-*]\s+', '', ...)
+_BULLET_MARK = re.compile(r'\s*[-*]\s+')
+
+@lru_cache(maxsize=8)
+def _heading_pattern(keywords):
+    """
+    回傳 (可能的第一個字元, 樣式)：「以任一 STAR 關鍵字開頭 (不分大小寫)」。
+    先檢查第一個字元，絕大多數的項目不必執行正規表示式。
+    """
+    first_chars = frozenset(ch for keyword in keywords for ch in (keyword[:1].lower(), keyword[:1].upper()))
+    return first_chars, re.compile('|'.join(re.escape(keyword) for keyword in keywords), re.IGNORECASE)
+
+class Bullet:
+    """報告內容中的一行 (空白行不會產生 Bullet)；plain 只有依縮排排版時才用到，第一次讀取時才計算"""
+    __slots__ = ('raw', 'text', 'is_heading', '_plain')
+
+    def __init__(self, raw, text, is_heading):
+        self.raw = raw
+        self.text = text
+        self.is_heading = is_heading
+        self._plain = None
+
+    @property
+    def plain(self):
+        if self._plain is None:
+            bullet_mark = _BULLET_MARK.match(self.raw)
+            self._plain = (self.raw[bullet_mark.end():] if bullet_mark else self.raw).strip()
+        return self._plain
+
+    @property
+    def indented(self):
+        return self.raw.startswith('  ')
+
+    def __repr__(self):
+        return f"Bullet({self.text!r}, heading={self.is_heading}, indented={self.indented})"
+
+class Section:
+    """一個 STAR 段落：標題 (第一個 STAR 標題之前的內容，heading 為 None) 與其下的項目"""
+    __slots__ = ('heading', 'bullets')
+
+    def __init__(self, heading=None):
+        self.heading = heading
+        self.bullets = []
+
+    def __repr__(self):
+        return f"Section({self.heading.text if self.heading else None!r}, {len(self.bullets)} bullets)"
+
+class Report:
+    __slots__ = ('number', 'title', 'sections')
+
+    def __init__(self, number, title):
+        self.number = number
+        self.title = title
+        self.sections = []
+
+    def iter_lines(self):
+        """依原本的順序逐一產出所有行 (段落標題與項目)"""
+        for section in self.sections:
+            if section.heading: yield section.heading
+            yield from section.bullets
+
+    def slide_title(self, project_name):
+        return f"{project_name} - {self.title}" if project_name else self.title
+
+    def __repr__(self):
+        return f"Report({self.number}, {self.title!r}, {len(self.sections)} sections)"
+
+def _parse_content(content, report, heading):
+    first_chars, heading_pattern = heading
+    section = None
+    for line in content.split('\n'):
+        # 前導符號之後的文字；lstrip 已去掉左側空白，右側再去掉空白與包圍的星號
+        text = line.lstrip(_LEADING_MARKS).rstrip().rstrip('*').rstrip()
+        if text:
+            is_heading = text[0] in first_chars and heading_pattern.match(text) is not None
+        elif line.strip():
+            is_heading = False    # 只有符號的行 (例如 "---")：依縮排排版時仍會輸出
+        else:
+            continue
+        bullet = Bullet(line, text, is_heading)
+        if is_heading:
+            section = Section(bullet)
+            report.sections.append(section)
+        else:
+            if section is None:
+                section = Section()
+                report.sections.append(section)
+            section.bullets.append(bullet)
+
+def parse_reports(genai_text, star_keywords=STAR_KEYWORDS, strict=False):
+    """
+    回傳 [Report, ...]。標題格式不完整的片段會被略過 (與原本 re.split + re.match 的行為相同)。
+    strict=True 時使用舊版程式的標題格式 (只接受全形冒號與「 ---」)。
+    """
+    split, header = (_STRICT_SPLIT, _STRICT_HEADER) if strict else (_SPLIT, _HEADER)
+    heading = _heading_pattern(tuple(star_keywords))
+    starts = [match.start() for match in split.finditer(genai_text)]
+    reports = []
+    for start, end in zip(starts, starts[1:] + [len(genai_text)]):
+        # 與原本先 strip() 再比對相同：結尾的空白不算 (只有標題、沒有內容的片段會因缺少換行而略過)
+        end = start + len(genai_text[start:end].rstrip())
+        match = header.match(genai_text, start, end)
+        if not match: continue
+        report = Report(int(match.group(1)), match.group(2).strip())
+        _parse_content(genai_text[match.end():end].strip(), report, heading)
+        reports.append(report)
+    return reports
@@ -2,129 +2,582 @@
 # 核心服務層，處理業務邏輯
 
 import os
-import re
-import requests
+import hashlib
+import contextvars
 import json
-import pytesseract
-from PIL import Image
-import extract_msg
-from pptx import Presentation
-from pptx.util import Inches, Pt
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+# pytesseract / PIL / extract_msg / pptx / requests 等大型模組於第一次使用時才載入，以加快主程式啟動
 
-from config import OCR_LANGUAGES, STAR_KEYWORDS
+import config
+import ocr_client
+import tracing
+from config import OCR_LANGUAGES
+from disk_cache import DiskCache
+from http_client import get_session
+from chunking import chunk_text, estimate_tokens
+from report_parser import parse_reports
+from slide_builder import add_slide, append_paragraphs
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+SUPPORTED_EXTENSIONS = IMAGE_EXTENSIONS + ('.txt', '.msg')
+
+# 是否在 OCR 子程序中 (檔案已經平行處理，單張圖片的文字區塊就不再平行)
+_in_ocr_worker = False
+# OCR 子程序共用的 FileProcessorService (含 OCR 快取連線)，由 _init_ocr_worker 在每個子程序建立一次
+_worker_processor = None
+
+def _init_ocr_worker():
+    """子程序初始化：多個 Tesseract 同時執行時，限制每個只用一個執行緒，避免互相搶 CPU；並建立本程序共用的服務"""
+    global _in_ocr_worker, _worker_processor
+    _in_ocr_worker = True
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+    tracing.disable_logging()
+    _worker_processor = FileProcessorService()
+
+def process_file_worker(file_path):
+    """在子程序中處理單一檔案 (必須是模組層級函式才能被 pickle)"""
+    return _worker_processor.process_file(file_path)
 
 class FileProcessorService:
     """處理檔案讀取與文字辨識"""
+    def __init__(self):
+        self._executor = None
+        self.ocr_cache = DiskCache(
+            os.path.join(config.get_base_path(), config.OCR_CACHE_FILENAME),
+            config.OCR_CACHE_MAX_MB * 1024 * 1024)
+
+    @staticmethod
+    def ocr_cache_key(image_obj):
+        """以解碼後的像素內容 + OCR 語言 + 前處理方式計算快取鍵值 (與檔名、檔案格式無關)"""
+        digest = hashlib.sha256()
+        digest.update(f"{image_obj.mode}|{image_obj.size}|{OCR_LANGUAGES}|{config.OCR_PREPROCESS_VARIANT}|{config.OCR_TEXT_REGIONS}|".encode('utf-8'))
+        digest.update(image_obj.tobytes())
+        return digest.hexdigest()
+
     def process_image_object(self, image_obj):
+        with tracing.span('ocr.image', width=image_obj.size[0], height=image_obj.size[1]) as span:
+            cache_key = self.ocr_cache_key(image_obj) if self.ocr_cache.enabled else None
+            if cache_key:
+                cached_text = self.ocr_cache.get(cache_key)
+                if cached_text is not None:
+                    span.set(cache_hit=True, chars=len(cached_text))
+                    return cached_text
+            # 有常駐 OCR 伺服器時交給它處理 (引擎已載入)；連不上則回傳 None，改在本機辨識
+            server_results = ocr_client.recognize([image_obj], lang=OCR_LANGUAGES, variant=config.OCR_PREPROCESS_VARIANT,
+                                                  text_regions=config.OCR_TEXT_REGIONS)
+            span.set(cache_hit=False, engine='server' if server_results is not None else 'local')
+            if server_results is not None:
+                text, error = server_results[0]['text'], server_results[0]['error']
+                if error: raise Exception(f"圖片 OCR 辨識失敗：{error}")
+            else:
+                text = self._recognize_locally(image_obj)
+            if cache_key:
+                self.ocr_cache.put(cache_key, text)
+            span.set(chars=len(text))
+            return text
+
+    def _recognize_locally(self, image_obj):
+        import pytesseract
         try:
-            return pytesseract.image_to_string(image_obj, lang=OCR_LANGUAGES)
+            image_for_ocr = image_obj
+            if config.OCR_PREPROCESS_VARIANT != 'none':
+                # 前處理需要 opencv，只有啟用時才載入
+                from ocr_preprocess import preprocess
+                image_for_ocr, _ = preprocess(image_obj, config.OCR_PREPROCESS_VARIANT)
+            text = self._ocr_text_regions(image_for_ocr) if config.OCR_TEXT_REGIONS else None
+            if text is None:
+                text = pytesseract.image_to_string(image_for_ocr, lang=OCR_LANGUAGES)
         except pytesseract.TesseractNotFoundError:
             raise Exception("找不到 Tesseract OCR 引擎。\n請確認已安裝且路徑設定正確。")
         except Exception as e:
             raise Exception(f"圖片 OCR 辨識失敗：{e}")
+        return text
 
-    def process_text_file(self, file_path):
+    def _ocr_text_regions(self, image_obj):
+        """只 OCR 偵測到的文字區塊；沒有 opencv 或不適合裁切時回傳 None (改為 OCR 整張圖)"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception:
-            with open(file_path, 'r', encoding='gbk') as f:
-                return f.read()
+            from text_regions import ocr_text_regions
+        except ImportError:
+            return None
+        workers = 1 if _in_ocr_worker else config.OCR_REGION_WORKERS
+        return ocr_text_regions(image_obj, OCR_LANGUAGES, workers=workers)
+
+    def ocr_cache_summary(self):
+        """供狀態列顯示的快取統計文字"""
+        if not self.ocr_cache.enabled: return "OCR 快取已停用"
+        stats = self.ocr_cache.stats()
+        return f"OCR 快取 命中 {stats['hits']} / 未命中 {stats['misses']}，共 {stats['entries']} 筆"
+
+    def clear_ocr_cache(self):
+        self.ocr_cache.clear()
+
+    def process_text_file(self, file_path):
+        with tracing.span('file.text', bytes=os.path.getsize(file_path)) as span:
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    return f.read()
+            except Exception:
+                span.set(encoding='gbk')
+                with open(file_path, 'r', encoding='gbk') as f:
+                    return f.read()
 
     def process_msg_file(self, file_path):
-        msg = extract_msg.Message(file_path)
-        return f"寄件人：{msg.sender}\n主旨：{msg.subject}\n\n--- 內文 ---\n{msg.body}"
+        import extract_msg
+        with tracing.span('file.msg', bytes=os.path.getsize(file_path)):
+            msg = extract_msg.Message(file_path)
+            return f"寄件人：{msg.sender}\n主旨：{msg.subject}\n\n--- 內文 ---\n{msg.body}"
+
+    def process_file(self, file_path):
+        """依副檔名分派至對應的處理方法"""
+        file_ext = os.path.splitext(file_path)[1].lower()
+        if file_ext in IMAGE_EXTENSIONS:
+            from PIL import Image
+            with Image.open(file_path) as image:
+                return self.process_image_object(image)
+        if file_ext == '.txt': return self.process_text_file(file_path)
+        if file_ext == '.msg': return self.process_msg_file(file_path)
+        raise ValueError(f"不支援的檔案格式: {file_ext}")
+
+    def iter_files_in_order(self, filepaths, on_progress=None):
+        """
+        使用多個子程序平行處理檔案，並依「原始順序」逐一產出 (索引, 內容, 錯誤)。
+        某個檔案只要它與它之前的檔案都完成就會立即產出，不必等全部結束。
+        on_progress(已完成數, 總數) 會在任一檔案完成時被呼叫 (於呼叫端的執行緒)。
+        若無法建立程序池，會自動退回循序處理；程序池在處理途中損壞 (子程序被 Tesseract 或 OOM 終止) 時，
+        尚未取得結果的檔案也改在本程序中循序處理。
+        """
+        executor = self._get_executor()
+        if executor is None:
+            yield from self._iter_files_sequential(filepaths, on_progress)
+            return
+
+        total = len(filepaths)
+        try:
+            futures = [executor.submit(process_file_worker, path) for path in filepaths]
+        except BrokenProcessPool:
+            self.shutdown()
+            yield from self._iter_files_sequential(filepaths, on_progress)
+            return
+
+        pending = set(futures)
+        next_index = 0
+        while next_index < total:
+            if pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                if on_progress: on_progress(total - len(pending), total)
+            while next_index < total and futures[next_index].done():
+                future = futures[next_index]
+                error = future.exception()
+                if isinstance(error, BrokenProcessPool):
+                    print(f"OCR 程序池已損壞，其餘檔案改用循序處理: {error}")
+                    self.shutdown()
+                    yield from self._iter_remaining_sequential(filepaths, futures, next_index, on_progress)
+                    return
+                yield next_index, (None if error else future.result()), error
+                next_index += 1
+
+    def _iter_remaining_sequential(self, filepaths, futures, start, on_progress=None):
+        """程序池損壞後：已在子程序中成功完成的檔案沿用結果，其餘的循序重新處理"""
+        total = len(filepaths)
+        for i in range(start, total):
+            future = futures[i]
+            if future.done() and not future.cancelled() and future.exception() is None:
+                content, error = future.result(), None
+            else:
+                try:
+                    content, error = self.process_file(filepaths[i]), None
+                except Exception as e:
+                    content, error = None, e
+            if on_progress: on_progress(i + 1, total)
+            yield i, content, error
+
+    def _iter_files_sequential(self, filepaths, on_progress=None):
+        total = len(filepaths)
+        for i, file_path in enumerate(filepaths):
+            try:
+                content, error = self.process_file(file_path), None
+            except Exception as e:
+                content, error = None, e
+            if on_progress: on_progress(i + 1, total)
+            yield i, content, error
+
+    def _get_executor(self):
+        """延遲建立並重複使用 OCR 程序池；若設定為單一程序或無法建立則回傳 None"""
+        if config.OCR_MAX_WORKERS <= 1:
+            return None
+        if self._executor is None:
+            try:
+                self._executor = ProcessPoolExecutor(max_workers=config.OCR_MAX_WORKERS, initializer=_init_ocr_worker)
+            except (OSError, NotImplementedError) as e:
+                print(f"無法建立 OCR 程序池，改用循序處理: {e}")
+                return None
+        return self._executor
+
+    def shutdown(self):
+        """關閉 OCR 程序池 (程式結束時呼叫)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+class GenerationCancelled(Exception):
+    """使用者取消了進行中的生成請求"""
+
+class CancelToken:
+    """可由 UI 執行緒取消進行中的 HTTP 串流 (會直接關閉連線，讓阻塞中的讀取立即結束)"""
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        self._event.set()
+        with self._lock: callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try: callback()
+            except Exception: pass
+
+    def register(self, callback):
+        with self._lock: self._callbacks.append(callback)
+        if self.cancelled: callback()
+
+    def unregister(self, callback):
+        with self._lock:
+            if callback in self._callbacks: self._callbacks.remove(callback)
+
+class ThinkTagFilter:
+    """
+    在串流過程中濾除 <think>...</think> 推理區塊。
+    標籤可能被切在兩個 chunk 之間，因此結尾疑似標籤開頭的部分會先保留，等下一段再判斷。
+    """
+    OPEN_TAG = '<think>'
+    CLOSE_TAG = '</think>'
+
+    def __init__(self):
+        self._buffer = ''
+        self._inside = False
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        visible = []
+        while True:
+            tag = self.CLOSE_TAG if self._inside else self.OPEN_TAG
+            idx = self._buffer.find(tag)
+            if idx == -1:
+                keep = self._partial_tag_length(self._buffer, tag)
+                ready = self._buffer[:len(self._buffer) - keep]
+                if not self._inside: visible.append(ready)
+                self._buffer = self._buffer[len(ready):]
+                break
+            if not self._inside: visible.append(self._buffer[:idx])
+            self._buffer = self._buffer[idx + len(tag):]
+            self._inside = not self._inside
+        return ''.join(visible)
+
+    def flush(self):
+        rest = '' if self._inside else self._buffer
+        self._buffer, self._inside = '', False
+        return rest
+
+    @staticmethod
+    def _partial_tag_length(text, tag):
+        for length in range(min(len(tag) - 1, len(text)), 0, -1):
+            if text.endswith(tag[:length]): return length
+        return 0
+
+def strip_think_blocks(text):
+    """移除完整文字中的 <think> 推理區塊"""
+    think_filter = ThinkTagFilter()
+    return (think_filter.feed(text) + think_filter.flush()).strip()
+
+def build_final_prompt(base_prompt, project_name):
+    """把專案名稱填入 Prompt 模板"""
+    project_info = f"The user has specified the project name is: '{project_name}'." if project_name else "The user did not specify a project name."
+    return base_prompt.replace("{PROJECT_NAME_HOLDER}", project_info)
 
 class OllamaService:
     """與 Ollama API 進行通訊"""
-    def __init__(self, api_url, model):
+    def __init__(self, api_url, model, session=None):
         self.api_url = api_url
         self.model = model
+        self.session = session or get_session()
+        ttl_hours = config.LLM_CACHE_TTL_HOURS
+        self.response_cache = DiskCache(
+            os.path.join(config.get_base_path(), config.LLM_CACHE_FILENAME),
+            config.LLM_CACHE_MAX_MB * 1024 * 1024,
+            ttl_seconds=ttl_hours * 3600 if ttl_hours else None)
 
-    def generate(self, prompt):
-        try:
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.1,  # 降低溫度，讓輸出更穩定
-                    "num_ctx": 4096      # 增加上下文視窗
-                }
+    @staticmethod
+    def num_ctx_for(prompt):
+        """依 Prompt 長度決定上下文視窗：預留回應空間後以 2048 為單位進位，並限制在設定的上下限內"""
+        needed = estimate_tokens(prompt) + config.OLLAMA_RESPONSE_TOKENS
+        rounded = -(-needed // 2048) * 2048
+        return max(config.OLLAMA_MIN_CTX, min(config.OLLAMA_MAX_CTX, rounded))
+
+    def _build_payload(self, prompt, stream):
+        return {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "options": {
+                "temperature": 0.1,               # 降低溫度，讓輸出更穩定
+                "num_ctx": self.num_ctx_for(prompt)  # 依輸入長度調整上下文視窗
             }
-            response = requests.post(self.api_url, json=payload, timeout=300)
-            response.raise_for_status()
+        }
+
+    def needs_chunking(self, full_prompt):
+        """完整 Prompt 加上回應空間是否超過最大上下文視窗"""
+        return estimate_tokens(full_prompt) + config.OLLAMA_RESPONSE_TOKENS > config.OLLAMA_MAX_CTX
+
+    def prepare_prompt(self, final_prompt, input_content, extract_prompt, cancel_token=None, on_progress=None):
+        """
+        回傳實際要送出的 Prompt。
+        輸入放得進上下文視窗時，直接回傳 final_prompt + 原文；
+        否則先把原文切段，平行地對每段做重點擷取 (map)，再把各段重點接在 final_prompt 後面，
+        交給最後一次 STAR 彙整 (reduce)。合併後的重點仍放不進上下文視窗時，把重點分組後再擷取一次，
+        重複直到放得進去；重點已無法再縮短時拋出例外，不送出超過上下文長度的 Prompt。
+        on_progress(已完成段數, 總段數) 會在每段完成時呼叫 (每一輪重新計數)。
+        """
+        full_prompt = f"{final_prompt}\n\n{input_content}"
+        if not self.needs_chunking(full_prompt):
+            return full_prompt
+
+        with tracing.span('prompt.prepare', input_chars=len(input_content)) as span:
+            budget = max(512, config.OLLAMA_MAX_CTX - config.OLLAMA_RESPONSE_TOKENS - estimate_tokens(extract_prompt))
+            notes = self._extract_notes(chunk_text(input_content, budget), extract_prompt, cancel_token, on_progress)
+            span.set(chunks=len(notes))
+            rounds = 1
+            while True:
+                prompt = self._merged_notes_prompt(final_prompt, notes)
+                if not self.needs_chunking(prompt):
+                    span.set(rounds=rounds)
+                    return prompt
+                # 重點合併後仍太長：把相鄰的重點併成放得進上下文視窗的群組，對每組再擷取一次
+                merged_tokens = sum(estimate_tokens(note) for note in notes)
+                groups = chunk_text('\n\n'.join(notes), budget)
+                notes = self._extract_notes(groups, extract_prompt, cancel_token, on_progress)
+                rounds += 1
+                if sum(estimate_tokens(note) for note in notes) >= merged_tokens:
+                    raise Exception(f"輸入內容過長：分段擷取 {rounds} 輪後的重點仍超過模型上下文長度 "
+                                    f"({config.OLLAMA_MAX_CTX} tokens)，請減少輸入內容或調高 OLLAMA_MAX_CTX。")
+
+    def _extract_notes(self, chunks, extract_prompt, cancel_token=None, on_progress=None):
+        """平行地對每個片段做重點擷取，依原順序回傳各段重點 (已移除 <think> 區塊)"""
+        notes = [None] * len(chunks)
+
+        def extract(index):
+            chunk_prompt = f"{extract_prompt}\n\n{chunks[index]}"
+            cached_text = self.get_cached_response(chunk_prompt)
+            if cached_text is not None:
+                return index, cached_text
+            return index, self.generate_stream(chunk_prompt, lambda chunk: None, cancel_token)
+
+        with ThreadPoolExecutor(max_workers=max(1, config.OLLAMA_PARALLEL_REQUESTS)) as executor:
+            # 各段的 ollama.generate span 記在 prompt.prepare 底下
+            futures = [executor.submit(contextvars.copy_context().run, extract, i) for i in range(len(chunks))]
+            try:
+                for done_count, future in enumerate(as_completed(futures), start=1):
+                    index, text = future.result()
+                    notes[index] = strip_think_blocks(text)
+                    if on_progress: on_progress(done_count, len(chunks))
+            except BaseException:
+                for future in futures: future.cancel()
+                raise
+        return notes
+
+    @staticmethod
+    def _merged_notes_prompt(final_prompt, notes):
+        merged_notes = '\n\n'.join(f"==== 片段 {i+1}/{len(notes)} ====\n{note}" for i, note in enumerate(notes))
+        return (f"{final_prompt}\n\n"
+                f"(The original text was too long and has been pre-processed into {len(notes)} parts. "
+                f"The following are the extracted facts from each part, in original order.)\n\n"
+                f"{merged_notes}")
+
+    def cache_key(self, prompt):
+        """以完整 Prompt、模型名稱與 options 計算回應快取的鍵值"""
+        payload = self._build_payload(prompt, stream=False)
+        identity = {key: payload[key] for key in ('model', 'prompt', 'options')}
+        return hashlib.sha256(json.dumps(identity, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def get_cached_response(self, prompt):
+        """查詢回應快取 (會計入命中/未命中統計)；沒有則回傳 None"""
+        return self.response_cache.get(self.cache_key(prompt))
+
+    def response_cache_summary(self):
+        """供狀態列顯示的快取統計文字"""
+        if not self.response_cache.enabled: return "LLM 快取已停用"
+        stats = self.response_cache.stats()
+        return f"LLM 快取 命中 {stats['hits']} / 未命中 {stats['misses']}，共 {stats['entries']} 筆"
+
+    @staticmethod
+    def timing_from_response(data, elapsed):
+        """
+        整理 Ollama 回應中的統計 (單位為奈秒)；elapsed 為本程式量到的總耗時。
+        queue_s：Ollama 回報的處理時間以外的部分 (排隊、網路) 加上模型載入時間。
+        """
+        if 'eval_count' not in data and 'total_duration' not in data: return {}
+        seconds = lambda key: data.get(key, 0) / 1e9
+        return {
+            'eval_count': data.get('eval_count', 0),
+            'prompt_eval_count': data.get('prompt_eval_count', 0),
+            'eval_duration_s': round(seconds('eval_duration'), 3),
+            'prompt_eval_duration_s': round(seconds('prompt_eval_duration'), 3),
+            'load_duration_s': round(seconds('load_duration'), 3),
+            'queue_s': round(max(0.0, elapsed - seconds('total_duration')) + seconds('load_duration'), 3),
+        }
+
+    def generate(self, prompt, use_cache=True):
+        """
+        非串流生成。use_cache=True 時先查詢回應快取；
+        不論是否查詢，成功的新結果都會寫回快取 (因此「強制重新生成」也會更新快取)。
+        回應未標示完成 (done) 或內容為空時不寫入快取。
+        """
+        import requests
+        with tracing.span('ollama.generate', stream=False, model=self.model, prompt_chars=len(prompt),
+                          num_ctx=self.num_ctx_for(prompt)) as span:
+            if use_cache:
+                cached_text = self.get_cached_response(prompt)
+                if cached_text is not None:
+                    span.set(cache_hit=True)
+                    return cached_text
+            try:
+                start_time = time.perf_counter()
+                payload = self._build_payload(prompt, stream=False)
+                response = self.session.post(self.api_url, json=payload, timeout=300)
+                response.raise_for_status()
             
-            response_data = response.json()
-            return response_data.get('response', '').strip()
+                response_data = response.json()
+                span.set(**self.timing_from_response(response_data, time.perf_counter() - start_time))
+                text = response_data.get('response', '').strip()
+                if response_data.get('done') and text:
+                    self.response_cache.put(self.cache_key(prompt), text)
+                return text
 
-        except requests.exceptions.ConnectionError:
-            raise Exception(f"無法連接至 Ollama API ({self.api_url})。\n請確認 Ollama 正在本機端運行。")
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"請求 Ollama API 時發生錯誤：{e}")
-        except Exception as e:
-            raise Exception(f"處理 Ollama 回應時發生未知錯誤：{e}")
+            except requests.exceptions.ConnectionError:
+                raise Exception(f"無法連接至 Ollama API ({self.api_url})。\n請確認 Ollama 正在本機端運行。")
+            except requests.exceptions.RequestException as e:
+                raise Exception(f"請求 Ollama API 時發生錯誤：{e}")
+            except Exception as e:
+                raise Exception(f"處理 Ollama 回應時發生未知錯誤：{e}")
+
+    def generate_stream(self, prompt, on_chunk, cancel_token=None):
+        """
+        以串流模式呼叫 /api/generate (NDJSON，每行一個 JSON 物件)。
+        每收到一段文字就呼叫 on_chunk(text)，結束後回傳完整文字。
+        cancel_token 被取消時會關閉連線並拋出 GenerationCancelled。
+        串流不查詢快取 (由呼叫端先用 get_cached_response 判斷)，但完整結束的結果會寫入快取
+        (沒收到 done 訊息就中斷的串流與空白回應不寫入，避免快取到不完整的報告)。
+        """
+        import requests
+        with tracing.span('ollama.generate', stream=True, model=self.model, prompt_chars=len(prompt),
+                          num_ctx=self.num_ctx_for(prompt)) as span:
+            parts = []
+            response = None
+            done = False
+            try:
+                start_time = time.perf_counter()
+                payload = self._build_payload(prompt, stream=True)
+                response = self.session.post(self.api_url, json=payload, stream=True, timeout=(10, 300))
+                if cancel_token: cancel_token.register(response.close)
+                response.raise_for_status()
+
+                for line in response.iter_lines():
+                    if cancel_token and cancel_token.cancelled: break
+                    if not line: continue
+                    data = json.loads(line)
+                    if data.get('error'):
+                        raise Exception(data['error'])
+                    chunk = data.get('response', '')
+                    if chunk:
+                        if not parts: span.set(first_token_s=round(time.perf_counter() - start_time, 3))
+                        parts.append(chunk)
+                        on_chunk(chunk)
+                    if data.get('done'):
+                        done = True
+                        # 最後一筆訊息帶有 Ollama 的耗時統計
+                        span.set(**self.timing_from_response(data, time.perf_counter() - start_time))
+                        break
+
+            except requests.exceptions.ConnectionError:
+                if cancel_token and cancel_token.cancelled: raise GenerationCancelled()
+                raise Exception(f"無法連接至 Ollama API ({self.api_url})。\n請確認 Ollama 正在本機端運行。")
+            except requests.exceptions.RequestException as e:
+                if cancel_token and cancel_token.cancelled: raise GenerationCancelled()
+                raise Exception(f"請求 Ollama API 時發生錯誤：{e}")
+            except Exception as e:
+                # 從其他執行緒關閉連線時，底層可能拋出各種 I/O 例外
+                if cancel_token and cancel_token.cancelled: raise GenerationCancelled()
+                raise Exception(f"處理 Ollama 回應時發生未知錯誤：{e}")
+            finally:
+                if response is not None:
+                    if cancel_token: cancel_token.unregister(response.close)
+                    response.close()
+
+            if cancel_token and cancel_token.cancelled: raise GenerationCancelled()
+            text = ''.join(parts).strip()
+            if done and text:
+                self.response_cache.put(self.cache_key(prompt), text)
+            return text
 
 class PptxService:
     """生成 PowerPoint 投影片"""
+    def _iter_slide_contents(self, genai_text, project_name):
+        """解析生成結果，逐一產出 (投影片標題, [(文字, 層級, 是否粗體, 字級 pt)])；STAR 標題為第 0 層，其餘為第 1 層"""
+        for report in parse_reports(genai_text):
+            paragraphs = [(line.text, 0, True, 18) if line.is_heading else (line.text, 1, False, 16)
+                          for line in report.iter_lines() if line.text]
+            yield report.slide_title(project_name), paragraphs
+
     def add_to_presentation(self, pptx_path, genai_text, project_name):
         if not genai_text:
             raise ValueError("報告內容為空，無法生成投影片。")
+        return self.add_reports_to_presentation(pptx_path, [(genai_text, project_name)])
 
-        prs = Presentation(pptx_path) if os.path.exists(pptx_path) else Presentation()
-        reports = re.split(r'(?=--- 報告 \d+[:：])', genai_text)
-        generated_count = 0
-
-        for report_text in reports:
-            report_text = report_text.strip()
-            if not report_text:
-                continue
-            
-            # --- THIS IS THE FIX ---
-            # 我們在結尾的 "---" 前後加上 \s* 來允許任意數量的空格
-            match = re.match(r'--- 報告 \d+[:：](.*?)\s*---\s*\n(.*)', report_text, re.DOTALL)
-            # --- END OF FIX ---
+    def add_reports_to_presentation(self, pptx_path, reports):
+        """把多份生成結果 [(genai_text, project_name)] 一次寫入簡報 (只儲存一次)"""
+        slides = [slide for genai_text, project_name in reports
+                  for slide in self._iter_slide_contents(genai_text, project_name)]
+        if not slides:
+            raise ValueError("未能在內容中找到符合格式的報告。")
+        with tracing.span('pptx.save', slides=len(slides)) as span:
+            count = self._save_slides(pptx_path, slides, span)
+            span.set(file_bytes=os.path.getsize(pptx_path))
+            return count
 
-            if not match:
-                continue
+    def _save_slides(self, pptx_path, slides, span):
+        from pptx import Presentation
+        from pptx_append import append_slides_to_file, write_file_atomically, PackageStructureError
+        # 既有的彙總簡報只附加新投影片，不重新載入/寫出整份檔案
+        if config.PPTX_INCREMENTAL_APPEND and os.path.exists(pptx_path):
+            try:
+                span.set(mode='append')
+                return append_slides_to_file(pptx_path, slides)
+            except (PackageStructureError, zipfile.BadZipFile) as e:
+                print(f"無法以增量模式附加投影片，改用完整載入模式: {e}")
 
-            ai_title = match.group(1).strip()
-            content = match.group(2).strip()
-            final_title = f"{project_name} - {ai_title}" if project_name else ai_title
+        span.set(mode='full')
+        prs = Presentation(pptx_path) if os.path.exists(pptx_path) else Presentation()
+        for final_title, paragraphs in slides:
+            self._add_slide(prs, final_title, paragraphs)
+        # 與增量模式相同，寫入暫存檔後原子性取代：中斷時不會留下寫到一半的簡報
+        write_file_atomically(pptx_path, prs.save)
+        return len(slides)
 
-            slide_layout = prs.slide_layouts[1]
-            slide = prs.slides.add_slide(slide_layout)
-            slide.shapes.title.text = final_title
-            
-            text_frame = slide.placeholders[1].text_frame
-            text_frame.clear()
-            text_frame.word_wrap = True
-
-            for line in content.split('\n'):
-                original_line = line.strip()
-                if not original_line: continue
-
-                cleaned_text = re.sub(r'^\s*[-*•\s`]+', '', original_line).strip().strip('*').strip()
-                if not cleaned_text: continue
-
-                is_star_heading = any(cleaned_text.lower().startswith(keyword.lower()) for keyword in STAR_KEYWORDS)
-
-                p = text_frame.add_paragraph()
-                p.text = cleaned_text
-                if is_star_heading:
-                    p.level = 0
-                    p.font.bold = True
-                    p.font.size = Pt(18)
-                else:
-                    p.level = 1
-                    p.font.bold = False
-                    p.font.size = Pt(16)
-            
-            generated_count += 1
-        
-        if generated_count > 0:
-            prs.save(pptx_path)
-            return generated_count
-        else:
-            raise ValueError("未能在內容中找到符合格式的報告。")
+    @staticmethod
+    def _prepare_slide(slide):
+        text_frame = slide.placeholders[1].text_frame
+        text_frame.clear()
+        text_frame.word_wrap = True
 
+    def _add_slide(self, prs, final_title, paragraphs):
+        # 版面配置與內容框的設定只在每份簡報的第一張投影片做一次，之後複製骨架 (見 slide_builder)
+        slide = add_slide(prs, 1, self._prepare_slide)
+        slide.shapes.title.text = final_title
+        append_paragraphs(slide.placeholders[1].text_frame, paragraphs)
@@ -0,0 +1,37 @@
+# session_memo.py
+# Streamlit 頁面的 session 內記憶化 (網頁版與 app/report_helper_app.py 共用)
+#
+# Streamlit 每次元件變動都會重新執行整個腳本；OCR 結果以「上傳內容的雜湊 + OCR 選項」為鍵保存在 session_state，
+# 只有新的上傳或改變選項才會重新辨識。每個 session 最多保留 max_entries 筆，超過時淘汰最久未使用的一筆。
+# (不使用 st.cache_data：PDF 逐頁辨識時需要在函式內更新頁面上的進度，快取函式不允許這樣做)
+
+import hashlib
+from collections import OrderedDict
+
+def content_hash(data):
+    """bytes / 類 bytes 物件 (例如 UploadedFile.getbuffer()) 或 PIL 圖片內容的雜湊"""
+    digest = hashlib.sha256()
+    if hasattr(data, 'tobytes') and hasattr(data, 'mode'):
+        # PIL 圖片 (剪貼簿貼上的截圖)：以像素內容計算，與來源格式無關
+        digest.update(f"{data.mode}|{data.size}|".encode('utf-8'))
+        digest.update(data.tobytes())
+    else:
+        digest.update(data)
+    return digest.hexdigest()
+
+def memoize(state, name, key, compute, max_entries):
+    """
+    回傳 state[name] 中 key 對應的結果；沒有時呼叫 compute() 並保存。
+    state 通常是 st.session_state；compute 拋出例外時不保存 (下次重新執行時會再試一次)。
+    """
+    memo = state.get(name)
+    if memo is None:
+        memo = state[name] = OrderedDict()
+    if key in memo:
+        memo.move_to_end(key)
+        return memo[key]
+    result = compute()
+    memo[key] = result
+    while len(memo) > max_entries:
+        memo.popitem(last=False)
+    return result
@@ -0,0 +1,183 @@
+# shared_pool.py
+# 網頁版伺服器模式的共用工作池：所有使用者 (Streamlit session) 的 OCR 與 PowerPoint 生成都送到同一組有上限的 worker
+#
+# - 依使用者公平排隊：每位使用者一個佇列，輪流從各佇列取出工作；一個人連續貼十張截圖，其他人不必等完十張
+# - 背壓：每位使用者與全體的未完成工作數有上限，超過時 submit 拋出 PoolBusyError，由 UI 請使用者稍後再試
+# - queue_position(future) 供 UI 顯示目前排在第幾位
+# - 交給底層 executor 的工作數不超過 max_running，排隊一律在這裡進行 (executor 自己的 FIFO 佇列不會打亂順序)
+#
+# submit 回傳標準的 concurrent.futures.Future：尚未開始的工作可用 future.cancel() 取消，
+# 取消時立即從佇列移除 (不再計入排隊數與每位使用者的上限)。
+
+import io
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import BrokenExecutor, CancelledError, Future
+
+class PoolBusyError(Exception):
+    """排隊的工作已達上限"""
+
+class TesseractNotFound(Exception):
+    """找不到 Tesseract 引擎 (pytesseract 的 TesseractNotFoundError 無法 pickle，從子程序拋出會讓整個程序池損壞)"""
+
+class FairWorkPool:
+    def __init__(self, executor_factory, max_running, max_jobs_per_user, max_queued_jobs):
+        """
+        executor_factory()：建立底層的 ThreadPoolExecutor / ProcessPoolExecutor (程序池損壞時會重新建立)
+        max_jobs_per_user：每位使用者同時未完成 (排隊 + 執行中) 的工作上限
+        max_queued_jobs：全體排隊中 (尚未開始) 的工作上限
+        """
+        self._executor_factory = executor_factory
+        self._executor = None
+        self.max_running = max_running
+        self.max_jobs_per_user = max_jobs_per_user
+        self.max_queued_jobs = max_queued_jobs
+        self._lock = threading.Lock()
+        self._queues = OrderedDict()    # 使用者 -> deque[(future, func, args, kwargs)]；順序即輪替順序
+        self._running = {}              # 使用者 -> 執行中的工作數
+        self._queued = 0
+
+    def submit(self, user, func, *args, **kwargs):
+        future = Future()
+        with self._lock:
+            queue = self._queues.get(user)
+            outstanding = (len(queue) if queue else 0) + self._running.get(user, 0)
+            if outstanding >= self.max_jobs_per_user:
+                raise PoolBusyError(f"您已有 {outstanding} 個工作在處理中，請等待完成後再送出。")
+            if self._queued >= self.max_queued_jobs:
+                raise PoolBusyError("目前使用人數較多，排隊已滿，請稍後再試。")
+            self._queues.setdefault(user, deque()).append((future, func, args, kwargs))
+            self._queued += 1
+            ready = self._take_ready()
+        future.add_done_callback(lambda future, user=user: self._discard_cancelled(user, future))
+        self._start(ready)
+        return future
+
+    def _discard_cancelled(self, user, future):
+        """排隊中的工作被取消時 (Streamlit 每次重新執行都會取消上一次的等待)，從佇列移除"""
+        if not future.cancelled(): return
+        with self._lock:
+            queue = self._queues.get(user)
+            if not queue: return
+            for item in queue:
+                if item[0] is future:
+                    queue.remove(item)
+                    self._queued -= 1
+                    break
+            if not queue: del self._queues[user]
+
+    def queue_position(self, future):
+        """
+        排隊中的工作前面 (依輪替順序) 還有幾個工作要先開始，加一後回傳 (1 表示下一個就輪到)；
+        已開始、已完成或已取消的工作回傳 0。
+        """
+        with self._lock:
+            users = list(self._queues)
+            for user_index, user in enumerate(users):
+                queue = self._queues[user]
+                index = next((i for i, item in enumerate(queue) if item[0] is future), None)
+                if index is None: continue
+                # 輪替時，排在這位使用者前面的人最多先執行 index + 1 個，後面的人最多 index 個
+                ahead = index + sum(min(len(self._queues[other]), index + (1 if other_index < user_index else 0))
+                                    for other_index, other in enumerate(users) if other != user)
+                return ahead + 1
+            return 0
+
+    def stats(self):
+        with self._lock:
+            return {'queued': self._queued, 'running': sum(self._running.values()), 'users': len(self._queues.keys() | self._running.keys())}
+
+    def shutdown(self):
+        with self._lock:
+            queued = [future for queue in self._queues.values() for future, *_ in queue]
+            self._queues.clear()
+            self._queued = 0
+            executor, self._executor = self._executor, None
+        # 在鎖外取消：取消會同步呼叫 _discard_cancelled
+        for future in queued: future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _take_ready(self):
+        """(持有鎖時呼叫) 依輪替順序取出可以開始的工作"""
+        ready = []
+        while self._queues and sum(self._running.values()) < self.max_running:
+            user, queue = next(iter(self._queues.items()))
+            item = queue.popleft()
+            self._queued -= 1
+            if queue: self._queues.move_to_end(user)
+            else: del self._queues[user]
+            # 已被取消的工作直接略過
+            if not item[0].set_running_or_notify_cancel(): continue
+            self._running[user] = self._running.get(user, 0) + 1
+            ready.append((user, item))
+        return ready
+
+    def _start(self, ready):
+        """在鎖外把工作交給底層 executor (executor.submit 可能同步呼叫完成回呼)"""
+        for user, (future, func, args, kwargs) in ready:
+            for attempt in range(2):
+                executor = self._get_executor()
+                try:
+                    inner = executor.submit(func, *args, **kwargs)
+                except BrokenExecutor as e:
+                    # 子程序異常結束會讓整個程序池無法再使用：重新建立一次
+                    self._reset_executor(executor)
+                    if attempt: self._finished(user, future, error=e)
+                    continue
+                except Exception as e:
+                    self._finished(user, future, error=e)
+                    break
+                inner.add_done_callback(lambda inner, user=user, future=future, executor=executor: self._finished(user, future, inner, executor))
+                break
+
+    def _finished(self, user, future, inner=None, executor=None, error=None):
+        if inner is not None:
+            error = CancelledError() if inner.cancelled() else inner.exception()
+            if isinstance(error, BrokenExecutor): self._reset_executor(executor)
+        if error is not None: future.set_exception(error)
+        else: future.set_result(inner.result())
+        with self._lock:
+            self._running[user] -= 1
+            if not self._running[user]: del self._running[user]
+            ready = self._take_ready()
+        self._start(ready)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._executor_factory()
+            return self._executor
+
+    def _reset_executor(self, broken):
+        """丟棄已損壞的 executor (同一個程序池損壞時，其中每個工作都會呼叫一次，只處理第一次)"""
+        with self._lock:
+            if self._executor is not broken: return
+            self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+# --- 程序池中執行的工作 (必須是模組層級函式才能被 pickle) ---
+
+def init_ocr_worker(tesseract_cmd=None):
+    """子程序初始化：套用主程序的 Tesseract 路徑；多個 Tesseract 同時執行時，限制每個只用一個執行緒"""
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+    if tesseract_cmd:
+        import pytesseract
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+def ocr_image_worker(image, lang, tesseract_config):
+    """
+    網頁版的 OCR 流程：前處理 (auto) 後以 Tesseract 辨識，回傳 (文字, 是否為深色模式)。
+    image 可以是 PIL 圖片或影像檔的 bytes (上傳的檔案直接送原始內容，比送解碼後的像素小得多)。
+    """
+    from PIL import Image
+    import pytesseract
+    from ocr_preprocess import preprocess
+    if isinstance(image, (bytes, bytearray)): image = Image.open(io.BytesIO(image))
+    thresh, stats = preprocess(image, 'auto')
+    try:
+        text = pytesseract.image_to_string(thresh, lang=lang, config=tesseract_config)
+    except pytesseract.TesseractNotFoundError as e:
+        raise TesseractNotFound(str(e)) from None
+    return text, stats.dark
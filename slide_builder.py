@@ -0,0 +1,77 @@
+# slide_builder.py
+# 以「投影片骨架」快取建立大量投影片 (完整載入模式的 PptxService 與 app/pptx_export 共用)
+#
+# python-pptx 逐張 add_slide() 會重新複製版面配置的佔位符，逐段 add_paragraph() 再設定
+# p.font.bold / p.font.size 也會每次重新建立 pPr/defRPr 元素與一堆代理物件。這裡改為：
+#   1. 每份簡報、每個版面配置只以 python-pptx 正常建立第一張投影片並套用樣式 (prepare)，
+#      套用後的 <p:spTree> 保存為骨架；之後的投影片直接深層複製骨架 XML。
+#   2. 每種段落樣式 (層級, 粗體, 字級) 只以 python-pptx 建立一次 <a:p>，之後深層複製並填入文字。
+# 產生的 XML 與原本逐段設定的結果相同。
+
+import copy
+import re
+import weakref
+from functools import lru_cache
+
+# 需交給 python-pptx 處理的字元 (換行轉成 <a:br/>、控制字元跳脫為 _xHHHH_)
+_SPECIAL_CHARS = re.compile(r'[\x00-\x1f\x7f]')
+
+# {簡報的 PresentationPart: {(版面配置索引, prepare): 骨架 <p:spTree>}}；簡報被回收時自動移除
+# (Presentation 本身定義了 __eq__ 而不可雜湊，因此以其 part 為鍵；骨架是獨立的 XML，不會反過來參照簡報)
+_skeletons = weakref.WeakKeyDictionary()
+
+def add_slide(prs, layout_index, prepare=None):
+    """
+    新增一張使用 prs.slide_layouts[layout_index] 的投影片。
+    prepare(slide)：在每份簡報的第一張投影片上建立/設定共用的形狀與樣式 (每份簡報只執行一次)，
+    不要在其中填入各投影片不同的內容；之後的投影片直接複製套用後的骨架。
+    """
+    skeletons = _skeletons.setdefault(prs.part, {})
+    key = (layout_index, prepare)
+    layout = prs.slide_layouts[layout_index]
+    if key not in skeletons:
+        slide = prs.slides.add_slide(layout)
+        if prepare: prepare(slide)
+        skeletons[key] = copy.deepcopy(slide.shapes._spTree)
+        return slide
+
+    # 與 Slides.add_slide 相同，只是以骨架取代 clone_layout_placeholders
+    rId, slide = prs.part.add_slide(layout)
+    sp_tree = slide._element.cSld.spTree
+    sp_tree.getparent().replace(sp_tree, copy.deepcopy(skeletons[key]))
+    prs.slides._sldIdLst.add_sldId(rId)
+    return slide
+
+@lru_cache(maxsize=32)
+def _paragraph_prototype(level, bold, size_pt):
+    """以 python-pptx 建立一個已設定樣式的段落 <a:p>，文字在最後一個 <a:t>"""
+    from pptx.oxml import parse_xml
+    from pptx.oxml.ns import nsdecls
+    from pptx.text.text import _Paragraph
+    from pptx.util import Pt
+    p = parse_xml(f'<a:p {nsdecls("a")}/>')
+    paragraph = _Paragraph(p, None)
+    paragraph.text = ' '
+    paragraph.level = level
+    if bold is not None: paragraph.font.bold = bold
+    if size_pt is not None: paragraph.font.size = Pt(size_pt)
+    return p
+
+def new_paragraph(text, level=0, bold=None, size_pt=None):
+    """
+    回傳一個新的 <a:p> 元素，等同 add_paragraph() 後設定 text、level、font.bold、font.size。
+    bold / size_pt 為 None 時不設定 (沿用繼承的樣式)。
+    """
+    p = copy.deepcopy(_paragraph_prototype(level, bold, size_pt))
+    if not text or _SPECIAL_CHARS.search(text):
+        from pptx.text.text import _Paragraph
+        _Paragraph(p, None).text = text
+    else:
+        p[-1][-1].text = text
+    return p
+
+def append_paragraphs(text_frame, paragraphs):
+    """把 [(文字, 層級, 是否粗體, 字級 pt)] 接在 text_frame 最後面"""
+    tx_body = text_frame._txBody
+    for text, level, bold, size_pt in paragraphs:
+        tx_body.append(new_paragraph(text, level, bold, size_pt))
@@ -0,0 +1,5 @@
+# 測試時從專案根目錄載入模組 (與直接執行 python main.py 相同的平面結構)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
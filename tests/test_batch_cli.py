@@ -0,0 +1,74 @@
+# batch_cli 寫入簡報中斷後的復原
+
+import os
+
+import pytest
+from pptx import Presentation
+from pptx.presentation import Presentation as PresentationObject
+
+import config
+from batch_cli import JobManifest, run_pptx_stage
+from services import PptxService
+
+REPORT = """--- 報告 1：測試異常 ---
+**情境 (Situation)**
+- 測試機台開機失敗
+**結果 (Result)**
+- 已更新韌體
+"""
+
+class _Crash(BaseException):
+    """模擬寫入簡報途中程序被中止"""
+
+def _interrupted_save(self, file):
+    # 先寫入一部分內容再中止，相當於 prs.save 寫到一半時程序被結束
+    (open(file, 'wb') if isinstance(file, str) else file).write(b'PK\x03\x04 truncated')
+    raise _Crash()
+
+def _manifest(tmp_path):
+    manifest = JobManifest(str(tmp_path / 'manifest.json'), str(tmp_path), 'multi', 'test-model')
+    manifest.data['projects']['proj'] = {'status': 'done', 'output': REPORT, 'project_name': 'proj', 'prompt_hash': 'h1'}
+    manifest.save()
+    return manifest
+
+def _reload(tmp_path):
+    manifest = JobManifest(str(tmp_path / 'manifest.json'), str(tmp_path), 'multi', 'test-model')
+    assert manifest.load()
+    return manifest
+
+@pytest.mark.parametrize('existing_deck', [False, True])
+def test_interrupted_full_save_is_not_recorded_as_written(tmp_path, monkeypatch, existing_deck):
+    output = str(tmp_path / 'summary.pptx')
+    if existing_deck:
+        Presentation().save(output)
+    before = open(output, 'rb').read() if existing_deck else None
+    # 完整載入模式 (新簡報或增量附加失敗時的退回路徑)
+    monkeypatch.setattr(config, 'PPTX_INCREMENTAL_APPEND', False)
+    monkeypatch.setattr(PresentationObject, 'save', _interrupted_save)
+
+    manifest = _manifest(tmp_path)
+    with pytest.raises(_Crash):
+        run_pptx_stage(manifest, PptxService(), output)
+    manifest.close()
+
+    # 原檔維持不變 (或仍不存在)，也沒有留下暫存檔
+    if existing_deck:
+        assert open(output, 'rb').read() == before
+    else:
+        assert not os.path.exists(output)
+    assert [name for name in os.listdir(tmp_path) if name.endswith('.tmp')] == []
+
+    manifest = _reload(tmp_path)
+    manifest.recover_pptx()
+    assert manifest.data['pptx_pending'] is None
+    assert 'written_hash' not in manifest.data['projects']['proj']
+
+def test_completed_save_is_recovered_as_written(tmp_path):
+    output = str(tmp_path / 'summary.pptx')
+    manifest = _manifest(tmp_path)
+    run_pptx_stage(manifest, PptxService(), output)
+    manifest.close()
+
+    manifest = _reload(tmp_path)
+    assert manifest.data['projects']['proj']['written_hash'] == 'h1'
+    assert len(Presentation(output).slides) == 1
@@ -0,0 +1,45 @@
+# shared_pool.FairWorkPool：取消排隊中的工作後的計數
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from shared_pool import FairWorkPool, PoolBusyError
+
+@pytest.fixture
+def blocked_pool():
+    """只有一個執行位置、已被 other 的工作佔住的工作池；release.set() 後才會開始下一個工作"""
+    release = threading.Event()
+    pool = FairWorkPool(lambda: ThreadPoolExecutor(max_workers=1), max_running=1, max_jobs_per_user=3, max_queued_jobs=10)
+    blocker = pool.submit('other', release.wait)
+    yield pool, release
+    release.set()
+    blocker.result(timeout=5)
+    pool.shutdown()
+
+def test_cancelled_jobs_do_not_count_toward_user_limit(blocked_pool):
+    pool, release = blocked_pool
+    # Streamlit 每次重新執行都會取消上一次仍在排隊的工作再送出新的
+    for _ in range(3):
+        futures = [pool.submit('user', lambda: 'stale') for _ in range(3)]
+        for future in futures: assert future.cancel()
+    for _ in range(3): pool.submit('user', lambda: 'fresh')
+    # 上限只計算仍在排隊的三個工作
+    with pytest.raises(PoolBusyError):
+        pool.submit('user', lambda: 'fresh')
+
+def test_resubmit_after_cancel_at_limit(blocked_pool):
+    pool, release = blocked_pool
+    stale = [pool.submit('user', lambda: 'stale') for _ in range(3)]
+    with pytest.raises(PoolBusyError):
+        pool.submit('user', lambda: 'over limit')
+    for future in stale: future.cancel()
+    assert pool.stats()['queued'] == 0
+
+    fresh = pool.submit('user', lambda: 'fresh')
+    # 被取消的工作不再排在前面
+    assert pool.queue_position(fresh) == 1
+    release.set()
+    assert fresh.result(timeout=5) == 'fresh'
+    assert all(future.cancelled() for future in stale)
@@ -0,0 +1,118 @@
+# text_model.py
+# 大型文字框的資料層：完整文字保存在 Python 端，Tk 文字框只是它的「顯示」
+#
+# - 讀取 (get) 直接回傳 Python 端的字串，不再每次以 get("1.0", END) 把整個文字框讀出來；
+#   只有使用者親手編輯過 (<<Modified>>) 時才重新讀取一次
+# - 寫入 (set / append) 只更新 Python 端並記下差異，最多每 flush_ms 毫秒合併寫入文字框一次
+# - 內容超過 VIRTUALIZE_CHARS 時，文字框改為唯讀預覽 (只顯示開頭一段)，完整內容仍保存在 Python 端並照常送交分析
+
+import tkinter as tk
+
+import config
+
+class TextModel:
+    def __init__(self, root, widget, flush_ms=None, follow=False):
+        """
+        widget: tk.Text 或 ttkbootstrap 的 ScrolledText (會取其內部的 Text)。
+        follow: 附加文字後是否自動捲動到最後 (串流輸出用)。
+        """
+        self.root = root
+        self.widget = getattr(widget, 'text', widget)
+        self.flush_ms = config.UI_TEXT_FLUSH_MS if flush_ms is None else flush_ms
+        self.follow = follow
+        self._parts = []            # 完整文字 (append 時只加入清單，讀取時才合併)
+        self._length = 0
+        self._replace = False       # 文字框需要整個重寫
+        self._pending = []          # 尚未寫入文字框的附加文字
+        self._flush_scheduled = False
+        self._user_edited = False
+        self._virtual = False
+        self.widget.bind('<<Modified>>', self._on_modified, add='+')
+
+    # --- 讀取 ---
+    def get(self):
+        if self._user_edited: self._sync_from_widget()
+        if len(self._parts) > 1: self._parts = [''.join(self._parts)]
+        return self._parts[0] if self._parts else ''
+
+    def _sync_from_widget(self):
+        """使用者編輯過文字框：先補上尚未寫入的附加文字，再以文字框內容為準"""
+        self._user_edited = False
+        if self._replace: return    # 編輯發生在整段取代寫入之前，以程式設定的內容為準
+        if self._pending:
+            self.widget.insert(tk.END, ''.join(self._pending))
+            self._pending = []
+            self.widget.edit_modified(False)
+        text = self.widget.get('1.0', 'end-1c')
+        self._parts = [text] if text else []
+        self._length = len(text)
+
+    def __len__(self):
+        if self._user_edited: self._sync_from_widget()
+        return self._length
+
+    @property
+    def virtual(self):
+        return self._virtual
+
+    # --- 寫入 ---
+    def set(self, text):
+        self._parts = [text] if text else []
+        self._length = len(text)
+        self._user_edited = False
+        self._replace = True
+        self._pending = []
+        self._schedule_flush()
+
+    def append(self, text):
+        if not text: return
+        if self._user_edited: self._sync_from_widget()
+        self._parts.append(text)
+        self._length += len(text)
+        self._pending.append(text)
+        self._schedule_flush()
+
+    def clear(self):
+        self.set('')
+
+    # --- 同步到文字框 ---
+    def _schedule_flush(self):
+        if self._flush_scheduled: return
+        self._flush_scheduled = True
+        self.root.after(self.flush_ms, self.flush)
+
+    def flush(self):
+        """把累積的差異一次寫入文字框 (在 UI 執行緒中執行；排程的 after 與 get() 都會呼叫)"""
+        self._flush_scheduled = False
+        if not self._replace and not self._pending: return
+        virtual = self._length > config.TEXT_VIRTUALIZE_CHARS
+        if virtual or self._virtual or self._replace:
+            self._render_full(virtual)
+        else:
+            self.widget.insert(tk.END, ''.join(self._pending))
+        self._replace = False
+        self._pending = []
+        if self.follow: self.widget.see(tk.END)
+        # 程式寫入不算使用者編輯：重設修改旗標 (<<Modified>> 稍後觸發時會看到 False 而忽略)
+        self.widget.edit_modified(False)
+
+    def _render_full(self, virtual):
+        self.widget.config(state='normal')
+        if virtual and self._virtual and not self._replace:
+            # 預覽的開頭不變，只更新最後的說明文字
+            self.widget.delete('preview_end', tk.END)
+        else:
+            self.widget.delete('1.0', tk.END)
+            self.widget.insert(tk.END, self.get()[:config.TEXT_PREVIEW_CHARS] if virtual else self.get())
+        if virtual:
+            self.widget.mark_set('preview_end', 'end-1c')
+            self.widget.mark_gravity('preview_end', tk.LEFT)
+            self.widget.insert(tk.END, f"\n\n...(內容共 {self._length:,} 字元，過長僅預覽前 {config.TEXT_PREVIEW_CHARS:,} 字元；"
+                                       f"完整內容仍會用於分析。預覽模式下無法編輯)")
+            self.widget.config(state='disabled')
+        self._virtual = virtual
+
+    def _on_modified(self, event=None):
+        if not self.widget.edit_modified(): return
+        self.widget.edit_modified(False)
+        if not self._virtual: self._user_edited = True
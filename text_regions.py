@@ -0,0 +1,93 @@
+# text_regions.py
+# 截圖的文字區塊偵測：只把含有文字的區域交給 Tesseract，略過大片留白、頭像與圖示
+#
+# 做法 (全部在縮小後的灰階影像上進行)：
+#   形態學梯度 (文字筆畫邊緣) -> Otsu 二值化 -> 水平/垂直閉運算把字連成區塊 -> 連通元件
+# 偵測到的區塊放大回原圖座標後，依閱讀順序分成數組，每組拼成一張長條圖，各組平行 OCR。
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import cv2
+
+from ocr_hybrid import stitch_crops
+
+# 偵測時縮小到的長邊像素
+DETECT_MAX_SIDE = 1000
+# 縮小後的閉運算核心 (寬, 高)：寬度把同一行的字連起來，高度把相鄰的行連成段落
+CLOSE_KERNEL = (15, 5)
+# 縮小後小於此高度/寬度的元件視為雜訊
+MIN_REGION_HEIGHT = 4
+MIN_REGION_WIDTH = 6
+# 填滿比例 (邊緣像素 / 外接矩形面積) 高於此值的通常是照片、頭像或圖示
+MAX_EDGE_DENSITY = 0.6
+# 放大回原圖後每個區塊外加的邊界 (像素)
+REGION_PADDING = 6
+# 區塊總面積超過原圖的此比例時，裁切已無明顯好處，直接 OCR 整張圖
+MAX_COVERAGE = 0.7
+
+def to_gray(image):
+    if isinstance(image, np.ndarray):
+        return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    return np.asarray(image.convert('L'))
+
+def detect_text_regions(gray):
+    """
+    回傳依閱讀順序 (由上而下、由左而右) 排列的文字區塊 [(x0, y0, x1, y1), ...] (原圖座標)。
+    找不到文字區塊，或區塊幾乎涵蓋整張圖時回傳 None，呼叫端應改為 OCR 整張圖。
+    """
+    h, w = gray.shape
+    scale = min(1.0, DETECT_MAX_SIDE / max(h, w))
+    small = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+    gradient = cv2.morphologyEx(small, cv2.MORPH_GRADIENT, kernel)
+    _, edges = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    closed = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, CLOSE_KERNEL))
+    count, _, stats, _ = cv2.connectedComponentsWithStats(closed, connectivity=8)
+
+    regions = []
+    for x, y, bw, bh, _ in stats[1:]:
+        if bh < MIN_REGION_HEIGHT or bw < MIN_REGION_WIDTH: continue
+        density = cv2.countNonZero(edges[y:y + bh, x:x + bw]) / float(bw * bh)
+        if density > MAX_EDGE_DENSITY: continue
+        regions.append((max(0, int(x / scale) - REGION_PADDING), max(0, int(y / scale) - REGION_PADDING),
+                        min(w, int((x + bw) / scale) + REGION_PADDING), min(h, int((y + bh) / scale) + REGION_PADDING)))
+    if not regions: return None
+    if sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions) > MAX_COVERAGE * w * h: return None
+    return sorted(regions, key=lambda box: (box[1], box[0]))
+
+def split_groups(regions, group_count):
+    """依閱讀順序把區塊切成最多 group_count 組連續的區塊，各組面積盡量相近"""
+    areas = [(x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions]
+    target = sum(areas) / max(1, group_count)
+    groups, current, current_area = [], [], 0
+    for region, area in zip(regions, areas):
+        if current and current_area + area / 2 > target and len(groups) < group_count - 1:
+            groups.append(current)
+            current, current_area = [], 0
+        current.append(region)
+        current_area += area
+    if current: groups.append(current)
+    return groups
+
+def ocr_text_regions(image, lang, tesseract_config='', workers=1):
+    """
+    偵測文字區塊並只 OCR 這些區塊；回傳文字，或在不適合裁切時回傳 None (呼叫端改為 OCR 整張圖)。
+    區塊分成 workers 組，每組拼成一張圖各呼叫一次 Tesseract (每次呼叫都要啟動程序，不逐塊呼叫)。
+    """
+    import pytesseract
+    gray = to_gray(image)
+    regions = detect_text_regions(gray)
+    if regions is None: return None
+    # 深色模式：反相成白底黑字，拼接時的白色間隔才不會變成一條條色塊
+    if np.median(gray[::8, ::8]) < 128: gray = cv2.bitwise_not(gray)
+
+    def run(group):
+        canvas, _ = stitch_crops(gray, group)
+        return pytesseract.image_to_string(canvas, lang=lang, config=tesseract_config)
+
+    groups = split_groups(regions, workers)
+    if len(groups) == 1: return run(groups[0])
+    with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+        return '\n'.join(executor.map(run, groups))
@@ -0,0 +1,161 @@
+# tracing.py
+# 各階段的耗時追蹤：OCR、Prompt 組裝、Ollama (排隊/載入、讀 Prompt、生成)、PowerPoint 儲存
+#
+# 用法：
+#   with tracing.run('generate') as trace:                  # 一次使用者操作
+#       with tracing.span('ollama.generate', prompt_chars=n) as s:
+#           ...
+#           s.set(eval_count=...)                            # 執行中才知道的資訊
+#   trace.summary()                                          # 供狀態列顯示的各階段耗時
+#
+# - 每個 span 結束時寫一行 JSON 到 TRACE_LOG_FILENAME (超過大小自動輪替)，可用任何 JSONL 工具分析
+# - 目前的 span 以 contextvars 記錄：同一執行緒內自動形成父子關係；
+#   交給其他執行緒時以 contextvars.copy_context().run(...) 帶過去 (見 OllamaService.prepare_prompt)
+# - 停用 (TRACE_ENABLED = False) 或在 OCR 子程序中時，span 仍會計時 (供 summary 使用) 但不寫檔
+
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+
+_current = contextvars.ContextVar('tracing_current_span', default=None)
+_ids = itertools.count(1)
+_logger = None
+_logger_lock = threading.Lock()
+_tree_lock = threading.Lock()
+_log_enabled = True
+
+# summary() 中各 span 名稱對應的階段名稱 (依此順序顯示)
+STAGE_LABELS = (
+    ('ocr', 'OCR'),
+    ('file', '讀檔'),
+    ('prompt', 'Prompt'),
+    ('ollama', 'Ollama'),
+    ('pptx', 'PPTX'),
+)
+
+class Span:
+    def __init__(self, name, parent=None, **attrs):
+        self.id = next(_ids)
+        self.name = name
+        self.parent = parent
+        self.run = parent.run if parent else self
+        self.attrs = attrs
+        self.children = []
+        self.error = None
+        self.start = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+        if parent:
+            with _tree_lock: parent.children.append(self)
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._start
+        _write(self)
+
+    def to_dict(self):
+        record = {'run': self.run.id, 'span': self.id, 'parent': self.parent.id if self.parent else None,
+                  'name': self.name, 'start': round(self.start, 3),
+                  'duration_ms': round(self.duration * 1000, 2) if self.duration is not None else None,
+                  'thread': threading.current_thread().name}
+        record.update(self.attrs)
+        if self.error: record['error'] = self.error
+        return record
+
+    def summary(self):
+        """
+        各階段耗時的簡短說明，例如：
+        「總計 53.2 秒：Prompt 0.1 秒、Ollama 53.0 秒 (排隊/載入 0.6 秒、讀 Prompt 1.9 秒、生成 50.4 秒，812 tokens，16.1 tok/s)」
+        只統計直接子 span (分段擷取時平行執行的請求已包含在 Prompt 階段內，不重複計算)。
+        """
+        stages = {}
+        for child in self.children:
+            if child.duration is None: continue
+            label = next((label for prefix, label in STAGE_LABELS if child.name.startswith(prefix)), child.name)
+            stages[label] = stages.get(label, 0.0) + child.duration
+        order = [label for _, label in STAGE_LABELS]
+        parts = [f"{label} {seconds:.1f} 秒" for label, seconds in sorted(stages.items(), key=lambda item: order.index(item[0]) if item[0] in order else len(order))]
+
+        chunks = sum(child.attrs.get('chunks', 0) for child in self.children)
+        if chunks and 'Prompt' in stages:
+            index = next(i for i, part in enumerate(parts) if part.startswith('Prompt '))
+            parts[index] += f" (分段擷取 {chunks} 段)"
+
+        ollama_spans = [child for child in self.children if 'eval_count' in child.attrs]
+        if ollama_spans and 'Ollama' in stages:
+            eval_count = sum(s.attrs['eval_count'] for s in ollama_spans)
+            eval_seconds = sum(s.attrs.get('eval_duration_s', 0) for s in ollama_spans)
+            prompt_seconds = sum(s.attrs.get('prompt_eval_duration_s', 0) for s in ollama_spans)
+            queue_seconds = sum(s.attrs.get('queue_s', 0) for s in ollama_spans)
+            detail = f"排隊/載入 {queue_seconds:.1f} 秒、讀 Prompt {prompt_seconds:.1f} 秒、生成 {eval_seconds:.1f} 秒，{eval_count} tokens"
+            if eval_seconds > 0: detail += f"，{eval_count / eval_seconds:.1f} tok/s"
+            index = next(i for i, part in enumerate(parts) if part.startswith('Ollama '))
+            parts[index] += f" ({detail})"
+
+        total = self.duration if self.duration is not None else time.perf_counter() - self._start
+        return f"總計 {total:.1f} 秒" + (f"：{'、'.join(parts)}" if parts else '')
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                import logging
+                from logging.handlers import RotatingFileHandler
+                logger = logging.getLogger('reporthelper.trace')
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                handler = RotatingFileHandler(os.path.join(config.get_base_path(), config.TRACE_LOG_FILENAME),
+                                              maxBytes=config.TRACE_LOG_MAX_MB * 1024 * 1024,
+                                              backupCount=config.TRACE_LOG_BACKUPS, encoding='utf-8', delay=True)
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger.addHandler(handler)
+                _logger = logger
+    return _logger
+
+def _write(span):
+    if not (_log_enabled and config.TRACE_ENABLED): return
+    try:
+        _get_logger().info(json.dumps(span.to_dict(), ensure_ascii=False, default=str))
+    except Exception as e:
+        print(f"寫入追蹤紀錄失敗: {e}")
+
+def disable_logging():
+    """不寫入追蹤紀錄 (OCR 子程序呼叫：多個程序同時輪替同一個檔案並不安全)"""
+    global _log_enabled
+    _log_enabled = False
+
+def current_span():
+    return _current.get()
+
+@contextmanager
+def span(name, **attrs):
+    """記錄一個階段；例外會記在 span 的 error 欄位後照常拋出"""
+    current = Span(name, _current.get(), **attrs)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        current.finish()
+
+@contextmanager
+def run(name, **attrs):
+    """一次使用者操作 (例如生成一份報告) 的根 span；不受外層 span 影響"""
+    token = _current.set(None)
+    try:
+        with span(f"run.{name}", **attrs) as root:
+            yield root
+    finally:
+        _current.reset(token)
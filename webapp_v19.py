@@ -5,14 +5,20 @@ import extract_msg
 from pptx import Presentation
 from pptx.util import Inches, Pt
 import os
-import re
 import io
-
-import cv2
-import numpy as np
+import hashlib
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
 from streamlit_paste_button import paste_image_button
 
+import config
+from pptx_append import PackageStructureError, PresentationTemplate
+from report_parser import parse_reports
+from session_memo import content_hash, memoize
+from shared_pool import FairWorkPool, PoolBusyError, TesseractNotFound, init_ocr_worker, ocr_image_worker
+
 # --- 設定 Tesseract 路徑 ---
 if os.name == 'nt':
     try:
@@ -132,34 +138,78 @@ You are a senior technical analyst. Your goal is to analyze a work discussion, i
 Now, analyze the following text and generate all reports in the specified format, adhering to all principles.
 """
 
-# --- 核心邏輯函式 (不變) ---
-def process_image_content(image_input):
+# --- 伺服器模式：所有使用者共用的工作池 (見 shared_pool.py) ---
+OCR_LANG = 'chi_tra+chi_sim+eng'
+OCR_TESSERACT_CONFIG = r'--oem 3 --psm 6'
+
+@st.cache_resource
+def get_work_pools():
+    """整個 Streamlit 程序只建立一次，所有 session 共用。OCR 在子程序中執行 (CPU 密集)；
+    PowerPoint 生成只是複製範本資料，在執行緒中執行即可 (不必把範本傳給子程序)，限制同時數量以控制記憶體用量"""
+    tesseract_cmd = pytesseract.pytesseract.tesseract_cmd
+    return {
+        'ocr': FairWorkPool(lambda: ProcessPoolExecutor(max_workers=config.WEBAPP_OCR_WORKERS, initializer=init_ocr_worker, initargs=(tesseract_cmd,)),
+                            config.WEBAPP_OCR_WORKERS, config.WEBAPP_MAX_JOBS_PER_USER, config.WEBAPP_MAX_QUEUED_JOBS),
+        'pptx': FairWorkPool(lambda: ThreadPoolExecutor(max_workers=config.WEBAPP_PPTX_WORKERS, thread_name_prefix='pptx'),
+                             config.WEBAPP_PPTX_WORKERS, config.WEBAPP_MAX_JOBS_PER_USER, config.WEBAPP_MAX_QUEUED_JOBS),
+    }
+
+def get_user_id():
+    # 每個瀏覽器分頁 (Streamlit session) 視為一位使用者
+    if 'user_id' not in st.session_state:
+        st.session_state.user_id = uuid.uuid4().hex
+    return st.session_state.user_id
+
+def run_job(pool_name, label, func, *args):
+    """伺服器模式下把工作送到共用工作池排隊並等待結果 (期間顯示排隊位置)；否則直接在目前的執行緒執行"""
+    if not config.WEBAPP_SERVER_MODE:
+        return func(*args)
+    pool = get_work_pools()[pool_name]
+    future = pool.submit(get_user_id(), func, *args)
+    status = st.empty()
+    shown = None
     try:
-        if isinstance(image_input, Image.Image): image = image_input
-        else: image = Image.open(image_input)
-        open_cv_image = np.array(image.convert('RGB'))
-        open_cv_image = open_cv_image[:, :, ::-1].copy()
-        gray = cv2.cvtColor(open_cv_image, cv2.COLOR_BGR2GRAY)
-        h, w = gray.shape
-        corners = [gray[0:10, 0:10], gray[0:10, w-10:w], gray[h-10:h, 0:10], gray[h-10:h, w-10:w]]
-        corner_mean = np.mean([np.mean(c) for c in corners])
-        if corner_mean > 128:
-            st.info("偵測到淺色模式，使用標準二值化。")
-            _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        else:
-            st.info("偵測到深色模式，使用反向二值化。")
-            _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-        custom_config = r'--oem 3 --psm 6'
-        text = pytesseract.image_to_string(thresh, lang='chi_tra+chi_sim+eng', config=custom_config)
+        while True:
+            try:
+                return future.result(timeout=0.5)
+            except FutureTimeoutError:
+                position = pool.queue_position(future)
+                if position != shown:
+                    status.info(f"{label}：排隊中，前面還有 {position - 1} 個工作..." if position else f"{label}：處理中...")
+                    shown = position
+    except BaseException:
+        # 使用者操作其他元件或關閉頁面時 Streamlit 會中斷腳本：取消尚未開始的工作
+        future.cancel()
+        raise
+    finally:
+        status.empty()
+
+# --- 核心邏輯函式 ---
+def process_image_content(image_input, image_hash=None):
+    """回傳辨識出的文字；辨識失敗 (排隊已滿、找不到 Tesseract 等) 時顯示訊息並回傳 None"""
+    try:
+        # 上傳的檔案直接送原始內容；剪貼簿的圖片是 PIL 圖片
+        image = image_input if isinstance(image_input, Image.Image) else image_input.getvalue()
+        image_hash = image_hash or content_hash(image)
+        # 與其他入口共用前處理管線：截圖只做 (深色模式反相 +) Otsu 二值化，照片/掃描另做去噪與校正傾斜；
+        # 同一張圖片與選項在這個 session 中只辨識一次
+        text, dark = memoize(st.session_state, 'ocr_memo', (image_hash, OCR_LANG, OCR_TESSERACT_CONFIG),
+                             lambda: run_job('ocr', "文字辨識", ocr_image_worker, image, OCR_LANG, OCR_TESSERACT_CONFIG),
+                             config.STREAMLIT_OCR_MEMO_ENTRIES)
+        if dark: st.info("偵測到深色模式，使用反向二值化。")
+        else: st.info("偵測到淺色模式，使用標準二值化。")
         if not text.strip(): st.warning("OCR 引擎未能辨識出任何文字。")
         return text
-    except pytesseract.TesseractNotFoundError:
+    except PoolBusyError as e:
+        st.warning(str(e))
+        return None
+    except TesseractNotFound:
         st.error("Tesseract OCR 引擎未找到或路徑錯誤。")
-        return ""
+        return None
     except Exception as e:
         st.error(f"圖片辨識時發生錯誤: {e}")
         st.exception(e)
-        return ""
+        return None
 
 def process_text_content(text_file):
     try:
@@ -176,60 +226,97 @@ def process_msg_content(msg_file):
         st.error(f"解析 Email (.msg) 檔案時發生錯誤: {e}")
         return ""
 
+@st.cache_resource(show_spinner=False)
+def load_default_template_bytes():
+    # 沒有上傳範本時使用 python-pptx 的預設範本
+    ppt_io = io.BytesIO()
+    Presentation().save(ppt_io)
+    return ppt_io.getvalue()
+
+@st.cache_resource(max_entries=config.WEBAPP_TEMPLATE_CACHE_ENTRIES, ttl=config.WEBAPP_TEMPLATE_CACHE_TTL_SECONDS, show_spinner=False)
+def load_template(template_hash, _template_data):
+    """
+    每份範本 (依內容雜湊) 只解析一次，所有使用者與每次重新執行共用。
+    _template_data 不參與快取鍵的計算 (避免每次都雜湊整份檔案)；最多保留 max_entries 份以限制記憶體用量。
+    """
+    return PresentationTemplate(_template_data)
+
+def get_template(template_file):
+    if template_file is None:
+        data = load_default_template_bytes()
+        return load_template('default', data)
+    # UploadedFile 是 BytesIO：getbuffer() 不複製內容；getvalue() 也與上傳的資料共用同一份 bytes
+    template_hash = hashlib.sha256(template_file.getbuffer()).hexdigest()
+    return load_template(template_hash, template_file.getvalue())
+
+def build_slides(genai_text, project_name):
+    """回傳 [(投影片標題, [(文字, 層級, 是否粗體, 字級 pt)])]；網頁版依縮排分層：行首兩個空白為第 1 層，其餘為第 0 層"""
+    return [(report.slide_title(project_name),
+             [(line.plain, 1, False, 16) if line.indented else (line.plain, 0, True, 18) for line in report.iter_lines()])
+            for report in parse_reports(genai_text, strict=True)]
+
+def build_pptx(template, slides):
+    ppt_io = io.BytesIO()
+    template.append_slides(ppt_io, slides)
+    return ppt_io
+
 def generate_powerpoint_in_memory(genai_text, project_name, template_file=None):
     try:
-        if template_file: prs = Presentation(template_file)
-        else: prs = Presentation()
-        try: slide_layout = prs.slide_layouts[1]
-        except IndexError:
-            st.warning("在範本中找不到標準的『標題及內容』版面配置 (索引 1)，將使用第一個可用的版面。")
-            slide_layout = prs.slide_layouts[0]
-        reports = re.split(r'(?=--- 報告 \d+：)', genai_text)
-        generated_count = 0
-        for report_text in reports:
-            report_text = report_text.strip()
-            if not report_text: continue
-            match = re.match(r'--- 報告 \d+：(.*?) ---\n(.*)', report_text, re.DOTALL)
-            if not match: continue
-            ai_title = match.group(1).strip()
-            content = match.group(2).strip()
-            final_title = f"{project_name} - {ai_title}" if project_name else ai_title
-            slide = prs.slides.add_slide(slide_layout)
-            if slide.shapes.title: slide.shapes.title.text = final_title
-            if not slide.placeholders or len(slide.placeholders) < 2:
-                 st.error(f"錯誤：選擇的投影片版面 '{slide_layout.name}' 沒有足夠的內容佔位符。")
-                 return None
-            content_placeholder = slide.placeholders[1]
-            text_frame = content_placeholder.text_frame
-            text_frame.clear(); text_frame.word_wrap = True
-            for line in content.split('\n'):
-                if not line.strip(): continue
-                is_indented = line.startswith('  ')
-                level = 1 if is_indented else 0
-                cleaned_line = re.sub(r'^\s*[-*]\s+', '', line).strip()
-                p = text_frame.add_paragraph()
-                p.text = cleaned_line; p.level = level
-                if level == 0: p.font.bold = True; p.font.size = Pt(18)
-                else: p.font.bold = False; p.font.size = Pt(16)
-            generated_count += 1
-        if generated_count == 0:
+        slides = build_slides(genai_text, project_name)
+        if not slides:
             st.warning("未能在貼上的內容中找到符合格式的報告。")
             return None
-        ppt_io = io.BytesIO()
-        prs.save(ppt_io); ppt_io.seek(0)
+        try:
+            # 只附加新投影片：範本的其他內容直接複製原始壓縮資料，不重新解析
+            ppt_io = run_job('pptx', "產生簡報", build_pptx, get_template(template_file), slides)
+        except (PackageStructureError, zipfile.BadZipFile) as e:
+            print(f"無法以增量模式附加投影片，改用完整載入模式: {e}")
+            ppt_io = generate_powerpoint_with_python_pptx(slides, template_file)
+            if ppt_io is None: return None
+        ppt_io.seek(0)
         return ppt_io
+    except PoolBusyError as e:
+        st.warning(str(e))
+        return None
     except Exception as e:
         st.error(f"生成 PowerPoint 時發生錯誤: {e}")
         st.exception(e)
         return None
 
+def generate_powerpoint_with_python_pptx(slides, template_file=None):
+    """以 python-pptx 載入整份範本後新增投影片 (範本結構不符合增量模式時使用)"""
+    if template_file:
+        template_file.seek(0)
+        prs = Presentation(template_file)
+    else: prs = Presentation()
+    try: slide_layout = prs.slide_layouts[1]
+    except IndexError:
+        st.warning("在範本中找不到標準的『標題及內容』版面配置 (索引 1)，將使用第一個可用的版面。")
+        slide_layout = prs.slide_layouts[0]
+    for final_title, paragraphs in slides:
+        slide = prs.slides.add_slide(slide_layout)
+        if slide.shapes.title: slide.shapes.title.text = final_title
+        if not slide.placeholders or len(slide.placeholders) < 2:
+             st.error(f"錯誤：選擇的投影片版面 '{slide_layout.name}' 沒有足夠的內容佔位符。")
+             return None
+        content_placeholder = slide.placeholders[1]
+        text_frame = content_placeholder.text_frame
+        text_frame.clear(); text_frame.word_wrap = True
+        for text, level, bold, size in paragraphs:
+            p = text_frame.add_paragraph()
+            p.text = text; p.level = level
+            p.font.bold = bold; p.font.size = Pt(size)
+    ppt_io = io.BytesIO()
+    prs.save(ppt_io)
+    return ppt_io
+
 def handle_file_upload():
     uploaded_file = st.session_state.file_uploader_key
     if uploaded_file is not None:
         with st.spinner('正在處理檔案...'):
             file_ext = os.path.splitext(uploaded_file.name)[1].lower()
             content = ""
-            if file_ext in ['.png', '.jpg', '.jpeg']: content = process_image_content(uploaded_file)
+            if file_ext in ['.png', '.jpg', '.jpeg']: content = process_image_content(uploaded_file) or ""
             elif file_ext == '.txt': content = process_text_content(uploaded_file)
             elif file_ext == '.msg': content = process_msg_content(uploaded_file)
             st.session_state.ocr_text = content
@@ -267,10 +354,15 @@ with col1:
         hover_background_color="#FF6B6B"
     )
 
-    if paste_info and paste_info.image_data is not None:
+    # 貼上按鈕在之後每次重新執行時都會回傳同一張圖片：只處理與上次不同的圖片，避免重複附加
+    # (辨識成功後才記錄雜湊；排隊已滿或辨識失敗時，下次重新執行會再試一次)
+    paste_hash = content_hash(paste_info.image_data) if paste_info and paste_info.image_data is not None else None
+    if paste_hash and paste_hash != st.session_state.get('last_paste_hash'):
         with st.spinner('正在進行 OCR 辨識...'):
-            new_content = process_image_content(paste_info.image_data)
-            
+            new_content = process_image_content(paste_info.image_data, paste_hash)
+        
+        if new_content is not None:
+            st.session_state.last_paste_hash = paste_hash
             if st.session_state.ocr_text.strip():
                 separator = f"\n\n{'='*20} 來自剪貼簿的新增圖片 {'='*20}\n\n"
                 st.session_state.ocr_text += separator + new_content
@@ -278,8 +370,7 @@ with col1:
                 st.session_state.ocr_text = new_content
             
             st.session_state.full_prompt = ""
-        
-        st.success("圖片辨識完成，並已附加至結果中！")
+            st.success("圖片辨識完成，並已附加至結果中！")
 
     st.text_area("辨識/解析結果", height=250, key="ocr_text")
     
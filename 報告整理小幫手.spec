@@ -5,8 +5,11 @@ a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[('prompt_single_issue.txt', '.'), ('prompt_multi_issue.txt', '.')],
-    hiddenimports=['tkinterdnd2', 'pytesseract', 'PIL.ImageGrab'],
+    datas=[('prompt_single_issue.txt', '.'), ('prompt_multi_issue.txt', '.'), ('prompt_chunk_extract.txt', '.')],
+    # main.py 以 importlib 動態載入的模組 (介面模組與 PRELOAD_MODULES) 無法被靜態分析，必須列在這裡
+    hiddenimports=['tkinterdnd2', 'pytesseract', 'PIL.ImageGrab',
+                   'ttkbootstrap', 'app_ui', 'app_controller', 'job_queue', 'text_model', 'services',
+                   'PIL.Image', 'requests', 'lxml.etree', 'pptx', 'extract_msg'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],